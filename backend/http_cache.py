@@ -0,0 +1,101 @@
+import hashlib
+import os
+import threading
+from cachetools import TTLCache
+from fastapi import Request, Response
+from utils import metrics
+from utils.cache import on_user_changed
+
+# Conditional GET for the read endpoints.
+# 1. Every response body is encoded ONCE (pydantic-core, straight to JSON bytes)
+#    and kept here with its ETag (a hash of the body) per (user, view).
+# 2. A client sending If-None-Match with the current ETag gets a 304:
+#    no query, no validation, no body.
+# 3. Any write to the user's data (the utils/cache.py bus) bumps the user's
+#    generation, which retires all their entries at once. Writes made by other
+#    processes can't reach us, so entries also expire after API_CACHE_TTL seconds.
+
+API_CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", "2048"))   # (user, view) entries kept
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "30"))     # seconds an entry may be served
+CACHE_CONTROL = "private, no-cache" # Clients may keep it, but must revalidate with the ETag
+
+_entries = TTLCache(maxsize=API_CACHE_SIZE, ttl=API_CACHE_TTL) # (user_id, view) -> (generation, etag, body)
+# user_id -> number of the user's last write. Only needed while an entry or a
+# load from before that write can still be around, so it is bounded too.
+_generations = TTLCache(maxsize=API_CACHE_SIZE * 4, ttl=max(60.0, 2 * API_CACHE_TTL))
+_write_count = 0 # Process-wide, so a forgotten generation never comes back with an old number
+_lock = threading.Lock()
+
+@on_user_changed
+def _user_changed(user_id):
+    global _write_count
+    user_id = str(user_id)
+    with _lock:
+        _write_count += 1
+        _generations[user_id] = _write_count
+        # Drop the user's entries now instead of leaving them to expire
+        for key in [key for key in _entries if key[0] == user_id]:
+            _entries.pop(key, None)
+
+def make_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match can list several ETags, "*", or weak ones (W/"...").
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _lookup(user_id, view):
+    with _lock:
+        generation = _generations.get(user_id, 0)
+        entry = _entries.get((user_id, view))
+    if entry is not None and entry[0] == generation:
+        return generation, entry
+    return generation, None
+
+def _store(user_id, view, generation, etag, body):
+    with _lock:
+        # A write landed while we were loading: this body may already be stale
+        if _generations.get(user_id, 0) == generation:
+            _entries[(user_id, view)] = (generation, etag, body)
+
+async def cached_json(request: Request, user_id, view, load, adapter):
+    """
+    Serves `view` of a user's data with ETag / If-None-Match support.
+    load    -> coroutine function returning the data (only called on a miss)
+    adapter -> pydantic TypeAdapter that validates and encodes it
+    """
+    user_id = str(user_id)
+    generation, entry = _lookup(user_id, view)
+    if entry is None:
+        data = await load()
+        body = adapter.dump_json(adapter.validate_python(data))
+        entry = (generation, make_etag(body), body)
+        _store(user_id, view, *entry)
+        result = "miss"
+    else:
+        result = "hit"
+
+    _, etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        result = "not_modified"
+        response = Response(status_code=304, headers=headers)
+    else:
+        response = Response(content=body, media_type="application/json", headers=headers)
+    metrics.inc("api_cache_total", help_text="Read endpoint cache results", view=view.split(":")[0], result=result)
+    return response
+
+def clear():
+    """
+    Drops every entry (tests, or after a bulk job).
+    """
+    with _lock:
+        _entries.clear()
@@ -1,27 +1,87 @@
-from fastapi import FastAPI
-from database.db_connection import get_db_connection
-from typing import List
+import asyncio
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter
+from database.db_connection import close_db_connection
+from database.resilience import CircuitOpenError, supabase_breaker
+from database.async_db import (
+    open_async_db, close_async_db, fetch_user_habits, fetch_user_logs, fetch_dashboard, bulk_set_habit_logs
+)
+from typing import List, Optional
 from backend import schemas
+from backend.http_cache import cached_json
+from utils import metrics
+from utils.cache import invalidate_user
+
+# 0. App lifespan: open ONE pooled async Supabase client at startup, close it on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_async_db() # Warm up the shared client before the first request
+    yield
+    await close_async_db()
+    close_db_connection() # In case anything used the sync client
 
 # 1. Initialize the App
 app = FastAPI(
     title="Smart Habit Tracker API",
     description="The backend brain for our habit tracker.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# 1b. Time every request and count its Supabase round trips
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    scope = metrics.start_scope()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    metrics.observe("http_request_duration_seconds", time.perf_counter() - scope["started"],
+                    help_text="API request latency", path=path, method=request.method)
+    metrics.inc("http_requests_total", help_text="API requests", path=path, method=request.method,
+                status=response.status_code)
+    metrics.inc("http_request_round_trips_total", scope["round_trips"],
+                help_text="Supabase round trips made by API requests", path=path)
+    return response
+
+# 1c. Supabase is down and we have nothing cached: say so quickly instead of a 500 after a timeout
+@app.exception_handler(CircuitOpenError)
+async def circuit_open(request: Request, error: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(int(supabase_breaker.reset_timeout))},
+    )
+
 # 2. Define a "Route" (Endpoint)
 # When someone visits the root URL ("/"), run this function.
 @app.get("/")
-def health_check():
+async def health_check():
     """
     A simple health check to verify the server is running.
     """
     return {"status": "active", "message": "Backend is online! 🚀"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint: Supabase call timings, rows, bytes and errors
+    by table/operation, plus API request metrics.
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# Encoders built once: validation + JSON encoding in a single pydantic-core call
+HABITS_ADAPTER = TypeAdapter(List[schemas.Habit])
+DASHBOARD_ADAPTER = TypeAdapter(schemas.Dashboard)
+DUE_ADAPTER = TypeAdapter(schemas.Due)
+
 # 3. A Mock Data Endpoint
 @app.get("/api/v1/test-habits")
-def get_test_habits():
+async def get_test_habits():
     """
     Returns some fake data to prove we can send JSON lists.
     """
@@ -31,14 +91,96 @@ def get_test_habits():
     ]
 
 @app.get("/api/v1/habits/{user_id}", response_model=List[schemas.Habit])
-def get_user_habits(user_id: str):
+async def get_user_habits(user_id: str, request: Request):
     """
     Fetches real habits for a specific user from Supabase.
     Now validated by Pydantic! If the DB returns weird data, this will throw an error.
+    Async: the worker serves other requests while we wait for Supabase.
+    Sends an ETag: repeat calls with If-None-Match get a 304 while nothing changed.
+    """
+    return await cached_json(request, user_id, "habits", lambda: fetch_user_habits(user_id), HABITS_ADAPTER)
+
+@app.get("/api/v1/dashboard/{user_id}", response_model=schemas.Dashboard)
+async def get_dashboard(user_id: str, request: Request, day: Optional[date] = None):
+    """
+    Active habits plus whether each one is done on `day` (default: today).
+    Habits and logs are fetched at the same time, not one after the other.
+    Cached and ETagged per day, like get_user_habits.
+    """
+    day = day or date.today()
+
+    async def load():
+        return {"date": day, "habits": await fetch_dashboard(user_id, day)}
+
+    return await cached_json(request, user_id, f"dashboard:{day}", load, DASHBOARD_ADAPTER)
+
+@app.get("/api/v1/due/{user_id}", response_model=schemas.Due)
+async def get_due(user_id: str, request: Request, day: Optional[date] = None):
+    """
+    Active habits with their state on `day` (default: today), from their frequency:
+    done, due, satisfied (Weekly, already done this week) or rest (Weekdays, weekend).
+    One habits query + one query for the week's logs, run at the same time.
+    """
+    from utils.schedule import annotate, week_start
+
+    day = day or date.today()
+
+    async def load():
+        habits, logs = await asyncio.gather(
+            fetch_user_habits(user_id, active_only=True),
+            fetch_user_logs(user_id, start_date=week_start(day), end_date=day),
+        )
+        return {"date": day, "habits": annotate(habits, logs, day)}
+
+    return await cached_json(request, user_id, f"due:{day}", load, DUE_ADAPTER)
+
+@app.post("/api/v1/habits/{user_id}/logs/bulk", response_model=List[schemas.LogChangeResult])
+async def bulk_set_logs(user_id: str, request: schemas.BulkLogRequest):
+    """
+    Checks/unchecks many (habit, date) pairs in one call (backfills, device sync).
+    Idempotent: sending the same changes twice never creates duplicate logs.
+    Returns one result per change, in the same order.
+    """
+    changes = [change.model_dump() for change in request.changes]
+    results = await bulk_set_habit_logs(changes, user_id=user_id)
+    invalidate_user(user_id) # We know the owner here, even if the habits were never read in this process
+    return results
+
+# 4. Export / import of a user's whole history (pyarrow is only loaded here)
+@app.get("/api/v1/habits/{user_id}/export")
+async def export_history(user_id: str, format: str = "arrow"):
+    """
+    Streams the user's habits and logs as an Arrow IPC stream (default)
+    or a Parquet file, one batch at a time.
+    """
+    from utils.transfer import FORMATS, stream_user_data
+
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    extension = "arrows" if format == "arrow" else "parquet"
+    return StreamingResponse(
+        stream_user_data(user_id, format),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="habits_{user_id}.{extension}"'},
+    )
+
+@app.post("/api/v1/habits/{user_id}/import", response_model=schemas.ImportSummary)
+async def import_history(user_id: str, request: Request, format: str = "parquet"):
+    """
+    Imports a Parquet or CSV file sent as the raw request body.
+    The upload is spooled to disk (not held in memory) and imported in
+    chunks on a worker thread. Re-sending the same file changes nothing.
     """
-    supabase = get_db_connection()
+    from utils.transfer import import_user_data
 
-    # Query the database
-    response = supabase.table("habits").select("*").eq("user_id", user_id).execute()
+    if format not in ("parquet", "csv"):
+        raise HTTPException(status_code=400, detail="format must be parquet or csv")
 
-    return response.data
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await asyncio.to_thread(import_user_data, user_id, upload, format)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not read {format} file: {e}")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import date
 
 # 1. The "Base" model (shared fields)
@@ -20,4 +20,59 @@ class Habit(HabitBase):
 
     class Config:
         # This tells Pydantic to treat database rows like dictionaries
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 4. Dashboard models (habits + whether each one is done on the given day)
+class DashboardHabit(Habit):
+    done: bool
+
+class Dashboard(BaseModel):
+    date: date
+    habits: List[DashboardHabit]
+
+# 5. "Due today" models (habits + their state from their frequency, see utils/schedule.py)
+class DueHabit(Habit):
+    state: str # done / due / satisfied / rest
+    done: bool
+    days_left: int # days still open in the habit's period (0 on a rest day)
+
+class Due(BaseModel):
+    date: date
+    habits: List[DueHabit]
+
+
+# 6. Bulk toggle / backfill models
+class LogChange(BaseModel):
+    habit_id: int
+    date: date
+    done: bool
+
+class BulkLogRequest(BaseModel):
+    changes: List[LogChange]
+
+class LogChangeResult(LogChange):
+    status: str # inserted / deleted / unchanged / superseded / error
+    error: Optional[str] = None
+
+
+# 7. Import / export models (one row per habit, or per habit + completed day)
+OptionalDate = Optional[date] # A field named "date" would shadow the type inside the class
+# The values the app's forms offer (anything else breaks Manage Habits and the streak engine)
+Category = Literal["Health", "Career", "Learning", "Mindfulness", "Other"]
+Frequency = Literal["Daily", "Weekly", "Weekdays"]
+
+class ImportRow(BaseModel):
+    name: str
+    category: Category = "Other"
+    frequency: Frequency = "Daily"
+    is_active: bool = True
+    date: OptionalDate = None # Empty = just the habit definition
+
+class ImportSummary(BaseModel):
+    rows_read: int = 0
+    rows_rejected: int = 0
+    habits_created: int = 0
+    logs_inserted: int = 0
+    logs_unchanged: int = 0
+    logs_failed: int = 0
+    errors: List[str] = [] # The first few problems, for display
@@ -0,0 +1,60 @@
+"""
+Password hashing throughput: logins (hash checks) per second, per core,
+at the configured scrypt cost (HABIT_SCRYPT_N / _R / _P).
+
+    python -m benchmarks.hash_benchmark
+    HABIT_SCRYPT_N=32768 python -m benchmarks.hash_benchmark --workers 1 2 4 --seconds 5
+
+Prints one JSON object per worker count, plus the legacy SHA-256 baseline.
+Pick the highest cost that keeps a single check well under ~100 ms and the
+logins/s at your core count above the expected peak.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import security
+
+def run(workers, seconds, check):
+    """
+    Checks one password against its hash as fast as `workers` threads can, for ~`seconds`.
+    """
+    hashed = security._make_hash("correct horse battery staple")
+    done = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while time.perf_counter() - started < seconds:
+            results = list(pool.map(lambda _: check("correct horse battery staple", hashed), range(workers * 4)))
+            assert all(results)
+            done += len(results)
+    wall = time.perf_counter() - started
+    return done, wall
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark password hash checks per second.")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, security.HASH_WORKERS, os.cpu_count() or 1}))
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    cost = {"n": security.SCRYPT_N, "r": security.SCRYPT_R, "p": security.SCRYPT_P,
+            "memory_mb": round(128 * security.SCRYPT_N * security.SCRYPT_R * security.SCRYPT_P / 2 ** 20, 1)}
+
+    for workers in args.workers:
+        done, wall = run(workers, args.seconds, security._check_hash)
+        print(json.dumps({
+            "scheme": "scrypt",
+            "cost": cost,
+            "workers": workers,
+            "cores": os.cpu_count(),
+            "logins_per_second": round(done / wall, 1),
+            "logins_per_second_per_worker": round(done / wall / workers, 1),
+            "ms_per_check": round(wall * 1000 * workers / done, 2),
+        }))
+
+    done, wall = run(1, min(args.seconds, 1.0), lambda password, hashed: security._legacy_hash(password) is not None)
+    print(json.dumps({"scheme": "sha256 (legacy)", "workers": 1, "logins_per_second": round(done / wall, 1)}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold-start profile of the two entry points: how long a fresh interpreter
+takes to import them and how much memory it holds afterwards.
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --runs 5 --top 15 --output imports.json
+
+Each run is a brand new `python -X importtime` process, so nothing is cached
+in sys.modules. Results are JSON (like run_benchmarks) so runs can be diffed.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# What each entry point imports before it can serve its first request / page.
+# login_page runs the real main.py in Streamlit's bare mode (no server, a fresh
+# session), which draws the Login page: any import added to that path shows up here.
+# Then what pressing Login / Sign Up imports on top.
+ENTRY_POINTS = {
+    "backend": "import backend.main",
+    "login_page": (
+        "import runpy\n"
+        "runpy.run_path('main.py', run_name='__main__')\n"
+        "from database.queries import create_user, verify_login"
+    ),
+}
+HEAVY_MODULES = ["streamlit", "pandas", "numpy", "plotly", "pyarrow", "pyroaring"]
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec({code!r})
+wall = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "wall_ms": wall * 1000,
+    "max_rss_mb": rss / 1024 if sys.platform != "darwin" else rss / 1024 / 1024,
+    "heavy_loaded": [name for name in {heavy!r} if name in sys.modules],
+    "modules": len(sys.modules),
+}}))
+"""
+
+def parse_importtime(stderr):
+    """
+    Turns `-X importtime` output into {module: cumulative microseconds}.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip() # Indentation marks nesting; we only want the name
+        cumulative[name] = max(cumulative.get(name, 0), int(cumulative_us))
+    return cumulative
+
+def profile_once(code):
+    probe = PROBE.format(code=code, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats["imports_us"] = parse_importtime(result.stderr)
+    return stats
+
+def profile(name, code, runs, top):
+    samples = [profile_once(code) for _ in range(runs)]
+    slowest = sorted(samples[-1]["imports_us"].items(), key=lambda item: item[1], reverse=True)
+    return {
+        "entry_point": name,
+        "runs": runs,
+        "wall_ms": round(statistics.median(s["wall_ms"] for s in samples), 1),
+        "max_rss_mb": round(statistics.median(s["max_rss_mb"] for s in samples), 1),
+        "modules": samples[-1]["modules"],
+        "heavy_loaded": samples[-1]["heavy_loaded"],
+        "slowest_imports_ms": {module: round(us / 1000, 1) for module, us in slowest[:top]},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile cold-start import time and memory of the entry points.")
+    parser.add_argument("--entry", nargs="+", choices=sorted(ENTRY_POINTS), default=sorted(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per entry point (median is reported)")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.entry:
+        result = profile(name, ENTRY_POINTS[name], args.runs, args.top)
+        results.append(result)
+        print(f"{name:<12} {result['wall_ms']:>8.1f} ms  {result['max_rss_mb']:>7.1f} MB  "
+              f"heavy: {', '.join(result['heavy_loaded']) or '-'}", file=sys.stderr)
+
+    report = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Concurrent load test for the FastAPI backend.
+
+Start the API first:
+    uvicorn backend.main:app --workers 1
+Then:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --user-id <id> --concurrency 50 --duration 20
+
+Prints one JSON object with requests/sec and latency percentiles per endpoint,
+so runs before/after a change can be compared (one worker = per-worker throughput).
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+async def run_endpoint(client, path, concurrency, duration):
+    """
+    Keeps `concurrency` requests in flight against one path for `duration` seconds.
+    """
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+async def main(args):
+    paths = [f"/api/v1/habits/{args.user_id}", f"/api/v1/dashboard/{args.user_id}"]
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        results = [await run_endpoint(client, path, args.concurrency, args.duration) for path in paths]
+    print(json.dumps({"url": args.url, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the habit tracker API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0)
+    asyncio.run(main(parser.parse_args()))
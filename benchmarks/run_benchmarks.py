@@ -0,0 +1,160 @@
+"""
+Round-trip and wall-time benchmarks for the query and analytics paths,
+run against the in-process FakeSupabase (no network, no Supabase project).
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --habits 5 50 200 --days 30 365 1825 --latency 0.02 --output bench.json
+
+Every result is one JSON object (scenario, sizes, round trips per table/op,
+wall time), so two runs can be diffed to spot regressions.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from database.db_connection import install_client
+from database.fake_supabase import FakeSupabase, AsyncFakeSupabase
+
+CATEGORIES = ["Health", "Career", "Learning", "Mindfulness", "Other"]
+FREQUENCIES = ["Daily", "Weekly", "Weekdays"]
+
+def seed(fake, n_habits, n_days, other_users=1, completion=0.7, rng_seed=42):
+    """
+    Loads one measured user (plus `other_users` with the same volume, so
+    queries that forget to filter by user get slower) straight into the fake.
+    Returns the measured user's id.
+    """
+    rng = random.Random(rng_seed)
+    today = date.today()
+    user_ids = []
+
+    for u in range(1 + other_users):
+        user = fake.bulk_load("users", [{"username": f"bench_{u}", "password_hash": "x"}])[0]
+        user_ids.append(user["user_id"])
+        habits = fake.bulk_load("habits", [
+            {
+                "user_id": user["user_id"],
+                "name": f"Habit {i}",
+                "category": CATEGORIES[i % len(CATEGORIES)],
+                "frequency": FREQUENCIES[i % len(FREQUENCIES)],
+                "created_at": (today - timedelta(days=n_days)).isoformat() + "T00:00:00+00:00",
+            }
+            for i in range(n_habits)
+        ])
+        logs = [
+            {"habit_id": habit["habit_id"], "date": (today - timedelta(days=d)).isoformat()}
+            for d in range(n_days)
+            for habit in habits
+            if rng.random() < completion
+        ]
+        fake.bulk_load("tracker_logs", logs)
+
+    return user_ids[0]
+
+def measure(fake, scenario, fn, **info):
+    """
+    Runs fn() once and reports its round trips and wall time.
+    """
+    before = dict(fake.calls)
+    start = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - start
+
+    calls = {
+        f"{table}.{op}": count - before.get((table, op), 0)
+        for (table, op), count in fake.calls.items()
+        if count - before.get((table, op), 0)
+    }
+    return dict(
+        info,
+        scenario=scenario,
+        round_trips=sum(calls.values()),
+        calls=calls,
+        wall_ms=round(wall * 1000, 3),
+    )
+
+def reset_caches(user_id, habit_ids):
+    from utils.cache import invalidate_user
+    from utils.rollups import forget_habits
+
+    invalidate_user(user_id)
+    forget_habits(habit_ids)
+
+def run_size(n_habits, n_days, latency, other_users):
+    from database import write_behind
+    from database.async_db import install_async_client
+    from database.queries import get_user_habits
+    from utils.analytics import get_habit_stats, get_day_of_week_stats, get_streak_stats
+
+    fake = FakeSupabase(latency=0)
+    install_client(fake)
+    user_id = seed(fake, n_habits, n_days, other_users=other_users)
+    habit_ids = [habit["habit_id"] for habit in get_user_habits(user_id, active_only=False)]
+    fake.latency = latency
+    info = {
+        "habits": n_habits,
+        "days": n_days,
+        "log_rows": len(fake.tables["tracker_logs"]),
+        "latency_ms": latency * 1000,
+    }
+    results = []
+
+    # 1. Dashboard render: habits + today's status (replica forced cold)
+    write_behind.QUEUE_PATH = os.path.join(tempfile.mkdtemp(), "queue.sqlite3")
+    def dashboard():
+        habits = get_user_habits(user_id, active_only=True)
+        write_behind.get_local_history([habit["habit_id"] for habit in habits], date.today(), max_age=0)
+    results.append(measure(fake, "dashboard_render", dashboard, **info))
+
+    # 2. Analytics render, cold caches then warm
+    def analytics():
+        get_habit_stats(user_id)
+        get_streak_stats(user_id)
+        get_day_of_week_stats(user_id)
+    reset_caches(user_id, habit_ids)
+    results.append(measure(fake, "analytics_render_cold", analytics, **info))
+    results.append(measure(fake, "analytics_render_warm", analytics, **info))
+
+    # 3. FastAPI endpoints (through the ASGI app, async fake sharing the data)
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    install_async_client(AsyncFakeSupabase(latency=latency, shared=fake))
+    with TestClient(app) as client:
+        results.append(measure(fake, "api_habits", lambda: client.get(f"/api/v1/habits/{user_id}").raise_for_status(), **info))
+        results.append(measure(fake, "api_dashboard", lambda: client.get(f"/api/v1/dashboard/{user_id}").raise_for_status(), **info))
+    install_client(fake) # The app lifespan closed the shared client on exit
+
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark query/analytics paths against FakeSupabase.")
+    parser.add_argument("--habits", type=int, nargs="+", default=[5, 25, 100])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of fake network latency per round trip")
+    parser.add_argument("--other-users", type=int, default=1, help="extra users with the same data volume")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n_habits in args.habits:
+        for n_days in args.days:
+            for result in run_size(n_habits, n_days, args.latency, args.other_users):
+                results.append(result)
+                print(f"{result['scenario']:<22} habits={n_habits:<4} days={n_days:<5} "
+                      f"trips={result['round_trips']:<4} {result['wall_ms']:>10.1f} ms", file=sys.stderr)
+
+    report = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
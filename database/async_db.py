@@ -0,0 +1,181 @@
+import asyncio
+import httpx
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from database.config import get_credentials, POOL_SIZE, KEEPALIVE_SIZE, CONNECT_TIMEOUT, REQUEST_TIMEOUT
+from database.db_connection import create_fake_client
+from database.resilience import aguarded, aread_through
+from utils.cache import remember_habits
+from utils.metrics import instrument
+from database.queries import (
+    LOG_PAGE_SIZE, plan_log_changes, log_change_batches, log_change_query,
+    record_log_batch, finish_log_results
+)
+
+# Async data-access layer for the FastAPI backend.
+# Same shared-pool idea as db_connection.py, but with the async supabase client,
+# so an endpoint awaiting Supabase doesn't hold a worker thread.
+
+_async_client = None
+_async_lock = asyncio.Lock()
+
+async def create_async_db_client(pool_size=None, timeout=None) -> AsyncClient:
+    """
+    Creates a new async Supabase client with its own pooled httpx.AsyncClient.
+    """
+    url, key = get_credentials()
+    if url.startswith("fake://"):
+        return create_fake_client(url, is_async=True)
+
+    pool_size = pool_size or POOL_SIZE
+    timeout = timeout or REQUEST_TIMEOUT
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=min(KEEPALIVE_SIZE, pool_size),
+        ),
+        timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+        follow_redirects=True,
+        http2=True,
+    )
+    options = AsyncClientOptions(httpx_client=http_client, postgrest_client_timeout=timeout)
+    return await acreate_client(url, key, options=options)
+
+async def get_async_db() -> AsyncClient:
+    """
+    Returns the shared async client (created on first use, or by open_async_db()).
+    """
+    global _async_client
+
+    if _async_client is not None:
+        return _async_client
+
+    async with _async_lock:
+        if _async_client is None:
+            _async_client = instrument(await create_async_db_client())
+    return _async_client
+
+def install_async_client(client):
+    """
+    Makes get_async_db() return `client` (an AsyncFakeSupabase in benchmarks).
+    """
+    global _async_client
+    _async_client = instrument(client)
+
+async def open_async_db():
+    """
+    Called from the FastAPI lifespan at startup.
+    """
+    await get_async_db()
+
+async def close_async_db():
+    """
+    Called from the FastAPI lifespan at shutdown.
+    """
+    global _async_client
+
+    async with _async_lock:
+        http_client = getattr(getattr(_async_client, "options", None), "httpx_client", None)
+        if http_client is not None:
+            await http_client.aclose()
+        _async_client = None
+
+# --- QUERIES ---
+
+async def fetch_user_habits(user_id, active_only=False):
+    """
+    Async version of queries.get_user_habits: coalesced, behind the breaker,
+    with the last good list as fallback. Errors propagate when there is none.
+    The list is shared with concurrent callers: don't mutate it.
+    """
+    async def load():
+        supabase = await get_async_db()
+        query = supabase.table("habits").select("*").eq("user_id", user_id)
+        if active_only:
+            query = query.eq("is_active", True)
+        response = await aguarded(query)
+        remember_habits(user_id, [habit["habit_id"] for habit in response.data]) # So habit_id-only writes find our caches
+        return response.data
+
+    return await aread_through(("habits", user_id, active_only), load)
+
+async def iter_user_logs(user_id, start_date=None, end_date=None, page_size=LOG_PAGE_SIZE):
+    """
+    Yields a user's logs one page at a time, filtered on the server by
+    joining to habits (keyset pagination on log_id, like iter_habit_logs).
+    """
+    supabase = await get_async_db()
+    last_log_id = None
+
+    while True:
+        query = (
+            supabase.table("tracker_logs")
+            .select("log_id, habit_id, date, habits!inner(user_id)")
+            .eq("habits.user_id", user_id)
+        )
+        if start_date is not None:
+            query = query.gte("date", str(start_date))
+        if end_date is not None:
+            query = query.lte("date", str(end_date))
+        if last_log_id is not None:
+            query = query.gt("log_id", last_log_id)
+
+        page = (await aguarded(query.order("log_id").limit(page_size))).data
+        if page:
+            yield [{"log_id": row["log_id"], "habit_id": row["habit_id"], "date": row["date"]} for row in page]
+
+        if len(page) < page_size:
+            break
+        last_log_id = page[-1]["log_id"]
+
+async def fetch_user_logs(user_id, start_date=None, end_date=None, page_size=LOG_PAGE_SIZE):
+    """
+    All of a user's logs, filtered on the server by joining to habits.
+    Because it filters by user_id (not by habit_ids) it doesn't need the
+    habits first, so it can run at the same time as fetch_user_habits().
+    """
+    rows = []
+    async for page in iter_user_logs(user_id, start_date, end_date, page_size):
+        rows.extend(page)
+    return rows
+
+async def fetch_dashboard(user_id, day):
+    """
+    Habits + the day's logs for the Dashboard, fetched CONCURRENTLY.
+    Returns the active habits, each with a "done" flag.
+    """
+    async def load():
+        habits, logs = await asyncio.gather(
+            fetch_user_habits(user_id, active_only=True),
+            fetch_user_logs(user_id, start_date=day, end_date=day),
+        )
+        done_ids = {row["habit_id"] for row in logs}
+        return [dict(habit, done=habit["habit_id"] in done_ids) for habit in habits]
+
+    return await aread_through(("dashboard", user_id, str(day)), load)
+
+async def bulk_set_habit_logs(changes, user_id=None):
+    """
+    Async version of queries.bulk_set_habit_logs (same planning and results).
+    If user_id is given, changes to habits that user doesn't own are rejected.
+    """
+    plan, items = plan_log_changes(changes)
+    statuses = {}
+
+    if user_id is not None and plan:
+        owned = {habit["habit_id"] for habit in await fetch_user_habits(user_id)}
+        for key in [key for key in plan if key[0] not in owned]:
+            statuses[key] = ("error", "habit not found for this user")
+            del plan[key]
+
+    supabase = await get_async_db()
+    for kind, keys in log_change_batches(plan):
+        try:
+            rows = (await log_change_query(supabase, kind, keys).execute()).data
+        except Exception as e:
+            for key in keys:
+                statuses[key] = ("error", str(e))
+            continue
+        record_log_batch(kind, keys, rows, statuses)
+
+    return finish_log_results(items, statuses)
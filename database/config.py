@@ -0,0 +1,47 @@
+import os
+from dotenv import load_dotenv
+
+# Framework-neutral settings for the Supabase client.
+# Nothing here imports Streamlit (or any other UI framework), so the FastAPI
+# backend, scripts and workers can use it without paying for it.
+# A frontend can plug in its own secrets store with register_secrets_provider()
+# (see database/streamlit_secrets.py).
+
+# 1. Load environment variables from .env file (if present)
+load_dotenv()
+
+# 2. Connection pool settings (override them with env vars)
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+KEEPALIVE_SIZE = int(os.getenv("SUPABASE_KEEPALIVE_SIZE", str(POOL_SIZE)))
+CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "15"))
+
+# 3. Extra places to look for credentials, tried in order after the env vars
+_secrets_providers = []
+
+def register_secrets_provider(provider):
+    """
+    Adds a function returning (url, key), or None when it has no credentials.
+    Registering the same function twice is a no-op (safe on every Streamlit rerun).
+    """
+    if provider not in _secrets_providers:
+        _secrets_providers.append(provider)
+    return provider
+
+def get_credentials():
+    """
+    Finds the Supabase URL and key.
+    Tries environment variables / .env first (Backend mode), then every
+    registered secrets provider (e.g. st.secrets in Frontend mode).
+    """
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if url and key:
+        return url, key
+
+    for provider in _secrets_providers:
+        credentials = provider()
+        if credentials:
+            return credentials
+
+    raise ValueError("❌ SUPABASE_URL and SUPABASE_KEY not found in .env or secrets.toml")
@@ -1,27 +1,117 @@
 import os
-import streamlit as st
-from supabase import create_client, Client
-from dotenv import load_dotenv
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
+from database.config import (
+    get_credentials, POOL_SIZE, KEEPALIVE_SIZE, CONNECT_TIMEOUT, REQUEST_TIMEOUT
+)
+from utils.metrics import instrument
 
-# 1. Load environment variables from .env file (if present)
-load_dotenv()
+# 1. The ONE shared client for this process (Streamlit reruns and FastAPI requests reuse it)
+# Settings and credentials live in database/config.py (no Streamlit import here).
+_client = None
+_http_client = None
+_client_lock = threading.Lock()
+
+def make_http_client(pool_size=None, timeout=None):
+    """
+    Builds a pooled, keep-alive httpx client that all Supabase sub-clients share.
+    """
+    pool_size = pool_size or POOL_SIZE
+    timeout = timeout or REQUEST_TIMEOUT
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=min(KEEPALIVE_SIZE, pool_size),
+        ),
+        timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+        follow_redirects=True,
+        http2=True,
+    )
+
+def create_db_client(pool_size=None, timeout=None) -> Client:
+    """
+    Creates a brand new Supabase client with its own connection pool.
+    Most code should call get_db_connection() instead, which reuses one client.
+    """
+    url, key = get_credentials()
+    if url.startswith("fake://"):
+        return create_fake_client(url)
+
+    http_client = make_http_client(pool_size, timeout)
+    options = ClientOptions(
+        httpx_client=http_client,
+        postgrest_client_timeout=timeout or REQUEST_TIMEOUT,
+    )
+    return create_client(url, key, options=options)
+
+def create_fake_client(url, is_async=False):
+    """
+    SUPABASE_URL=fake:// -> in-process FakeSupabase (see fake_supabase.py).
+    SUPABASE_URL=fake:///path/to/snapshot.pkl loads saved data into it.
+    """
+    from database.fake_supabase import FakeSupabase, AsyncFakeSupabase
+
+    latency = float(os.getenv("FAKE_SUPABASE_LATENCY", "0"))
+    if is_async:
+        # The async fake serves the SAME data as the sync one
+        return AsyncFakeSupabase(latency=latency, shared=get_db_connection())
+
+    snapshot = url[len("fake://"):]
+    if snapshot:
+        return FakeSupabase.load(snapshot, latency=latency)
+    return FakeSupabase(latency=latency)
+
+def install_client(client):
+    """
+    Makes get_db_connection() return `client` (a FakeSupabase in benchmarks).
+    """
+    global _client, _http_client
+
+    with _client_lock:
+        _client = instrument(client)
+        _http_client = None
 
 def get_db_connection() -> Client:
     """
-    Creates a Supabase client.
-    Tries to load credentials from .env first (Backend mode).
-    Falls back to st.secrets if .env is missing (Frontend mode).
+    Returns the shared Supabase client for this process.
+    The first call creates it; every later call reuses the same pooled
+    HTTP connections (no new TLS handshake per query).
+    """
+    global _client, _http_client
+
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        # Another thread may have created it while we waited for the lock
+        if _client is None:
+            _client = instrument(create_db_client()) # Times and counts every call
+            _http_client = getattr(getattr(_client, "options", None), "httpx_client", None)
+    return _client
+
+def close_db_connection():
     """
-    # Try getting from standard environment variables (Backend/FastAPI)
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
+    Closes the shared client's connection pool (FastAPI calls this on shutdown).
+    The next get_db_connection() call will create a fresh one.
+    """
+    global _client, _http_client
 
-    # If not found, try Streamlit secrets (Frontend/Streamlit)
-    if not url or not key:
-        try:
-            url = st.secrets["supabase"]["url"]
-            key = st.secrets["supabase"]["key"]
-        except FileNotFoundError:
-            raise ValueError("❌ SUPABASE_URL and SUPABASE_KEY not found in .env or secrets.toml")
+    with _client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        _client = None
+        _http_client = None
 
-    return create_client(url, key)
\ No newline at end of file
+def check_db_connection():
+    """
+    Runs a tiny query to prove the database is reachable.
+    Returns (True, message) or (False, error message).
+    """
+    try:
+        supabase = get_db_connection()
+        supabase.table("users").select("user_id").limit(1).execute()
+        return True, "Connected to Database!"
+    except Exception as e:
+        return False, f"Database connection failed: {e}"
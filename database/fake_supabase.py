@@ -0,0 +1,524 @@
+import asyncio
+import operator
+import pickle
+import re
+import threading
+import time
+from collections import Counter
+
+# In-process stand-in for the subset of supabase-py the app uses:
+#   client.table(name).select/insert/upsert/update/delete
+#       .eq/neq/gt/gte/lt/lte/in_/or_/order/limit/range
+#       .execute()
+#   client.rpc(name, params).execute()
+# It counts round trips (one per execute) and can sleep `latency` seconds per
+# call, so benchmarks can measure how many trips a page makes and what that
+# costs at a given network latency. No network, no Supabase project needed.
+#
+# Use it with:  SUPABASE_URL=fake://            (empty database)
+#               SUPABASE_URL=fake:///path.pkl   (load a snapshot saved with .save())
+# or install it directly with db_connection.install_client(FakeSupabase()).
+
+PRIMARY_KEYS = {"users": "user_id", "habits": "habit_id", "tracker_logs": "log_id"}
+UNIQUE_KEYS = {"users": ("username",), "tracker_logs": ("habit_id", "date"), "habit_rollups": ("habit_id",)}
+DEFAULTS = {
+    "habits": lambda: {"is_active": True, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())},
+    "tracker_logs": lambda: {"status": "completed"},
+}
+CASCADES = {"habits": [("tracker_logs", "habit_id"), ("habit_rollups", "habit_id")], "users": [("habits", "user_id")]}
+INDEXED_COLUMNS = {"habits": ("user_id", "habit_id"), "tracker_logs": ("habit_id",), "users": ("username", "user_id")}
+
+class FakeAPIError(Exception):
+    """
+    Looks like postgrest.APIError (has .code and .message).
+    """
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _same(value, target):
+    # PostgREST compares as text on the wire, so 5 == "5"
+    return value == target or str(value) == str(target)
+
+def _ordered(value, target):
+    if isinstance(value, (int, float)) and isinstance(target, str):
+        try:
+            target = type(value)(target)
+        except ValueError:
+            pass
+    if isinstance(target, (int, float)) and isinstance(value, str):
+        value = str(value)
+        target = str(target)
+    return value, target
+
+_ORDERING = {"gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+def _compare(op, value, target):
+    if value is None:
+        return op == "is" and target in (None, "null")
+    if op == "eq":
+        return _same(value, target)
+    if op == "neq":
+        return not _same(value, target)
+    if op == "in":
+        return any(_same(value, item) for item in target)
+    if type(value) is not type(target):
+        value, target = _ordered(value, target)
+    return _ORDERING[op](value, target)
+
+def _parse_or(expression):
+    """
+    Parses or=(...) filters: "and(a.eq.1,b.in.(1,2)),c.eq.3" -> list of AND-groups.
+    """
+    groups = []
+    for part in re.findall(r"and\((.*?\)?)\)(?:,|$)|([^,()]+\.[a-z]+\.[^,()]+)", expression):
+        body = part[0] or part[1]
+        conditions = []
+        for column, op, value in re.findall(r"([\w.]+)\.(eq|neq|gt|gte|lt|lte|in)\.(\([^)]*\)|[^,]+)", body):
+            if op == "in":
+                value = [item for item in value.strip("()").split(",") if item]
+            conditions.append((column, op, value))
+        groups.append(conditions)
+    return groups
+
+class FakeQuery:
+    """
+    One chained request. Mirrors the postgrest builder API closely enough
+    for database/queries.py, utils/analytics.py, seed_data.py and the backend.
+    """
+
+    def __init__(self, db, table, is_async=False):
+        self.db = db
+        self.table = table
+        self.is_async = is_async
+        self.operation = "select"
+        self.columns = "*"
+        self.count = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        self.or_groups = []
+        self.order_by = []
+        self.limit_count = None
+        self.offset = 0
+
+    # --- OPERATIONS ---
+
+    def select(self, *columns, count=None):
+        self.operation = "select"
+        self.columns = ",".join(columns) if columns else "*"
+        self.count = count
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.operation, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict="", ignore_duplicates=False, **kwargs):
+        self.operation, self.payload = "upsert", rows
+        self.on_conflict = tuple(col.strip() for col in on_conflict.split(",") if col.strip())
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values, **kwargs):
+        self.operation, self.payload = "update", values
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    # --- FILTERS / MODIFIERS ---
+
+    def _filter(self, op, column, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value): return self._filter("eq", column, value)
+    def neq(self, column, value): return self._filter("neq", column, value)
+    def gt(self, column, value): return self._filter("gt", column, value)
+    def gte(self, column, value): return self._filter("gte", column, value)
+    def lt(self, column, value): return self._filter("lt", column, value)
+    def lte(self, column, value): return self._filter("lte", column, value)
+    def in_(self, column, values): return self._filter("in", column, list(values))
+
+    def or_(self, expression, **kwargs):
+        self.or_groups.append(_parse_or(expression))
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.limit_count = count
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset = start
+        self.limit_count = end - start + 1
+        return self
+
+    # --- EXECUTION ---
+
+    def execute(self):
+        if self.is_async:
+            return self._execute_async()
+        self.db._round_trip(self.table, self.operation)
+        return self._run()
+
+    async def _execute_async(self):
+        await self.db._async_round_trip(self.table, self.operation)
+        return self._run()
+
+    def _run(self):
+        with self.db.lock:
+            return getattr(self, f"_run_{self.operation}")()
+
+    def _embedded(self):
+        """
+        "log_id, habit_id, habits!inner(user_id)" -> (["log_id", "habit_id"], {"habits": ["user_id"]})
+        """
+        plain, embedded = [], {}
+        for match in re.finditer(r"(\w+)(?:!inner)?\(([^)]*)\)|([\w*]+)", self.columns):
+            if match.group(1):
+                embedded[match.group(1)] = [col.strip() for col in match.group(2).split(",")]
+            else:
+                plain.append(match.group(3))
+        return plain, embedded
+
+    def _with_joins(self, row, embedded):
+        row = dict(row)
+        for table in embedded:
+            key = PRIMARY_KEYS[table]
+            row[table] = self.db._by_key(table, row.get(key))
+        return row
+
+    def _matches(self, row, skip=None):
+        for position, (column, op, value) in enumerate(self.filters):
+            if position == skip:
+                continue # Already applied through a column index
+            if not _compare(op, self._lookup(row, column), value):
+                return False
+        for groups in self.or_groups:
+            if not any(all(_compare(op, self._lookup(row, column), value) for column, op, value in group) for group in groups):
+                return False
+        return True
+
+    @staticmethod
+    def _lookup(row, column):
+        if "." in column:
+            table, column = column.split(".", 1)
+            return (row.get(table) or {}).get(column)
+        return row.get(column)
+
+    def _candidates(self):
+        """
+        Uses a column index for the first eq/in filter on an indexed column,
+        so a query for one user's logs doesn't scan every row in the table.
+        """
+        for position, (column, op, value) in enumerate(self.filters):
+            if op in ("eq", "in") and column in INDEXED_COLUMNS.get(self.table, ()):
+                index = self.db._column_index(self.table, column)
+                values = value if op == "in" else [value]
+                rows = []
+                for item in values:
+                    rows.extend(index.get(str(item), []))
+                if op == "in" and len(values) > 1:
+                    key = PRIMARY_KEYS[self.table]
+                    rows.sort(key=lambda row: row[key]) # Keep table (insertion) order
+                return rows, position
+        return self.db.tables.setdefault(self.table, []), None
+
+    def _matching_rows(self, embedded=None):
+        rows, skip = self._candidates()
+        if embedded:
+            rows = [self._with_joins(row, embedded) for row in rows]
+            rows = [row for row in rows if all(row[table] is not None for table in embedded)]
+        return [row for row in rows if self._matches(row, skip)]
+
+    def _run_select(self):
+        plain, embedded = self._embedded()
+        rows = self._matching_rows(embedded)
+        total = len(rows)
+
+        for column, desc in reversed(self.order_by):
+            if column == PRIMARY_KEYS.get(self.table) and not desc:
+                continue # Rows are already stored in primary key order
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+
+        # PostgREST caps every response at max_rows
+        limit = min(self.limit_count or self.db.max_rows, self.db.max_rows)
+        rows = rows[self.offset:self.offset + limit]
+
+        data = []
+        for row in rows:
+            out = dict(row) if "*" in plain else {column: row.get(column) for column in plain}
+            for table, columns in embedded.items():
+                joined = row[table]
+                out[table] = dict(joined) if "*" in columns else {column: joined.get(column) for column in columns}
+            data.append(out)
+        return FakeResponse(data, total if self.count else None)
+
+    def _run_insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for row in rows:
+            unique = UNIQUE_KEYS.get(self.table)
+            if unique and self.db._find_unique(self.table, row, unique) is not None:
+                raise FakeAPIError(f"duplicate key value violates unique constraint on {self.table}", code="23505")
+            inserted.append(self.db._insert_row(self.table, row))
+        return FakeResponse(inserted)
+
+    def _run_upsert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        conflict = self.on_conflict or (PRIMARY_KEYS.get(self.table),)
+        written = []
+        for row in rows:
+            existing = self.db._find_unique(self.table, row, conflict)
+            if existing is None:
+                written.append(self.db._insert_row(self.table, row))
+            elif not self.ignore_duplicates:
+                existing.update(row)
+                written.append(dict(existing))
+        return FakeResponse(written)
+
+    def _run_update(self):
+        rows = self._matching_rows()
+        keys = {row[PRIMARY_KEYS[self.table]] for row in rows}
+        updated = []
+        for row in self.db.tables.get(self.table, []):
+            if row[PRIMARY_KEYS[self.table]] in keys:
+                row.update(self.payload)
+                updated.append(dict(row))
+        self.db._reindex(self.table)
+        return FakeResponse(updated)
+
+    def _run_delete(self):
+        rows = self._matching_rows()
+        key = PRIMARY_KEYS[self.table]
+        doomed = {row[key] for row in rows}
+        kept, deleted = [], []
+        for row in self.db.tables.get(self.table, []):
+            (deleted if row[key] in doomed else kept).append(row)
+        self.db.tables[self.table] = kept
+        self.db._reindex(self.table)
+        self.db._cascade(self.table, deleted)
+        return FakeResponse(deleted)
+
+class FakeRPC:
+    def __init__(self, db, name, params, is_async=False):
+        self.db, self.name, self.params, self.is_async = db, name, params or {}, is_async
+
+    def execute(self):
+        if self.is_async:
+            return self._execute_async()
+        self.db._round_trip(self.name, "rpc")
+        return self._run()
+
+    async def _execute_async(self):
+        await self.db._async_round_trip(self.name, "rpc")
+        return self._run()
+
+    def _run(self):
+        function = self.db.functions.get(self.name)
+        if function is None:
+            raise FakeAPIError(f"Could not find the function public.{self.name}", code="PGRST202")
+        with self.db.lock:
+            return FakeResponse(function(self.db, **self.params))
+
+# --- SQL FUNCTIONS (Python versions of database/migrations/001) ---
+
+def _user_logs(db, p_user_id, p_start=None, p_end=None):
+    habits = {h["habit_id"]: h for h in db.tables.get("habits", []) if str(h["user_id"]) == str(p_user_id)}
+    logs = [
+        log for log in db.tables.get("tracker_logs", [])
+        if log["habit_id"] in habits
+        and (p_start is None or log["date"] >= p_start)
+        and (p_end is None or log["date"] <= p_end)
+    ]
+    return habits, logs
+
+def habit_completion_counts(db, p_user_id, p_start=None, p_end=None):
+    habits, logs = _user_logs(db, p_user_id, p_start, p_end)
+    counts = Counter(log["habit_id"] for log in logs)
+    return [
+        {"habit_id": habit_id, "name": habit["name"], "category": habit["category"], "count": counts[habit_id]}
+        for habit_id, habit in sorted(habits.items(), key=lambda item: item[1]["name"])
+    ]
+
+def habit_weekday_counts(db, p_user_id, p_start=None, p_end=None):
+    from datetime import date
+    habits, logs = _user_logs(db, p_user_id, p_start, p_end)
+    counts = Counter((log["habit_id"], date.fromisoformat(log["date"]).weekday()) for log in logs)
+    return [
+        {"habit_id": habit_id, "name": habits[habit_id]["name"], "weekday": weekday, "count": count}
+        for (habit_id, weekday), count in sorted(counts.items())
+    ]
+
+class FakeSupabase:
+    """
+    Fake sync client. `latency` = seconds slept per round trip.
+    """
+
+    is_async = False
+
+    def __init__(self, latency=0.0, max_rows=1000, rpc_functions=True):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.tables = {"users": [], "habits": [], "tracker_logs": []}
+        self.functions = {}
+        if rpc_functions:
+            self.functions = {
+                "habit_completion_counts": habit_completion_counts,
+                "habit_weekday_counts": habit_weekday_counts,
+            }
+        self.lock = threading.RLock()
+        self.calls = Counter()
+        self._next_id = Counter()
+        self._indexes = {}
+        self._versions = Counter()      # bumped on every write to a table
+        self._column_indexes = {}       # (table, column) -> (version, {value: [rows]})
+
+    # --- CLIENT API ---
+
+    def table(self, name):
+        return FakeQuery(self, name, is_async=self.is_async)
+
+    from_ = table
+
+    def rpc(self, name, params=None, *args, **kwargs):
+        return FakeRPC(self, name, params, is_async=self.is_async)
+
+    # --- ROUND-TRIP ACCOUNTING ---
+
+    @property
+    def round_trips(self):
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        self.calls.clear()
+
+    def _round_trip(self, table, operation):
+        with self.lock:
+            self.calls[(table, operation)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def _async_round_trip(self, table, operation):
+        with self.lock:
+            self.calls[(table, operation)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    # --- STORAGE HELPERS ---
+
+    def _insert_row(self, table, row):
+        row = dict(row)
+        for column, value in DEFAULTS.get(table, lambda: {})().items():
+            row.setdefault(column, value)
+        key = PRIMARY_KEYS.get(table)
+        if key and row.get(key) is None:
+            self._next_id[table] += 1
+            row[key] = self._next_id[table]
+        elif key:
+            self._next_id[table] = max(self._next_id[table], row[key])
+        self.tables.setdefault(table, []).append(row)
+        self._versions[table] += 1
+        if key:
+            self._indexes.setdefault(table, {})[row[key]] = row
+        unique = UNIQUE_KEYS.get(table)
+        if unique:
+            self._indexes.setdefault((table, unique), {})[tuple(str(row.get(col)) for col in unique)] = row
+        return dict(row)
+
+    def _column_index(self, table, column):
+        cached = self._column_indexes.get((table, column))
+        if cached is not None and cached[0] == self._versions[table]:
+            return cached[1]
+        index = {}
+        for row in self.tables.get(table, []):
+            index.setdefault(str(row.get(column)), []).append(row)
+        self._column_indexes[(table, column)] = (self._versions[table], index)
+        return index
+
+    def _reindex(self, table):
+        self._versions[table] += 1
+        key = PRIMARY_KEYS.get(table)
+        if key:
+            self._indexes[table] = {row[key]: row for row in self.tables[table]}
+        unique = UNIQUE_KEYS.get(table)
+        if unique:
+            self._indexes[(table, unique)] = {tuple(str(row.get(col)) for col in unique): row for row in self.tables[table]}
+
+    def _by_key(self, table, value):
+        return self._indexes.get(table, {}).get(value)
+
+    def _find_unique(self, table, row, columns):
+        index = self._indexes.get((table, tuple(columns)))
+        if index is not None:
+            return index.get(tuple(str(row.get(col)) for col in columns))
+        for existing in self.tables.get(table, []):
+            if all(_same(existing.get(col), row.get(col)) for col in columns):
+                return existing
+        return None
+
+    def _cascade(self, table, deleted):
+        for child, column in CASCADES.get(table, []):
+            keys = {row[PRIMARY_KEYS[table]] for row in deleted}
+            if not keys:
+                continue
+            gone = [row for row in self.tables.get(child, []) if row.get(column) in keys]
+            self.tables[child] = [row for row in self.tables.get(child, []) if row.get(column) not in keys]
+            self._reindex(child)
+            self._cascade(child, gone)
+
+    def bulk_load(self, table, rows):
+        """
+        Seeds rows directly (no round trips counted) - for benchmarks.
+        """
+        with self.lock:
+            return [self._insert_row(table, row) for row in rows]
+
+    # --- SNAPSHOTS ---
+
+    def save(self, path):
+        with self.lock, open(path, "wb") as f:
+            pickle.dump({"tables": self.tables, "next_id": dict(self._next_id)}, f)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        client = cls(**kwargs)
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        client.tables = snapshot["tables"]
+        client._next_id = Counter(snapshot["next_id"])
+        for table in client.tables:
+            client._reindex(table)
+        return client
+
+class AsyncFakeSupabase(FakeSupabase):
+    """
+    Same fake, but execute() is awaitable (stands in for the async client).
+    Pass `shared=` to serve the same data as an existing sync fake.
+    """
+
+    is_async = True
+
+    def __init__(self, latency=0.0, max_rows=1000, rpc_functions=True, shared=None):
+        super().__init__(latency=latency, max_rows=max_rows, rpc_functions=rpc_functions)
+        if shared is not None:
+            self.tables = shared.tables
+            self._indexes = shared._indexes
+            self._versions = shared._versions
+            self._column_indexes = shared._column_indexes
+            self._next_id = shared._next_id
+            self.lock = shared.lock
+            self.calls = shared.calls
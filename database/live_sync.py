@@ -0,0 +1,515 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import date, timedelta
+from database import write_behind
+from database.config import get_credentials
+from database.db_connection import get_db_connection
+from database.queries import HABIT_ID_CHUNK, get_user_habits, iter_habit_logs
+from utils.cache import (
+    invalidate_habit, invalidate_user, is_own_log_write, on_habits_changed, remember_habits
+)
+from utils.rollups import apply_log_delta, forget_habits
+
+# Live view of the logged-in users' data, kept current by change events
+# instead of refetching on every Streamlit rerun.
+# 1. Realtime: INSERT/UPDATE postgres_changes on habits (user_id=eq.X) and
+#    tracker_logs (habit_id=in.(...)), on an asyncio loop in a background thread.
+#    Needs database/migrations/003_realtime_changes.sql. DELETE events can't be
+#    filtered server-side (every client would get every user's deletes), so
+#    realtime users are still polled, every DELETE_POLL_INTERVAL seconds, for those.
+# 2. Polling fallback (no realtime, fake:// backend, or the channel failed):
+#    every POLL_INTERVAL seconds, one habits query + the recent logs, diffed.
+# Users are watched per session (a refcount): a session that stops checking in
+# (tab closed, no Logout) is dropped after IDLE_INTERVALS poll intervals, and the
+# user's view, polling and channel go when their last session does.
+# Every change goes through apply_change(): our own writes echoed back are
+# skipped, anything else updates the view, the counters (as deltas), the
+# Dashboard replica and the cache bus. Pages read from memory and only hit
+# the network after something actually changed.
+
+LIVE_MODE = os.getenv("HABIT_LIVE_MODE", "auto")                   # auto | realtime | poll | off
+POLL_INTERVAL = float(os.getenv("HABIT_POLL_INTERVAL", "15"))       # seconds between polls
+POLL_WINDOW_DAYS = int(os.getenv("HABIT_POLL_WINDOW_DAYS", "35"))   # days re-read by each poll
+DELETE_POLL_INTERVAL = float(os.getenv("HABIT_DELETE_POLL_INTERVAL", "60")) # realtime users: poll for deletes
+LIVE_REPLICA_MAX_AGE = float(os.getenv("HABIT_LIVE_REPLICA_MAX_AGE", "3600")) # replica age while live
+IDLE_INTERVALS = int(os.getenv("HABIT_LIVE_IDLE_INTERVALS", "4"))  # missed check-ins before a session is dropped
+REALTIME_FILTER_MAX = 100 # Supabase realtime accepts at most 100 values in an in.(...) filter
+HABIT_COLUMNS = "habit_id, name, category, frequency, is_active, created_at"
+
+class LiveUser:
+    """
+    One user's in-memory view: habits plus change bookkeeping.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.habits = {}          # habit_id -> row
+        self.habits_stale = True  # Set by our own habit writes; the next read refetches
+        self.recent_logs = None   # {(habit_id, "YYYY-MM-DD"): log_id} in the poll window (None = no baseline)
+        self.max_log_id = 0
+        self.version = 0          # +1 for every change applied (pages compare it to rerun)
+        self.mode = "starting"    # realtime | polling | off
+        self.last_sync = 0.0
+        self.last_error = None
+        self.channel = None
+        self.sessions = {}        # session_id -> last check-in (watch_user / live_status)
+        self.lock = threading.RLock()
+
+    def touch(self, session_id):
+        if session_id is not None:
+            with self.lock:
+                self.sessions[session_id] = time.time()
+
+    def is_healthy(self):
+        if self.mode == "realtime":
+            return True
+        return self.mode == "polling" and time.time() - self.last_sync < 3 * POLL_INTERVAL
+
+_users = {}
+_users_lock = threading.Lock()
+
+@on_habits_changed
+def _habits_written(user_id):
+    """
+    We added/edited/deleted a habit ourselves: refetch the list on the next read.
+    """
+    live = _users.get(user_id)
+    if live is not None:
+        live.habits_stale = True
+
+# --- THE VIEW ---
+
+def _load_habits(live):
+    rows = get_db_connection().table("habits").select(HABIT_COLUMNS).eq("user_id", live.user_id).execute().data
+    remember_habits(live.user_id, [row["habit_id"] for row in rows])
+    with live.lock:
+        live.habits = {row["habit_id"]: row for row in rows}
+        live.habits_stale = False
+    return rows
+
+def get_live_habits(user_id, active_only=True):
+    """
+    Same result as queries.get_user_habits(), from memory when the user is watched.
+    """
+    live = _users.get(user_id)
+    if live is None or live.mode == "off":
+        return get_user_habits(user_id, active_only=active_only)
+
+    if live.habits_stale:
+        try:
+            _load_habits(live)
+        except Exception as e:
+            print(f"Live view refresh failed: {e}")
+            return get_user_habits(user_id, active_only=active_only)
+
+    with live.lock:
+        habits = sorted(live.habits.values(), key=lambda habit: habit["habit_id"])
+    if active_only:
+        habits = [habit for habit in habits if habit.get("is_active", True)]
+    return [dict(habit) for habit in habits]
+
+def replica_max_age(user_id):
+    """
+    How old the Dashboard replica may get: long while changes are pushed to us,
+    the write_behind default otherwise.
+    """
+    live = _users.get(user_id)
+    if live is not None and live.is_healthy():
+        return LIVE_REPLICA_MAX_AGE
+    return write_behind.REPLICA_MAX_AGE
+
+def live_status(user_id, session_id=None):
+    """
+    {"mode", "version", "healthy", "last_sync", "error"} for display, or None if not watched.
+    With a session_id it also counts as that session's check-in.
+    """
+    live = _users.get(user_id)
+    if live is None:
+        return None
+    live.touch(session_id)
+    return {
+        "mode": live.mode,
+        "version": live.version,
+        "healthy": live.is_healthy(),
+        "last_sync": live.last_sync,
+        "error": live.last_error,
+    }
+
+# --- APPLYING CHANGES ---
+
+def apply_change(user_id, table, event, new=None, old=None):
+    """
+    Applies one change event ("INSERT" / "UPDATE" / "DELETE") to the view,
+    the counters, the replica and the caches. Returns True if anything changed.
+    """
+    live = _users.get(user_id)
+    if live is None:
+        return False
+    if table == "habits":
+        changed = _apply_habit_change(live, event, new or {}, old or {})
+    else:
+        changed = _apply_log_change(live, event, new or {}, old or {})
+    if changed:
+        with live.lock:
+            live.version += 1
+    return changed
+
+def patch_habit(user_id, habit_id, fields=None):
+    """
+    Applies one of OUR OWN habit edits (fields=None: deleted) to the view in
+    place, so the echo that comes back is a no-op instead of a refetch.
+    Returns the new version, or None when the user isn't watched.
+    """
+    live = _users.get(user_id)
+    if live is None or live.mode == "off":
+        return None
+    removed = False
+    with live.lock:
+        if fields is None:
+            removed = live.habits.pop(habit_id, None) is not None
+        elif habit_id in live.habits:
+            live.habits[habit_id] = {**live.habits[habit_id], **fields}
+        live.version += 1 # Other sessions of this user pick it up
+        version = live.version
+    if removed:
+        _resubscribe_logs(live)
+    return version
+
+def _apply_habit_change(live, event, new, old):
+    with live.lock:
+        if event == "DELETE":
+            habit_id = old.get("habit_id")
+            if habit_id is None or live.habits.pop(habit_id, None) is None:
+                return False
+            forget_habits([habit_id])
+        else:
+            habit_id = new["habit_id"]
+            current = live.habits.get(habit_id)
+            row = {key: new.get(key) for key in HABIT_COLUMNS.split(", ")}
+            if current == row:
+                return False # Nothing new (often the echo of our own write)
+            live.habits[habit_id] = row
+            remember_habits(live.user_id, [habit_id])
+
+    if event != "UPDATE":
+        _resubscribe_logs(live) # The set of habits to listen to changed
+    invalidate_user(live.user_id)
+    return True
+
+def _apply_log_change(live, event, new, old):
+    row = dict(new if event == "INSERT" else old)
+    if event == "UPDATE":
+        return False # Logs are only ever inserted or deleted
+
+    if row.get("habit_id") is None and row.get("log_id") is not None:
+        # A DELETE that only carries log_id: look it up in the window
+        with live.lock:
+            for key, log_id in (live.recent_logs or {}).items():
+                if log_id == row["log_id"]:
+                    row["habit_id"], row["date"] = key
+                    break
+    habit_id, day = row.get("habit_id"), row.get("date")
+    if habit_id is None or day is None or habit_id not in live.habits:
+        return False # Not one of this user's habits
+
+    day = str(day)[:10]
+    delta = 1 if event == "INSERT" else -1
+    with live.lock:
+        if live.recent_logs is not None and day >= _window_start().isoformat():
+            if delta > 0:
+                live.recent_logs[(habit_id, day)] = row.get("log_id")
+            else:
+                live.recent_logs.pop((habit_id, day), None)
+        if delta > 0 and row.get("log_id"):
+            live.max_log_id = max(live.max_log_id, row["log_id"])
+
+    if is_own_log_write(habit_id, day, delta):
+        return False # We made this change; it is already applied locally
+
+    apply_log_delta(habit_id, day, delta)
+    try:
+        write_behind.apply_remote_log(habit_id, day, delta > 0)
+    except Exception as e:
+        print(f"Replica update failed: {e}")
+    invalidate_habit(habit_id)
+    return True
+
+# --- POLLING FALLBACK ---
+
+def _window_start():
+    return date.today() - timedelta(days=POLL_WINDOW_DAYS)
+
+def _poll_habits(live):
+    """
+    Habits added, edited or deleted since the last look.
+    """
+    changes = 0
+    with live.lock:
+        before = dict(live.habits)
+    rows = get_db_connection().table("habits").select(HABIT_COLUMNS).eq("user_id", live.user_id).execute().data
+    remember_habits(live.user_id, [row["habit_id"] for row in rows])
+
+    seen = set()
+    for row in rows:
+        seen.add(row["habit_id"])
+        event = "UPDATE" if row["habit_id"] in before else "INSERT"
+        changes += apply_change(live.user_id, "habits", event, new=row)
+    for habit_id, row in before.items():
+        if habit_id not in seen:
+            changes += apply_change(live.user_id, "habits", "DELETE", old=row)
+    live.habits_stale = False
+    return changes
+
+def _newest_log_id(habit_ids):
+    """
+    Highest log_id of these habits (the starting point for spotting back-fills).
+    """
+    supabase = get_db_connection()
+    newest = 0
+    for i in range(0, len(habit_ids), HABIT_ID_CHUNK):
+        rows = (
+            supabase.table("tracker_logs").select("log_id").in_("habit_id", habit_ids[i:i + HABIT_ID_CHUNK])
+            .order("log_id", desc=True).limit(1).execute().data
+        )
+        if rows:
+            newest = max(newest, rows[0]["log_id"])
+    return newest
+
+def _poll_logs(live):
+    """
+    Logs added or removed in the recent window, plus older days back-filled
+    since the last poll (new log_ids outside the window).
+    The first call only records the baseline.
+    """
+    with live.lock:
+        habit_ids = list(live.habits)
+        after_log_id = live.max_log_id
+    if live.recent_logs is None:
+        after_log_id = 0
+    start = _window_start()
+    current, max_log_id = {}, after_log_id or _newest_log_id(habit_ids)
+
+    for page in iter_habit_logs(habit_ids, columns="log_id, habit_id, date", start_date=start):
+        for row in page:
+            current[(row["habit_id"], str(row["date"])[:10])] = row["log_id"]
+            max_log_id = max(max_log_id, row["log_id"])
+
+    backfilled = []
+    if after_log_id:
+        for page in iter_habit_logs(habit_ids, columns="log_id, habit_id, date", after_log_id=after_log_id):
+            backfilled.extend(row for row in page if str(row["date"])[:10] < start.isoformat())
+            max_log_id = max([max_log_id] + [row["log_id"] for row in page])
+
+    with live.lock:
+        previous = live.recent_logs
+        live.recent_logs = dict(current)
+        live.max_log_id = max_log_id
+    if previous is None:
+        return 0
+
+    changes = 0
+    for (habit_id, day), log_id in current.items():
+        if (habit_id, day) not in previous:
+            changes += apply_change(live.user_id, "tracker_logs", "INSERT",
+                                    new={"log_id": log_id, "habit_id": habit_id, "date": day})
+    for habit_id, day in previous.keys() - current.keys():
+        changes += apply_change(live.user_id, "tracker_logs", "DELETE", old={"habit_id": habit_id, "date": day})
+    for row in backfilled:
+        changes += apply_change(live.user_id, "tracker_logs", "INSERT", new=row)
+    return changes
+
+def poll_user(user_id):
+    """
+    One polling pass (also usable on demand, or in tests against FakeSupabase).
+    Returns the number of changes applied.
+    """
+    live = _users.get(user_id)
+    if live is None:
+        return 0
+    changes = _poll_habits(live) + _poll_logs(live)
+    live.last_sync = time.time()
+    live.last_error = None
+    return changes
+
+def _evict_idle():
+    """
+    Drops sessions that stopped checking in, then users left without sessions.
+    """
+    cutoff = time.time() - IDLE_INTERVALS * POLL_INTERVAL
+    dropped = []
+    with _users_lock:
+        for user_id, live in list(_users.items()):
+            with live.lock:
+                for session_id, seen in list(live.sessions.items()):
+                    if seen < cutoff:
+                        del live.sessions[session_id]
+                if not live.sessions:
+                    dropped.append(_users.pop(user_id))
+    for live in dropped:
+        _close_channel(live)
+
+def _poll_loop():
+    while True:
+        time.sleep(POLL_INTERVAL)
+        _evict_idle()
+        now = time.time()
+        with _users_lock:
+            polling = [
+                live for live in _users.values()
+                if live.mode == "polling" or (live.mode == "realtime" and now - live.last_sync >= DELETE_POLL_INTERVAL)
+            ]
+        for live in polling:
+            try:
+                poll_user(live.user_id)
+            except Exception as e:
+                live.last_error = str(e)
+                print(f"Live sync poll failed for user {live.user_id}: {e}")
+
+# --- REALTIME ---
+
+_loop = None
+_realtime_client = None
+_threads_lock = threading.Lock()
+_poller = None
+
+def _event_loop():
+    """
+    The asyncio loop (in a daemon thread) that owns the realtime websocket.
+    """
+    global _loop
+
+    with _threads_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="live-sync-realtime", daemon=True).start()
+    return _loop
+
+def _start_poller():
+    global _poller
+
+    with _threads_lock:
+        if _poller is None or not _poller.is_alive():
+            _poller = threading.Thread(target=_poll_loop, name="live-sync-poller", daemon=True)
+            _poller.start()
+
+def _fall_back_to_polling(live, reason):
+    if live.mode != "polling":
+        print(f"Live sync for user {live.user_id} is polling every {POLL_INTERVAL:g}s ({reason})")
+    live.mode = "polling"
+    live.last_error = str(reason)
+    _start_poller()
+
+def _on_payload(live, payload):
+    data = payload.get("data", payload)
+    apply_change(live.user_id, data["table"], str(getattr(data["type"], "value", data["type"])),
+                 new=data.get("record"), old=data.get("old_record"))
+
+async def _subscribe(live):
+    global _realtime_client
+    from database.async_db import create_async_db_client
+
+    if _realtime_client is None:
+        _realtime_client = await create_async_db_client()
+    if not hasattr(_realtime_client, "channel"):
+        raise RuntimeError("this backend has no realtime support")
+
+    if live.channel is not None:
+        await _realtime_client.remove_channel(live.channel)
+
+    channel = _realtime_client.channel(f"habits-user-{live.user_id}")
+    callback = lambda payload: _on_payload(live, payload)
+    channel.on_postgres_changes("INSERT", callback, table="habits", schema="public", filter=f"user_id=eq.{live.user_id}")
+    channel.on_postgres_changes("UPDATE", callback, table="habits", schema="public", filter=f"user_id=eq.{live.user_id}")
+    habit_ids = sorted(live.habits)
+    for i in range(0, len(habit_ids), REALTIME_FILTER_MAX):
+        chunk = ",".join(str(habit_id) for habit_id in habit_ids[i:i + REALTIME_FILTER_MAX])
+        channel.on_postgres_changes("INSERT", callback, table="tracker_logs", schema="public", filter=f"habit_id=in.({chunk})")
+    # No DELETE subscriptions: they can't be filtered, the poller finds deletes instead
+
+    def on_status(status, error):
+        status = str(getattr(status, "value", status))
+        if status == "SUBSCRIBED":
+            live.mode = "realtime"
+            live.last_error = None
+            live.last_sync = time.time()
+        else:
+            _fall_back_to_polling(live, error or status)
+
+    live.channel = channel
+    await channel.subscribe(on_status)
+
+def _resubscribe_logs(live):
+    if live.mode == "realtime" or live.channel is not None:
+        asyncio.run_coroutine_threadsafe(_subscribe(live), _event_loop())
+
+def _start_realtime(live):
+    future = asyncio.run_coroutine_threadsafe(_subscribe(live), _event_loop())
+
+    def done(future):
+        error = future.exception()
+        if error is not None:
+            _fall_back_to_polling(live, error)
+    future.add_done_callback(done)
+
+# --- PUBLIC ENTRY POINTS ---
+
+def _backend_url():
+    try:
+        return get_credentials()[0]
+    except ValueError:
+        return ""
+
+def watch_user(user_id, session_id=None):
+    """
+    Starts keeping this user's view current for a session (safe to call on
+    every rerun: it also counts as the session's check-in). Returns the LiveUser.
+    """
+    with _users_lock:
+        live = _users.get(user_id)
+        if live is not None:
+            live.touch(session_id)
+            return live
+        live = _users[user_id] = LiveUser(user_id)
+        live.touch(session_id)
+
+    if LIVE_MODE == "off":
+        live.mode = "off"
+        return live
+
+    try:
+        _load_habits(live)
+        _poll_logs(live) # Baseline for the polling diff
+        live.last_sync = time.time()
+    except Exception as e:
+        live.last_error = str(e)
+        print(f"Live sync could not load user {user_id}: {e}")
+
+    if LIVE_MODE == "poll" or _backend_url().startswith("fake://"):
+        _fall_back_to_polling(live, "polling mode")
+    else:
+        live.mode = "polling" # Until the channel confirms it is subscribed
+        _start_poller()
+        _start_realtime(live)
+    return live
+
+def unwatch_user(user_id, session_id=None):
+    """
+    The session is done with this user (e.g. on logout). The view stays while
+    other sessions still use it; session_id=None stops tracking the user outright.
+    """
+    with _users_lock:
+        live = _users.get(user_id)
+        if live is None:
+            return
+        with live.lock:
+            live.sessions.pop(session_id, None)
+            if session_id is not None and live.sessions:
+                return
+        _users.pop(user_id, None)
+    _close_channel(live)
+
+def _close_channel(live):
+    if live.channel is not None and _realtime_client is not None:
+        asyncio.run_coroutine_threadsafe(_realtime_client.remove_channel(live.channel), _event_loop())
@@ -0,0 +1,57 @@
+-- 001: Analytics aggregations that run INSIDE Postgres.
+-- utils/analytics.py calls these through supabase.rpc(...), so only the small
+-- aggregated result crosses the wire instead of every tracker_logs row.
+-- Apply in order (Supabase SQL editor or `psql -f`). Safe to re-run.
+
+-- Makes "logs of these habits between two dates" an index range scan
+create index if not exists tracker_logs_habit_id_date_idx
+    on tracker_logs (habit_id, date);
+
+-- Completions per habit (habits with 0 logs are included)
+create or replace function habit_completion_counts(
+    p_user_id text,
+    p_start date default null,
+    p_end date default null
+)
+returns table (habit_id bigint, name text, category text, count bigint)
+language sql
+stable
+as $$
+    select
+        h.habit_id::bigint,
+        h.name::text,
+        h.category::text,
+        count(l.habit_id) as count
+    from habits h
+    left join tracker_logs l
+        on l.habit_id = h.habit_id
+       and (p_start is null or l.date >= p_start)
+       and (p_end is null or l.date <= p_end)
+    where h.user_id::text = p_user_id
+    group by h.habit_id, h.name, h.category
+    order by h.name;
+$$;
+
+-- Completions per habit x weekday (0 = Monday ... 6 = Sunday)
+create or replace function habit_weekday_counts(
+    p_user_id text,
+    p_start date default null,
+    p_end date default null
+)
+returns table (habit_id bigint, name text, weekday int, count bigint)
+language sql
+stable
+as $$
+    select
+        h.habit_id::bigint,
+        h.name::text,
+        (extract(isodow from l.date)::int - 1) as weekday,
+        count(*) as count
+    from tracker_logs l
+    join habits h on h.habit_id = l.habit_id
+    where h.user_id::text = p_user_id
+      and (p_start is null or l.date >= p_start)
+      and (p_end is null or l.date <= p_end)
+    group by h.habit_id, h.name, weekday
+    order by h.name, weekday;
+$$;
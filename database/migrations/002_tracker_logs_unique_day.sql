@@ -0,0 +1,18 @@
+-- 002: At most ONE log per habit per day.
+-- Lets database/queries.py write logs with an idempotent upsert
+-- (on_conflict=habit_id,date), so double clicks and replays can't duplicate rows.
+-- Apply after 001. Safe to re-run.
+
+-- 1. Remove existing duplicates, keeping the oldest log of each (habit, day)
+delete from tracker_logs a
+using tracker_logs b
+where a.habit_id = b.habit_id
+  and a.date = b.date
+  and a.log_id > b.log_id;
+
+-- 2. Enforce it from now on (also serves the (habit_id, date) lookups)
+create unique index if not exists tracker_logs_habit_id_date_key
+    on tracker_logs (habit_id, date);
+
+-- 3. The plain index from 001 is now redundant
+drop index if exists tracker_logs_habit_id_date_idx;
@@ -0,0 +1,23 @@
+-- 003: Stream row changes of habits and tracker_logs over Supabase Realtime.
+-- database/live_sync.py subscribes to them to keep its in-memory view current.
+-- Without this migration it falls back to polling. Safe to re-run.
+
+-- Only INSERT/UPDATE are subscribed (DELETE events can't be filtered per user),
+-- so the default replica identity is kept: old rows are never broadcast.
+
+-- 1. Publish both tables to the realtime publication
+do $$
+begin
+    if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime' and tablename = 'habits'
+    ) then
+        alter publication supabase_realtime add table habits;
+    end if;
+    if not exists (
+        select 1 from pg_publication_tables
+        where pubname = 'supabase_realtime' and tablename = 'tracker_logs'
+    ) then
+        alter publication supabase_realtime add table tracker_logs;
+    end if;
+end $$;
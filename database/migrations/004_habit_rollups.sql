@@ -0,0 +1,27 @@
+-- 004: Precomputed per-habit stats, written in bulk by nightly_rollups.py.
+-- Pages and leaderboards read these rows instead of recomputing from tracker_logs.
+-- Apply after 003. Safe to re-run.
+
+-- 1. One row per habit, replaced by every run (upsert on habit_id)
+create table if not exists habit_rollups (
+    habit_id          bigint primary key references habits (habit_id) on delete cascade,
+    user_id           text        not null,           -- as text, like 001 (whatever type users.user_id has)
+    as_of             date        not null,           -- the day the figures were computed for
+    current_streak    integer     not null default 0, -- in periods (days, weekdays or weeks)
+    longest_streak    integer     not null default 0,
+    periods_done      integer     not null default 0, -- in the completion window
+    periods_scheduled integer     not null default 0,
+    completion_rate   real        not null default 0,
+    window_days       integer     not null,
+    total_done        integer     not null default 0, -- all time
+    last_done         date,
+    weekday_counts    integer[]   not null,           -- 7 values, Monday first
+    computed_at       timestamptz not null default now()
+);
+
+-- 2. Per-user pages: all rollups of one user
+create index if not exists habit_rollups_user_id_idx on habit_rollups (user_id);
+
+-- 3. Leaderboards: best current streaks of a given day
+create index if not exists habit_rollups_leaderboard_idx
+    on habit_rollups (as_of, current_streak desc);
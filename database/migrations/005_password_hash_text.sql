@@ -0,0 +1,5 @@
+-- 005: Room for the self-describing scrypt hashes of utils/security.py
+-- ("scrypt$n=16384,r=8,p=1$<salt>$<hash>", ~100 chars, longer than a SHA-256 hex digest).
+-- Old SHA-256 hashes keep working and are upgraded on the next login. Safe to re-run.
+
+alter table users alter column password_hash type text;
@@ -1,6 +1,8 @@
 from database.db_connection import get_db_connection
-from utils.security import make_hash, check_hash
-import streamlit as st
+from database.resilience import guarded, read_through
+from utils.security import make_hash, check_hash, needs_rehash
+from utils.cache import invalidate_habit, invalidate_user, remember_habits, note_log_write
+from utils.rollups import apply_log_delta, forget_habits
 
 def create_user(username, password):
     """
@@ -30,12 +32,13 @@ def verify_login(username, password):
     """
     Checks if username exists and password matches.
     Returns the user_id if successful, else None.
+    A hash made the old way (or with another cost) is upgraded on the way.
     """
     supabase = get_db_connection()
     
-    # 1. Find the user by username
+    # 1. Find the user by username (only what we need: no other columns leave the DB)
     try:
-        response = supabase.table("users").select("*").eq("username", username).execute()
+        response = supabase.table("users").select("user_id, password_hash").eq("username", username).execute()
 
         # Check if user exists (list is not empty)
         if len(response.data) > 0:
@@ -44,10 +47,17 @@ def verify_login(username, password):
 
             # 2. Check the password against the hash
             if check_hash(password, stored_hash):
+                # 3. Upgrade it while we have the plain password (a failure here doesn't block the login)
+                if needs_rehash(stored_hash):
+                    try:
+                        supabase.table("users").update({"password_hash": make_hash(password)}).eq("user_id", user_data["user_id"]).execute()
+                    except Exception as e:
+                        print(f"Could not upgrade password hash: {e}")
                 return user_data["user_id"] # Login Success!
             else:
                 return None # Wrong Password
         else:
+            check_hash(password, None) # Same work as a real check: timing doesn't reveal the user is missing
             return None # User not found
             
     except Exception as e:
@@ -69,6 +79,7 @@ def add_habit(user_id, name, category, frequency):
     
     try:
         response = supabase.table("habits").insert(habit_data).execute()
+        invalidate_user(user_id, habits_changed=True) # Cached analytics for this user are now stale
         return "Success"
     except Exception as e:
         return f"Error: {e}"
@@ -79,17 +90,32 @@ def get_user_habits(user_id, active_only=True):
     Fetch habits. 
     If active_only=True, returns only currently active habits.
     If active_only=False, returns EVERYTHING (for history/management).
+    Identical calls made at the same time share one request; if Supabase is
+    down, the last good list is returned (or [] if there is none).
     """
-    supabase = get_db_connection()
-    try:
-        query = supabase.table("habits").select("*").eq("user_id", user_id)
+    def load():
+        query = get_db_connection().table("habits").select("*").eq("user_id", user_id)
         
         if active_only:
             query = query.eq("is_active", True)
             
-        response = query.execute()
+        response = guarded(query)
+        remember_habits(user_id, [habit["habit_id"] for habit in response.data])
         return response.data
+
+    habits = read_through(("habits", user_id, active_only), load, fallback=[])
+    return [dict(habit) for habit in habits] # Shared with other callers: hand out copies
+
+def get_habit_rollups(user_id):
+    """
+    The precomputed stats of the user's habits (written by nightly_rollups.py,
+    see migration 004). Returns [] if the job hasn't run or the table is missing.
+    """
+    supabase = get_db_connection()
+    try:
+        return guarded(supabase.table("habit_rollups").select("*").eq("user_id", str(user_id))).data
     except Exception as e:
+        print(f"Could not read rollups: {e}")
         return []
 
 # 2. Check if a specific habit is done today (to keep the box checked)
@@ -97,23 +123,234 @@ def is_habit_done_today(habit_id, date):
     supabase = get_db_connection()
     try:
         # Check for a log entry for this habit on this date
-        response = supabase.table("tracker_logs").select("*").eq("habit_id", habit_id).eq("date", date).execute()
+        response = guarded(supabase.table("tracker_logs").select("log_id").eq("habit_id", habit_id).eq("date", date))
         return len(response.data) > 0 # Returns True if data exists
     except Exception as e:
         return False
 
+# 2b. Batched status lookup (the Dashboard uses this instead of one query per habit)
+def _load_log_rows(habit_ids, start_date, end_date, raise_errors=False):
+    """
+    (habit_id, date) rows of these habits in the date range, as one list.
+    Shared by concurrent identical lookups; see database/resilience.py.
+    """
+    def load():
+        rows = []
+        for page in iter_habit_logs(habit_ids, columns="habit_id, date", start_date=start_date, end_date=end_date):
+            rows.extend(page)
+        return rows
+
+    if raise_errors:
+        return load() # The caller must know the server's answer, not an old one
+    key = ("logs", tuple(sorted(habit_ids)), str(start_date), str(end_date))
+    return read_through(key, load, fallback=[])
+
+def get_habit_completions(habit_ids, start_date, end_date=None):
+    """
+    Fetches the completion state of many habits for a date (or a date range)
+    in a SINGLE request.
+    Returns a dict: {habit_id: set of "YYYY-MM-DD" strings it was done on}.
+    Every requested habit is in the dict, even if it has no logs.
+    """
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return {} # Nothing to ask the database about
+
+    if end_date is None:
+        end_date = start_date
+
+    completions = {habit_id: set() for habit_id in habit_ids}
+
+    # A single day is one page (one round trip); long ranges keep paging
+    for row in _load_log_rows(habit_ids, start_date, end_date):
+        completions.setdefault(row["habit_id"], set()).add(str(row["date"]))
+    return completions
+
+def get_habit_history(habit_ids, start_date, end_date=None, raise_errors=False):
+    """
+    Same single batched lookup as get_habit_completions, returned as a
+    HabitHistory (one roaring bitmap of days per habit) for fast checks.
+    raise_errors=True: a failed read raises instead of returning an empty/old history.
+    """
+    from utils.history import HabitHistory # numpy + pyroaring: only loaded by the pages that need them
+
+    habit_ids = list(habit_ids)
+    history = HabitHistory.from_rows([], habit_ids)
+    if not habit_ids:
+        return history
+
+    history.add_rows(_load_log_rows(habit_ids, start_date, end_date or start_date, raise_errors))
+    return history
+
+def get_completed_habit_ids(habit_ids, date):
+    """
+    Returns the set of habit_ids that were done on `date`.
+    Costs exactly one round trip, no matter how many habits there are.
+    """
+    completions = get_habit_completions(habit_ids, date)
+    return {habit_id for habit_id, dates in completions.items() if dates}
+
+# 2c. Stream a user's log history page by page (used by analytics)
+LOG_PAGE_SIZE = 1000 # Keep <= the PostgREST "max rows" setting (Supabase default: 1000)
+HABIT_ID_CHUNK = 200 # How many habit_ids go into one in.(...) filter (keeps the URL short)
+
+def iter_habit_logs(habit_ids, columns="log_id, habit_id, date", start_date=None, end_date=None,
+                    page_size=LOG_PAGE_SIZE, after_log_id=None):
+    """
+    Yields tracker_logs rows for the given habits, one page (list of dicts) at a time.
+    - Filters by habit_id on the server (we never download other users' logs).
+    - Only selects the columns we ask for.
+    - Uses keyset pagination on log_id, so it never hits the server row cap
+      and never needs to hold the whole history in memory.
+    - after_log_id: only logs created after that one (new rows since a poll).
+    """
+    habit_ids = list(habit_ids)
+    if "log_id" not in columns:
+        columns = f"log_id, {columns}" # We need it as the pagination key
+
+    supabase = get_db_connection()
+
+    for i in range(0, len(habit_ids), HABIT_ID_CHUNK):
+        chunk = habit_ids[i:i + HABIT_ID_CHUNK]
+        last_log_id = after_log_id
+
+        while True:
+            query = supabase.table("tracker_logs").select(columns).in_("habit_id", chunk)
+            if start_date is not None:
+                query = query.gte("date", str(start_date))
+            if end_date is not None:
+                query = query.lte("date", str(end_date))
+            if last_log_id is not None:
+                query = query.gt("log_id", last_log_id)
+
+            rows = guarded(query.order("log_id").limit(page_size)).data
+            if rows:
+                yield rows
+
+            # A short page means we reached the end of this chunk
+            if len(rows) < page_size:
+                break
+            last_log_id = rows[-1]["log_id"]
+
 # 3. Toggle the habit (Check/Uncheck)
 def toggle_habit(habit_id, date, done):
-    supabase = get_db_connection()
-    try:
-        if done:
-            # Insert a log
-            supabase.table("tracker_logs").insert({"habit_id": habit_id, "date": str(date)}).execute()
+    # Same idempotent path as the bulk API: checking twice never makes two logs
+    result = bulk_set_habit_logs([(habit_id, date, done)])[0]
+    if result["status"] == "error":
+        print(f"Error toggling habit: {result['error']}")
+
+# 3b. Bulk toggle / backfill (many habits x many dates in a couple of requests)
+BULK_CHUNK = 500 # (habit, date) pairs per request
+
+def plan_log_changes(changes):
+    """
+    Normalizes (habit_id, date, done) changes (tuples or dicts).
+    If the same (habit, date) appears twice, the LAST one wins.
+    Returns (plan, items): plan = {(habit_id, "YYYY-MM-DD"): done},
+    items = one result dict per input change, in input order.
+    """
+    plan = {}
+    items = []
+    latest = {} # key -> index of the item that currently "wins"
+    for change in changes:
+        if isinstance(change, dict):
+            habit_id, day, done = change["habit_id"], change["date"], change["done"]
         else:
-            # Delete the log (Uncheck)
-            supabase.table("tracker_logs").delete().eq("habit_id", habit_id).eq("date", str(date)).execute()
-    except Exception as e:
-        print(f"Error toggling habit: {e}")
+            habit_id, day, done = change
+        key = (habit_id, str(day)[:10])
+
+        # An earlier change to the same (habit, date) is superseded by this one
+        if key in latest:
+            items[latest[key]]["status"] = "superseded"
+        latest[key] = len(items)
+        plan[key] = bool(done)
+        items.append({"key": key, "habit_id": habit_id, "date": key[1], "done": bool(done), "status": None, "error": None})
+    return plan, items
+
+def log_change_batches(plan):
+    """
+    Splits a plan into ("upsert", keys) and ("delete", keys) batches of BULK_CHUNK.
+    """
+    to_insert = [key for key, done in plan.items() if done]
+    to_delete = [key for key, done in plan.items() if not done]
+    for i in range(0, len(to_insert), BULK_CHUNK):
+        yield "upsert", to_insert[i:i + BULK_CHUNK]
+    for i in range(0, len(to_delete), BULK_CHUNK):
+        yield "delete", to_delete[i:i + BULK_CHUNK]
+
+def log_change_query(supabase, kind, keys):
+    """
+    Builds ONE request for a batch (works with the sync and the async client).
+    - upsert: needs the unique (habit_id, date) index from migration 002;
+      rows that already exist are ignored, only new rows come back.
+    - delete: one or=(...) filter, grouped by day to keep the URL short.
+    """
+    table = supabase.table("tracker_logs")
+    if kind == "upsert":
+        rows = [{"habit_id": habit_id, "date": day} for habit_id, day in keys]
+        return table.upsert(rows, on_conflict="habit_id,date", ignore_duplicates=True)
+
+    by_day = {}
+    for habit_id, day in keys:
+        by_day.setdefault(day, []).append(str(habit_id))
+    filters = ",".join(
+        f"and(date.eq.{day},habit_id.in.({','.join(habit_ids)}))" for day, habit_ids in by_day.items()
+    )
+    return table.delete().or_(filters)
+
+def record_log_batch(kind, keys, rows, statuses):
+    """
+    Bookkeeping after a batch succeeded: per-item status, counter deltas, cache invalidation.
+    `rows` are the rows the database actually inserted or deleted.
+    """
+    changed = {(row["habit_id"], str(row["date"])[:10]) for row in rows}
+    delta = 1 if kind == "upsert" else -1
+    for key in keys:
+        if key in changed:
+            statuses[key] = ("inserted" if kind == "upsert" else "deleted", None)
+            apply_log_delta(key[0], key[1], delta)
+            note_log_write(key[0], key[1], delta)
+        else:
+            statuses[key] = ("unchanged", None) # Already done / already cleared
+    for habit_id in {key[0] for key in changed}:
+        invalidate_habit(habit_id)
+
+def finish_log_results(items, statuses):
+    """
+    Turns the per-key statuses into the per-item results list.
+    """
+    results = []
+    for item in items:
+        if item["status"] is None:
+            item["status"], item["error"] = statuses.get(item["key"], ("error", "not applied"))
+        results.append({key: value for key, value in item.items() if key != "key"})
+    return results
+
+def bulk_set_habit_logs(changes, raise_errors=False):
+    """
+    Applies many (habit_id, date, done) changes as one upsert batch plus
+    one delete batch (per BULK_CHUNK pairs). Idempotent: replaying the same
+    changes does nothing. Returns one result per change:
+    {"habit_id", "date", "done", "status", "error"} where status is
+    inserted / deleted / unchanged / superseded / error.
+    With raise_errors=True a failed batch raises instead (used by retry loops).
+    """
+    plan, items = plan_log_changes(changes)
+    statuses = {}
+    supabase = get_db_connection()
+
+    for kind, keys in log_change_batches(plan):
+        try:
+            rows = log_change_query(supabase, kind, keys).execute().data
+        except Exception as e:
+            if raise_errors:
+                raise
+            for key in keys:
+                statuses[key] = ("error", str(e))
+            continue
+        record_log_batch(kind, keys, rows, statuses)
+
+    return finish_log_results(items, statuses)
 
 def delete_habit(habit_id):
     """
@@ -124,6 +361,8 @@ def delete_habit(habit_id):
         # We only need to delete from 'habits'. 
         # Because we used 'ON DELETE CASCADE' in SQL, the logs will auto-delete.
         supabase.table("habits").delete().eq("habit_id", habit_id).execute()
+        forget_habits([habit_id])
+        invalidate_habit(habit_id, habits_changed=True)
         return "Success"
     except Exception as e:
         return f"Error: {e}"
@@ -139,6 +378,7 @@ def update_habit(habit_id, name, category, frequency):
             "category": category,
             "frequency": frequency
         }).eq("habit_id", habit_id).execute()
+        invalidate_habit(habit_id, habits_changed=True)
         return "Success"
     except Exception as e:
         return f"Error: {e}"
@@ -152,6 +392,7 @@ def toggle_habit_status(habit_id, current_status):
     
     try:
         supabase.table("habits").update({"is_active": new_status}).eq("habit_id", habit_id).execute()
+        invalidate_habit(habit_id, habits_changed=True)
         return "Success"
     except Exception as e:
         return f"Error: {e}"
\ No newline at end of file
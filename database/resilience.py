@@ -0,0 +1,309 @@
+import asyncio
+import os
+import threading
+import time
+from cachetools import TTLCache
+from utils import metrics
+
+# Protection for Supabase reads.
+# 1. CircuitBreaker: after BREAKER_FAILURES failed (or too slow) queries in a
+#    row, queries fail at once with CircuitOpenError for BREAKER_RESET seconds;
+#    then ONE probe query decides whether to close it again.
+# 2. SingleFlight / AsyncSingleFlight: concurrent identical reads share one
+#    in-flight request instead of each sending their own.
+# 3. read_through(): both of the above, plus the last good result of every
+#    read, served while the breaker is not closed (and refreshed in the
+#    background) or when a read fails. Only without one do callers get their fallback.
+# Everything is exported on /metrics: circuit_state, singleflight_total, stale_reads_total.
+
+BREAKER_FAILURES = int(os.getenv("HABIT_BREAKER_FAILURES", "5"))   # failures in a row that open it
+BREAKER_RESET = float(os.getenv("HABIT_BREAKER_RESET", "30"))      # seconds open before a probe
+BREAKER_SLOW = float(os.getenv("HABIT_BREAKER_SLOW", "5"))         # a query slower than this counts as failed
+STALE_SIZE = int(os.getenv("HABIT_STALE_SIZE", "512"))             # last good results kept
+STALE_MAX_AGE = float(os.getenv("HABIT_STALE_MAX_AGE", "900"))     # seconds one may be served
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling Supabase while the breaker is open.
+    """
+
+def is_upstream_failure(error):
+    """
+    Network errors, timeouts and 5xx count against the breaker. An API error
+    with a 4xx/PGRST code means Supabase answered fine (our query was wrong).
+    """
+    code = getattr(error, "code", None)
+    return code is None or str(code).startswith("5")
+
+class CircuitBreaker:
+    """
+    closed -> (failures) -> open -> (reset timeout) -> half_open -> (probe) -> closed / open
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET,
+                 slow_call_seconds=BREAKER_SLOW):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+        self._probing = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._move(HALF_OPEN)
+        return self._state
+
+    def _move(self, state):
+        if state != self._state:
+            self._state = state
+            metrics.inc("circuit_transitions_total", help_text="Circuit breaker state changes",
+                        breaker=self.name, to=state)
+            self._publish()
+
+    def _publish(self):
+        metrics.set_gauge("circuit_state", STATE_VALUES[self._state],
+                          help_text="Circuit breaker state (0 closed, 1 half-open, 2 open)", breaker=self.name)
+
+    def _admit(self):
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True # This call is the probe
+                return
+        metrics.inc("circuit_rejected_total", help_text="Calls failed fast by an open breaker", breaker=self.name)
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open), retrying in {self.reset_timeout:g}s")
+
+    def _record(self, ok, seconds):
+        with self._lock:
+            self._probing = False
+            if ok and seconds <= self.slow_call_seconds:
+                self.failures = 0
+                self._move(CLOSED)
+                return
+            self.failures += 1
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._move(OPEN)
+
+    def _release(self):
+        # Interrupted (cancelled, KeyboardInterrupt): no verdict, but let another call probe
+        with self._lock:
+            self._probing = False
+
+    def call(self, fn, *args, **kwargs):
+        self._admit()
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(not is_upstream_failure(e), time.monotonic() - started)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._record(True, time.monotonic() - started)
+        return result
+
+    async def acall(self, fn, *args, **kwargs):
+        self._admit()
+        started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self._record(not is_upstream_failure(e), time.monotonic() - started)
+            raise
+        except BaseException: # asyncio.CancelledError: client gone, wait_for timeout
+            self._release()
+            raise
+        self._record(True, time.monotonic() - started)
+        return result
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    do(key, fn): the first caller runs fn(), callers arriving while it runs
+    wait and get the same result (or the same exception).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        metrics.inc("singleflight_total", help_text="Reads that ran (leader) or joined one in flight (shared)",
+                    group=self.name, kind=key[0], result="leader" if leader else "shared")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+class AsyncSingleFlight:
+    """
+    Same as SingleFlight for coroutines (one event loop).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}
+
+    async def do(self, key, coro_fn):
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        metrics.inc("singleflight_total", help_text="Reads that ran (leader) or joined one in flight (shared)",
+                    group=self.name, kind=key[0], result="leader" if leader else "shared")
+        # shield: a waiter that gets cancelled doesn't cancel the others' request
+        return await asyncio.shield(task)
+
+# --- SHARED INSTANCES ---
+
+supabase_breaker = CircuitBreaker("supabase")
+reads = SingleFlight("reads")
+async_reads = AsyncSingleFlight("async_reads")
+
+_last_good = TTLCache(maxsize=STALE_SIZE, ttl=STALE_MAX_AGE) # key -> last successful result
+_last_good_lock = threading.Lock()
+_refreshing = set()
+_async_refreshes = {} # key -> task (kept referenced until it finishes)
+
+def guarded(query):
+    """
+    Runs query.execute() through the breaker.
+    """
+    return supabase_breaker.call(query.execute)
+
+async def aguarded(query):
+    return await supabase_breaker.acall(query.execute)
+
+def _remember(key, value):
+    with _last_good_lock:
+        _last_good[key] = value
+
+def _stale(key):
+    with _last_good_lock:
+        value = _last_good.get(key)
+    if value is not None:
+        metrics.inc("stale_reads_total", help_text="Reads answered with the last good result", kind=key[0])
+    return value
+
+def _refresh_in_background(key, load):
+    with _last_good_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            _remember(key, reads.do(key, load))
+        except Exception:
+            pass # Still down: keep serving the stale value
+        finally:
+            with _last_good_lock:
+                _refreshing.discard(key)
+    threading.Thread(target=refresh, name=f"revalidate-{key[0]}", daemon=True).start()
+
+def _arefresh_in_background(key, load):
+    """
+    Async twin of _refresh_in_background(): one task per key, on the running loop.
+    It goes through the breaker, so when half-open it is the probe that can close it.
+    """
+    if key in _async_refreshes:
+        return
+
+    async def refresh():
+        try:
+            _remember(key, await async_reads.do(key, load))
+        except Exception:
+            pass # Still down: keep serving the stale value
+
+    task = asyncio.ensure_future(refresh())
+    _async_refreshes[key] = task
+    task.add_done_callback(lambda _: _async_refreshes.pop(key, None))
+
+def read_through(key, load, fallback=None):
+    """
+    Result of load() (a function that queries through guarded()), coalesced with
+    identical reads in flight. key = (kind, ...) hashable, kind names it in metrics.
+    - breaker not closed and a last good result exists: return it, refresh in the background
+    - load() fails: the last good result, else `fallback`
+    Results are shared between callers: don't mutate them.
+    """
+    if supabase_breaker.state != CLOSED:
+        stale = _stale(key)
+        if stale is not None:
+            _refresh_in_background(key, load)
+            return stale
+
+    try:
+        value = reads.do(key, load)
+    except Exception as e:
+        stale = _stale(key)
+        if stale is not None:
+            return stale
+        print(f"Read {key[0]} failed: {e}")
+        return fallback
+    _remember(key, value)
+    return value
+
+async def aread_through(key, load):
+    """
+    Async read_through for the API: same rules, the refresh is a task on the
+    event loop. Without a last good result the error propagates (the endpoint
+    turns CircuitOpenError into a 503).
+    """
+    if supabase_breaker.state != CLOSED:
+        stale = _stale(key)
+        if stale is not None:
+            _arefresh_in_background(key, load)
+            return stale
+
+    try:
+        value = await async_reads.do(key, load)
+    except Exception:
+        stale = _stale(key)
+        if stale is not None:
+            return stale
+        raise
+    _remember(key, value)
+    return value
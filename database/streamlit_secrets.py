@@ -0,0 +1,16 @@
+import streamlit as st
+from database.config import register_secrets_provider
+
+# Optional plug-in: lets the Streamlit frontend read Supabase credentials
+# from .streamlit/secrets.toml. Only main.py imports this module, so the
+# backend never loads Streamlit.
+
+@register_secrets_provider
+def streamlit_credentials():
+    """
+    Returns (url, key) from st.secrets["supabase"], or None if there is no secrets file.
+    """
+    try:
+        return st.secrets["supabase"]["url"], st.secrets["supabase"]["key"]
+    except (FileNotFoundError, KeyError):
+        return None
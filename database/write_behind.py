@@ -0,0 +1,361 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+from database.queries import bulk_set_habit_logs, get_habit_history
+from database.resilience import is_upstream_failure
+from utils.history import HabitHistory
+
+# Write-behind layer for Dashboard toggles.
+# 1. record_toggle() writes to a local SQLite file and returns immediately.
+# 2. Reads come from a local replica of tracker_logs + the pending toggles.
+# 3. A background thread flushes pending toggles to Supabase in coalesced
+#    batches (one bulk upsert/delete). Network errors / 5xx are retried with
+#    exponential backoff; a batch Supabase rejects (4xx) is split in halves
+#    until the bad toggles are isolated, so only they fail. Toggles of a habit
+#    that no longer exists are dropped, others are parked and reported back to
+#    the user's session (take_rejected()).
+# 4. On startup, reconcile() pushes whatever an earlier run left behind.
+# Toggling the same box 5 times before a flush sends ONE change.
+
+QUEUE_PATH = os.getenv(
+    "HABIT_QUEUE_PATH",
+    os.path.join(os.path.expanduser("~"), ".smart_habit_tracker", "write_behind.sqlite3"),
+)
+FLUSH_INTERVAL = float(os.getenv("HABIT_FLUSH_INTERVAL", "2"))      # seconds between flushes
+FLUSH_BATCH = int(os.getenv("HABIT_FLUSH_BATCH", "500"))            # toggles per flush
+RETRY_ATTEMPTS = int(os.getenv("HABIT_FLUSH_RETRIES", "5"))         # tries per flush
+MAX_ATTEMPTS = int(os.getenv("HABIT_FLUSH_MAX_ATTEMPTS", "20"))     # attempts value of a parked toggle
+FOREIGN_KEY_VIOLATION = "23503" # Postgres: the habit was deleted meanwhile
+REPLICA_MAX_AGE = float(os.getenv("HABIT_REPLICA_MAX_AGE", "60"))   # seconds before re-pulling a day
+
+_flusher = None
+_flusher_lock = threading.Lock()
+_wake = threading.Event()
+
+_schema_ready = set() # QUEUE_PATHs whose tables exist (created once per process)
+_schema_lock = threading.Lock()
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pending_toggles (
+        habit_id   INTEGER NOT NULL,
+        date       TEXT    NOT NULL,
+        done       INTEGER NOT NULL,
+        queued_at  REAL    NOT NULL,
+        attempts   INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        PRIMARY KEY (habit_id, date)
+    );
+    CREATE TABLE IF NOT EXISTS replica_logs (
+        habit_id INTEGER NOT NULL,
+        date     TEXT    NOT NULL,
+        PRIMARY KEY (habit_id, date)
+    );
+    -- When the server's logs of a (habit, date) were last pulled: the replica is
+    -- shared by every user of this process, so a day is only fresh per habit
+    CREATE TABLE IF NOT EXISTS replica_synced (
+        habit_id  INTEGER NOT NULL,
+        date      TEXT    NOT NULL,
+        synced_at REAL    NOT NULL,
+        PRIMARY KEY (habit_id, date)
+    );
+    DROP TABLE IF EXISTS replica_days; -- Old layout (keyed by date only)
+"""
+
+def _ensure_schema(path):
+    with _schema_lock:
+        if path in _schema_ready:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=10)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL") # Stored in the file: once is enough
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+        _schema_ready.add(path)
+
+@contextmanager
+def _connect():
+    """
+    A short-lived connection: one transaction (committed on success), then closed.
+    """
+    path = QUEUE_PATH
+    _ensure_schema(path)
+    connection = sqlite3.connect(path, timeout=10)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+# --- WRITES ---
+
+def record_toggle(habit_id, day, done):
+    """
+    Records a checkbox change locally (a few hundred microseconds) and wakes the flusher.
+    A newer toggle of the same (habit, date) replaces the older one.
+    """
+    day = str(day)[:10]
+    with _connect() as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO pending_toggles (habit_id, date, done, queued_at) VALUES (?, ?, ?, ?)",
+            (habit_id, day, int(bool(done)), time.time()),
+        )
+        if done:
+            connection.execute("INSERT OR IGNORE INTO replica_logs (habit_id, date) VALUES (?, ?)", (habit_id, day))
+        else:
+            connection.execute("DELETE FROM replica_logs WHERE habit_id = ? AND date = ?", (habit_id, day))
+    _wake.set()
+
+def pending_count():
+    """
+    Toggles still waiting to be sent (parked ones aren't: they will never go).
+    """
+    with _connect() as connection:
+        return connection.execute("SELECT COUNT(*) FROM pending_toggles WHERE attempts < ?", (MAX_ATTEMPTS,)).fetchone()[0]
+
+def _send(rows):
+    """
+    One bulk request for these queued rows; only transient failures are retried.
+    """
+    changes = [(habit_id, day, bool(done)) for habit_id, day, done, _ in rows]
+    for attempt in Retrying(
+        stop=stop_after_attempt(RETRY_ATTEMPTS),
+        wait=wait_exponential(multiplier=0.5, max=30),
+        retry=retry_if_exception(is_upstream_failure),
+        reraise=True,
+    ):
+        with attempt:
+            bulk_set_habit_logs(changes, raise_errors=True)
+
+def _send_or_split(rows):
+    """
+    Sends rows; on a rejection (4xx), halves the batch until the bad rows are alone.
+    Returns (sent rows, [(rejected row, error)]). Transient errors propagate.
+    The upsert/delete batches are idempotent, so re-sending a half is harmless.
+    """
+    try:
+        _send(rows)
+        return rows, []
+    except Exception as e:
+        if is_upstream_failure(e):
+            raise
+        if len(rows) == 1:
+            return [], [(rows[0], e)]
+    middle = len(rows) // 2
+    sent_left, rejected_left = _send_or_split(rows[:middle])
+    sent_right, rejected_right = _send_or_split(rows[middle:])
+    return sent_left + sent_right, rejected_left + rejected_right
+
+def flush_pending(limit=FLUSH_BATCH):
+    """
+    Sends up to `limit` pending toggles to Supabase (ONE bulk request unless
+    some are rejected). Returns the number of toggles taken off the queue.
+    """
+    with _connect() as connection:
+        rows = connection.execute(
+            "SELECT habit_id, date, done, queued_at FROM pending_toggles "
+            "WHERE attempts < ? ORDER BY queued_at LIMIT ?",
+            (MAX_ATTEMPTS, limit),
+        ).fetchall()
+    if not rows:
+        return 0
+
+    try:
+        sent, rejected = _send_or_split(rows)
+    except Exception as e:
+        # Offline / Supabase down: keep them all queued as they are, try again next time
+        with _connect() as connection:
+            connection.executemany(
+                "UPDATE pending_toggles SET last_error = ? WHERE habit_id = ? AND date = ? AND queued_at = ?",
+                [(str(e), habit_id, day, queued_at) for habit_id, day, _, queued_at in rows],
+            )
+        print(f"Write-behind flush failed, will retry: {e}")
+        return 0
+
+    # Only touch what we sent: a toggle made during the flush has a newer queued_at
+    gone = [row for row, e in rejected if getattr(e, "code", None) == FOREIGN_KEY_VIOLATION]
+    parked = [(row, e) for row, e in rejected if getattr(e, "code", None) != FOREIGN_KEY_VIOLATION]
+    with _connect() as connection:
+        connection.executemany(
+            "DELETE FROM pending_toggles WHERE habit_id = ? AND date = ? AND queued_at = ?",
+            [(habit_id, day, queued_at) for habit_id, day, _, queued_at in sent + gone],
+        )
+        connection.executemany(
+            "DELETE FROM replica_logs WHERE habit_id = ?", [(habit_id,) for habit_id, _, _, _ in gone]
+        )
+        connection.executemany(
+            "UPDATE pending_toggles SET attempts = ?, last_error = ? "
+            "WHERE habit_id = ? AND date = ? AND queued_at = ?",
+            [(MAX_ATTEMPTS, getattr(e, "message", None) or str(e), habit_id, day, queued_at)
+             for (habit_id, day, _, queued_at), e in parked],
+        )
+    for (habit_id, day, _, _), e in parked:
+        print(f"Write-behind: toggle of habit {habit_id} on {day} rejected: {e}")
+    return len(rows)
+
+def take_rejected(habit_ids):
+    """
+    Parked (rejected) toggles of these habits: {habit_id: message}. They are
+    removed from the queue and the habits' replica is re-pulled, so the
+    Dashboard shows the server's value again.
+    """
+    habit_ids = list(habit_ids)
+    if not habit_ids:
+        return {}
+    with _connect() as connection:
+        rows = connection.execute(
+            f"SELECT habit_id, date, last_error FROM pending_toggles WHERE attempts >= ? "
+            f"AND habit_id IN ({','.join('?' * len(habit_ids))})",
+            [MAX_ATTEMPTS, *habit_ids],
+        ).fetchall()
+        connection.executemany(
+            "DELETE FROM pending_toggles WHERE habit_id = ? AND date = ? AND attempts >= ?",
+            [(habit_id, day, MAX_ATTEMPTS) for habit_id, day, _ in rows],
+        )
+    if not rows:
+        return {}
+    mark_replica_stale({habit_id for habit_id, _, _ in rows})
+    return {habit_id: f"Your change for {day} was not saved: {error}" for habit_id, day, error in rows}
+
+# --- READS ---
+
+def refresh_replica(habit_ids, start_date, end_date=None):
+    """
+    Re-pulls the server's logs for these habits and dates into the replica
+    (one request), keeping local pending toggles on top.
+    """
+    end_date = end_date or start_date
+    server = get_habit_history(habit_ids, start_date, end_date, raise_errors=True) # Never wipe days on a failed read
+    days = _days_between(start_date, end_date)
+
+    with _connect() as connection:
+        connection.executemany(
+            "DELETE FROM replica_logs WHERE habit_id = ? AND date = ?",
+            [(habit_id, day) for habit_id in habit_ids for day in days],
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO replica_logs (habit_id, date) VALUES (?, ?)",
+            [
+                (habit_id, date.fromordinal(day_ordinal).isoformat())
+                for habit_id, bitmap in server.bitmaps.items()
+                for day_ordinal in bitmap
+            ],
+        )
+        # Pending toggles win over what the server said
+        pending = connection.execute("SELECT habit_id, date, done FROM pending_toggles").fetchall()
+        for habit_id, day, done in pending:
+            if done:
+                connection.execute("INSERT OR IGNORE INTO replica_logs (habit_id, date) VALUES (?, ?)", (habit_id, day))
+            else:
+                connection.execute("DELETE FROM replica_logs WHERE habit_id = ? AND date = ?", (habit_id, day))
+        now = time.time()
+        connection.executemany(
+            "INSERT OR REPLACE INTO replica_synced (habit_id, date, synced_at) VALUES (?, ?, ?)",
+            [(habit_id, day, now) for habit_id in habit_ids for day in days],
+        )
+
+def get_local_history(habit_ids, start_date, end_date=None, max_age=REPLICA_MAX_AGE):
+    """
+    Completion history served from the local replica (no network when fresh).
+    Re-pulled first unless every (habit, day) was synced in the last `max_age` seconds.
+    """
+    habit_ids = list(habit_ids)
+    end_date = end_date or start_date
+    days = _days_between(start_date, end_date)
+
+    fresh = 0
+    if habit_ids:
+        with _connect() as connection:
+            fresh = connection.execute(
+                f"SELECT COUNT(*) FROM replica_synced WHERE date BETWEEN ? AND ? AND synced_at >= ? "
+                f"AND habit_id IN ({','.join('?' * len(habit_ids))})",
+                [days[0], days[-1], time.time() - max_age, *habit_ids],
+            ).fetchone()[0]
+    if habit_ids and fresh < len(set(habit_ids)) * len(days):
+        try:
+            refresh_replica(habit_ids, start_date, end_date)
+        except Exception as e:
+            print(f"Replica refresh failed, serving local data: {e}")
+
+    history = HabitHistory.from_rows([], habit_ids)
+    if not habit_ids:
+        return history
+    with _connect() as connection:
+        rows = connection.execute(
+            f"SELECT habit_id, date FROM replica_logs WHERE date BETWEEN ? AND ? "
+            f"AND habit_id IN ({','.join('?' * len(habit_ids))})",
+            [days[0], days[-1], *habit_ids],
+        ).fetchall()
+    history.add_rows({"habit_id": habit_id, "date": day} for habit_id, day in rows)
+    return history
+
+def apply_remote_log(habit_id, day, done):
+    """
+    A log changed on the server (another device): mirror it in the replica,
+    unless a local toggle of the same box is still waiting to be flushed.
+    """
+    day = str(day)[:10]
+    with _connect() as connection:
+        pending = connection.execute(
+            "SELECT 1 FROM pending_toggles WHERE habit_id = ? AND date = ?", (habit_id, day)
+        ).fetchone()
+        if pending:
+            return
+        if done:
+            connection.execute("INSERT OR IGNORE INTO replica_logs (habit_id, date) VALUES (?, ?)", (habit_id, day))
+        else:
+            connection.execute("DELETE FROM replica_logs WHERE habit_id = ? AND date = ?", (habit_id, day))
+
+def mark_replica_stale(habit_ids=None):
+    """
+    Forces the next get_local_history() to re-pull its days from the server
+    (for these habits only, or for all of them).
+    """
+    with _connect() as connection:
+        if habit_ids is None:
+            connection.execute("DELETE FROM replica_synced")
+        else:
+            connection.executemany("DELETE FROM replica_synced WHERE habit_id = ?", [(habit_id,) for habit_id in habit_ids])
+
+def _days_between(start_date, end_date):
+    start = date.fromisoformat(str(start_date)[:10])
+    end = date.fromisoformat(str(end_date)[:10])
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+# --- BACKGROUND FLUSHER ---
+
+def reconcile():
+    """
+    Startup step: push every toggle an earlier run left in the queue.
+    """
+    while flush_pending():
+        pass
+
+def _flush_loop():
+    reconcile()
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        time.sleep(0.2) # Let a burst of clicks pile up into one batch
+        try:
+            while flush_pending() == FLUSH_BATCH:
+                pass # Big backlog: keep going
+        except Exception as e:
+            print(f"Write-behind flusher error: {e}")
+
+def start_flusher():
+    """
+    Starts the background flusher once per process (safe to call on every rerun).
+    """
+    global _flusher
+
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="write-behind-flusher", daemon=True)
+            _flusher.start()
+    return _flusher
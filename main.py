@@ -1,8 +1,14 @@
+import os
 import streamlit as st
+import database.streamlit_secrets # Lets the database layer read .streamlit/secrets.toml
+from utils.metrics import start_scope
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(page_title="Smart Habit Tracker", page_icon="📊", layout="centered")
 
+# Count this rerun's Supabase round trips (shown in the debug panel below)
+query_scope = start_scope()
+
 # --- SESSION STATE INITIALIZATION ---
 if "user_id" not in st.session_state:
     st.session_state.user_id = None
@@ -14,10 +20,37 @@ st.sidebar.title("Navigation")
 
 # Dynamic Menu: Show different options if logged in
 if st.session_state.user_id:
+    from database.live_sync import watch_user, unwatch_user, live_status, POLL_INTERVAL
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx is not None else None
+    # Keeps this user's data current in memory (shared by their sessions, dropped when none checks in)
+    watch_user(st.session_state.user_id, session_id)
+
+    # The version this run draws (the fragment below reruns the page when it moves on)
+    live = live_status(st.session_state.user_id)
+    st.session_state.live_version = live["version"] if live is not None else None
+
     st.sidebar.write(f"👤 **{st.session_state.username}**")
-    page = st.sidebar.radio("Go to:", ["Dashboard", "Analytics", "Add Habit", "Manage Habits"])
-    
+    page = st.sidebar.radio("Go to:", ["Dashboard", "Analytics", "Add Habit", "Manage Habits", "Import / Export"])
+
+    # Checks the in-memory view now and then (no query): rerun the page when it changed
+    @st.fragment(run_every=POLL_INTERVAL)
+    def follow_live_changes():
+        status = live_status(st.session_state.user_id, session_id) # Also this session's check-in
+        if status is None:
+            return
+        if status["version"] != st.session_state.live_version:
+            st.rerun()
+        st.caption("🟢 Live" if status["mode"] == "realtime" else f"🟡 Syncing every {POLL_INTERVAL:g}s")
+
+    with st.sidebar:
+        follow_live_changes()
+
     if st.sidebar.button("Logout"):
+        from utils.session_store import drop_store
+        unwatch_user(st.session_state.user_id, session_id) # Other sessions of this user keep the view
+        drop_store()
         st.session_state.user_id = None
         st.session_state.username = None
         st.rerun()
@@ -78,31 +111,68 @@ elif page == "Dashboard":
     st.write(f"**Date:** {today.strftime('%B %d, %Y')}")
     st.divider()
     
-    # 2. Fetch User's Habits
-    from database.queries import get_user_habits, is_habit_done_today, toggle_habit
-    habits = get_user_habits(st.session_state.user_id, active_only=True)
+    # 2. Fetch User's Habits (from this session's store: no query unless something changed)
+    from database.write_behind import start_flusher, pending_count, FLUSH_INTERVAL
+    from utils.session_store import sync_store, get_store, load_done, set_done, collect_rejected
+    start_flusher() # Background sync to Supabase (starts once per process)
+    store = sync_store(st.session_state.user_id)
+    habit_ids = [habit_id for habit_id, habit in store["habits"].items() if habit['is_active']]
     
-    if not habits:
+    if not habit_ids:
         st.info("You haven't added any habits yet. Go to 'Add Habit' to start!")
     else:
         # 3. Display Habits as Checkboxes
-        st.subheader("Today's Tasks")
+        from utils.schedule import SATISFIED, REST
         
-        for habit in habits:
-            habit_id = habit['habit_id']
-            habit_name = habit['name']
-            
-            # Check DB to see if it was already done today
-            is_done = is_habit_done_today(habit_id, today)
-            
-            # Create a checkbox
-            # value=is_done sets the initial state (checked/unchecked)
-            checked = st.checkbox(f"**{habit_name}** ({habit['category']})", value=is_done, key=habit_id)
+        # Read this week's state from the local replica (refreshed from the DB in ONE query when stale)
+        load_done(store, habit_ids, today)
+        # Habits with nothing to do today (Weekly already done, Weekdays at the weekend) go last
+        not_due = [habit_id for habit_id in habit_ids if store["state"].get(habit_id) in (SATISFIED, REST)]
+        due = [habit_id for habit_id in habit_ids if habit_id not in not_due]
+        
+        # One fragment per habit: ticking a box reruns that row only
+        @st.fragment
+        def today_row(habit_id):
+            store = get_store()
+            habit = store["habits"].get(habit_id)
+            if habit is None:
+                return
             
-            # 4. Handle Logic (Only if state changed)
-            if checked != is_done:
-                toggle_habit(habit_id, today, checked)
-                st.rerun() # Refresh to confirm the save
+            # value= sets the initial state (checked/unchecked)
+            # 4. Saved locally right away (set_done); the background flusher sends it to the DB
+            st.checkbox(
+                f"**{habit['name']}** ({habit['category']})",
+                value=store["done"].get(habit_id, False),
+                key=f"done_{habit_id}",
+                on_change=set_done,
+                args=(habit_id,),
+            )
+            error = store["errors"].pop(habit_id, None)
+            if error:
+                st.error(f"❌ {error}")
+        
+        st.subheader("Today's Tasks")
+        if not due:
+            st.info("Nothing is due today.")
+        for habit_id in due:
+            today_row(habit_id)
+        
+        if not_due:
+            st.subheader("Not due today")
+            st.caption("Weekly habits already done this week, and weekday habits at the weekend. You can still tick them.")
+            for habit_id in not_due:
+                today_row(habit_id)
+        
+        # Rows rerun on their own, so this checks the queue by itself
+        @st.fragment(run_every=FLUSH_INTERVAL)
+        def sync_caption():
+            if collect_rejected(get_store()):
+                st.rerun() # Redraw the rows with their errors
+            waiting = pending_count()
+            if waiting:
+                st.caption(f"⏳ {waiting} change(s) waiting to sync...")
+        
+        sync_caption()
 
 elif page == "Analytics":
     st.title("📈 Analytics Dashboard")
@@ -133,7 +203,75 @@ elif page == "Analytics":
         st.plotly_chart(fig, use_container_width=True)
 
         st.divider()
-        
+
+        # 2b. Streaks (respects each habit's frequency)
+        st.subheader("🔥 Streaks")
+        from utils.analytics import get_streak_stats
+        df_streaks = get_streak_stats(st.session_state.user_id)
+
+        if not df_streaks.empty:
+            st.dataframe(
+                df_streaks[["name", "frequency", "current_streak", "longest_streak", "completion_rate"]],
+                column_config={
+                    "name": "Habit",
+                    "frequency": "Frequency",
+                    "current_streak": "Current Streak",
+                    "longest_streak": "Longest Streak",
+                    "completion_rate": st.column_config.ProgressColumn("Last 30 Days", format="percent", min_value=0, max_value=1),
+                },
+                hide_index=True,
+                use_container_width=True,
+            )
+
+        st.divider()
+
+        # 2c. Calendar heatmap (GitHub style), from the maintained calendar counters
+        st.subheader("📅 Activity Calendar")
+        from utils.heatmap import get_calendar_heatmap
+        from database.live_sync import get_live_habits
+        import plotly.graph_objects as go
+
+        habit_options = {"All habits": None}
+        habit_options.update({habit["name"]: habit["habit_id"] for habit in get_live_habits(st.session_state.user_id, active_only=False)})
+        col1, col2 = st.columns(2)
+        with col1:
+            chosen_habit = st.selectbox("Habit", list(habit_options))
+        with col2:
+            span = st.radio("Range", ["Last 365 days", "All history"], horizontal=True)
+
+        calendar = get_calendar_heatmap(
+            st.session_state.user_id,
+            habit_id=habit_options[chosen_habit],
+            days=365 if span == "Last 365 days" else None,
+        )
+        if calendar is None:
+            st.info("No activity to show yet.")
+        else:
+            fig_calendar = go.Figure(go.Heatmap(
+                z=calendar["z"],
+                x=calendar["x"],
+                y=calendar["y"],
+                customdata=calendar["labels"],
+                hovertemplate="%{customdata}: %{z}<extra></extra>" if calendar["labels"] else "%{y} %{x}: %{z}<extra></extra>",
+                colorscale="Greens",
+                xgap=2,
+                ygap=2,
+                showscale=False,
+            ))
+            fig_calendar.update_layout(
+                template="plotly_dark",
+                height=220 if calendar["resolution"] == "day" else 60 + 28 * len(calendar["y"]),
+                margin=dict(l=10, r=10, t=10, b=10),
+                yaxis=dict(autorange="reversed"),
+            )
+            if calendar["resolution"] == "day":
+                fig_calendar.update_xaxes(tickformat="%b", dtick="M1")
+            st.plotly_chart(fig_calendar, use_container_width=True)
+            if calendar["resolution"] != "day":
+                st.caption(f"Showing one cell per {calendar['resolution']} to keep the chart light.")
+
+        st.divider()
+
         # 3. Heatmap (Day vs Habit)
         st.subheader("🔥 Consistency Heatmap")
         st.write("When are you most active?")
@@ -153,6 +291,68 @@ elif page == "Analytics":
             )
             st.plotly_chart(fig2, use_container_width=True)
 
+        st.divider()
+
+        # 4. Habits done together (pairwise correlation, see utils/correlation.py)
+        st.subheader("🔗 Habits Done Together")
+        from utils.correlation import get_habit_correlations, rolling_phi
+        import numpy as np
+        import pandas as pd
+
+        col1, col2 = st.columns(2)
+        with col1:
+            pair_span = st.radio("Period", ["Last 90 days", "Last 365 days", "All history"], horizontal=True, key="pair_span")
+        with col2:
+            measure = st.radio("Show", ["Correlation", "Chance of column when row is done"], horizontal=True, key="pair_measure")
+
+        pairs = get_habit_correlations(
+            st.session_state.user_id,
+            days={"Last 90 days": 90, "Last 365 days": 365, "All history": None}[pair_span],
+        )
+        shown = np.flatnonzero(pairs["counts"] > 0) if pairs is not None else []
+        if len(shown) < 2:
+            st.info("Complete at least two habits to see how they relate.")
+        else:
+            # Hundreds of habits make an unreadable chart: show the most completed ones
+            if len(shown) > 15:
+                limit = st.slider("Habits shown (most completed first)", 2, len(shown), min(30, len(shown)), key="pair_limit")
+                shown = shown[np.argsort(-pairs["counts"][shown], kind="stable")[:limit]]
+            names = [pairs["names"][i] for i in shown]
+            grid = pairs["phi" if measure == "Correlation" else "conditional"][np.ix_(shown, shown)]
+            together = pairs["together"][np.ix_(shown, shown)]
+
+            fig_pairs = go.Figure(go.Heatmap(
+                z=np.round(grid, 2),
+                x=names,
+                y=names,
+                customdata=together,
+                hovertemplate="%{y} / %{x}: %{z}<br>Done together on %{customdata} days<extra></extra>",
+                colorscale="RdBu" if measure == "Correlation" else "Greens",
+                zmin=-1 if measure == "Correlation" else 0,
+                zmax=1,
+            ))
+            fig_pairs.update_layout(
+                template="plotly_dark",
+                height=200 + 22 * len(names),
+                margin=dict(l=10, r=10, t=10, b=10),
+                yaxis=dict(autorange="reversed"),
+            )
+            st.plotly_chart(fig_pairs, use_container_width=True)
+            st.caption(f"Since {pairs['start'].strftime('%B %d, %Y')}. Correlation near 1: usually done (and skipped) together; near -1: one tends to replace the other.")
+
+            # Trend of one pair over time (30-day rolling window)
+            col1, col2 = st.columns(2)
+            with col1:
+                first = st.selectbox("Habit", names, key="pair_first")
+            with col2:
+                second = st.selectbox("Compared with", names, index=1, key="pair_second")
+            i, j = shown[names.index(first)], shown[names.index(second)]
+            if i != j:
+                trend = rolling_phi(pairs["done"][:, i], pairs["done"][:, j], pairs["alive"][:, i] & pairs["alive"][:, j])
+                if len(trend):
+                    days_index = pd.date_range(pairs["start"], periods=len(pairs["done"]))[-len(trend):]
+                    st.line_chart(pd.DataFrame({"30-day correlation": trend}, index=days_index))
+
 elif page == "Add Habit":
     st.title("➕ Add a New Habit")
     st.write("What do you want to track?")
@@ -176,6 +376,8 @@ elif page == "Add Habit":
                 result = add_habit(st.session_state.user_id, habit_name, category, frequency)
                 
                 if result == "Success":
+                    from utils.session_store import drop_store
+                    drop_store() # The pages re-read the habit list
                     st.success(f"✅ Habit '{habit_name}' added successfully!")
                 else:
                     st.error(f"❌ Error: {result}")
@@ -185,58 +387,120 @@ elif page == "Add Habit":
 elif page == "Manage Habits":
     st.title("⚙️ Manage Your Habits")
     
-    from database.queries import get_user_habits, delete_habit, update_habit, toggle_habit_status
+    from utils.session_store import sync_store, get_store, save_habit, flip_active, remove_habit
+    categories = ["Health", "Career", "Learning", "Mindfulness", "Other"]
+    frequencies = ["Daily", "Weekly", "Weekdays"]
     
-    # 1. Fetch current habits
-    habits = get_user_habits(st.session_state.user_id, active_only=False)
+    # 1. Fetch current habits (from this session's store)
+    store = sync_store(st.session_state.user_id)
     
-    if not habits:
+    # One fragment per habit: Save / Archive / Delete redraw that expander only
+    @st.fragment
+    def habit_row(habit_id):
+        store = get_store()
+        habit = store["habits"].get(habit_id)
+        if habit is None:
+            return # Deleted: the row just disappears
+        
+        # Visual Cue: Add (Archived) to the name if it's inactive
+        status_icon = "🟢" if habit['is_active'] else "zzz"
+        expander_title = f"{status_icon} {habit['name']}"
+        
+        with st.expander(expander_title):
+            error = store["errors"].pop(habit_id, None)
+            if error:
+                st.error(f"❌ {error}")
+            st.write(f"**Current Status:** {'Active' if habit['is_active'] else 'Archived'}")
+            
+            # --- EDIT SECTION ---
+            st.subheader("Edit Details")
+            with st.form(key=f"form_{habit_id}"):
+                st.text_input("Name", value=habit['name'], key=f"edit_{habit_id}_name")
+                col1, col2 = st.columns(2)
+                # Rows written outside the app may hold other values: show the default instead of crashing
+                category_index = categories.index(habit['category']) if habit['category'] in categories else categories.index("Other")
+                frequency_index = frequencies.index(habit['frequency']) if habit['frequency'] in frequencies else 0
+                col1.selectbox("Category", categories, index=category_index, key=f"edit_{habit_id}_category")
+                col2.selectbox("Frequency", frequencies, index=frequency_index, key=f"edit_{habit_id}_frequency")
+                st.form_submit_button("Save Changes", on_click=save_habit, args=(habit_id,))
+
+            st.divider()
+
+            # --- ACTIONS SECTION ---
+            col_a, col_b = st.columns(2)
+            
+            # 1. ARCHIVE / ACTIVATE BUTTON
+            with col_a:
+                btn_label = "Deactivate (Archive)" if habit['is_active'] else "Reactivate"
+                st.button(btn_label, key=f"arch_{habit_id}", on_click=flip_active, args=(habit_id,))
+            
+            # 2. HARD DELETE BUTTON (Still good to keep for mistakes)
+            with col_b:
+                st.button("🗑️ Delete Permanently", key=f"del_{habit_id}", on_click=remove_habit, args=(habit_id,))
+    
+    if not store["habits"]:
         st.info("You have no habits to manage.")
     else:
-        for habit in habits:
-            # Visual Cue: Add (Archived) to the name if it's inactive
-            status_icon = "🟢" if habit['is_active'] else "zzz"
-            expander_title = f"{status_icon} {habit['name']}"
-            
-            with st.expander(expander_title):
-                st.write(f"**Current Status:** {'Active' if habit['is_active'] else 'Archived'}")
-                
-                # --- EDIT SECTION (Same as before) ---
-                st.subheader("Edit Details")
-                with st.form(key=f"edit_{habit['habit_id']}"):
-                    new_name = st.text_input("Name", value=habit['name'])
-                    # ... (Keep your existing selectboxes for Category/Frequency here) ...
-                    # To save time, just copy the col1/col2 logic from your previous code
-                    col1, col2 = st.columns(2)
-                    new_cat = col1.selectbox("Category", ["Health", "Career", "Learning", "Mindfulness", "Other"], index=["Health", "Career", "Learning", "Mindfulness", "Other"].index(habit['category']))
-                    new_freq = col2.selectbox("Frequency", ["Daily", "Weekly", "Weekdays"], index=["Daily", "Weekly", "Weekdays"].index(habit['frequency']))
-                    
-                    if st.form_submit_button("Save Changes"):
-                        update_habit(habit['habit_id'], new_name, new_cat, new_freq)
-                        st.rerun()
-
-                st.divider()
-
-                # --- ACTIONS SECTION ---
-                col_a, col_b = st.columns(2)
-                
-                # 1. ARCHIVE / ACTIVATE BUTTON
-                with col_a:
-                    btn_label = "Deactivate (Archive)" if habit['is_active'] else "Reactivate"
-                    if st.button(btn_label, key=f"arch_{habit['habit_id']}"):
-                        toggle_habit_status(habit['habit_id'], habit['is_active'])
-                        st.rerun()
-                
-                # 2. HARD DELETE BUTTON (Still good to keep for mistakes)
-                with col_b:
-                    if st.button("🗑️ Delete Permanently", key=f"del_{habit['habit_id']}"):
-                        delete_habit(habit['habit_id'])
-                        st.rerun()
+        for habit_id in list(store["habits"]):
+            habit_row(habit_id)
 
-# --- TEMP: DATABASE CHECK ---
-from database.db_connection import get_db_connection
+elif page == "Import / Export":
+    st.title("📦 Import / Export")
+    from utils.transfer import export_user_data, import_user_data
+    import io
+
+    # 1. Export: every habit + every completed day, as one Parquet file
+    st.subheader("Export your history")
+    st.caption("A Parquet file: one row per habit, plus one row per completed day.")
+    if st.button("Prepare Export"):
+        buffer = io.BytesIO()
+        rows = export_user_data(st.session_state.user_id, buffer, "parquet")
+        st.download_button(
+            f"⬇️ Download ({rows} rows)",
+            data=buffer.getvalue(),
+            file_name=f"habits_{st.session_state.username}.parquet",
+            mime="application/vnd.apache.parquet",
+        )
+
+    # 2. Import: Parquet or CSV (columns: name, category, frequency, is_active, date)
+    st.subheader("Import history")
+    uploaded = st.file_uploader("Parquet or CSV file", type=["parquet", "csv"])
+    if uploaded is not None and st.button("Import"):
+        fmt = "csv" if uploaded.name.lower().endswith(".csv") else "parquet"
+        with st.spinner("Importing..."):
+            try:
+                summary = import_user_data(st.session_state.user_id, uploaded, fmt)
+            except Exception as e:
+                summary = None
+                st.error(f"❌ Could not read the file: {e}")
+        if summary is not None:
+            from utils.session_store import drop_store
+            drop_store()
+            st.success(
+                f"✅ {summary.rows_read} rows read: {summary.habits_created} habits created, "
+                f"{summary.logs_inserted} days added ({summary.logs_unchanged} already there)."
+            )
+            if summary.rows_rejected or summary.logs_failed:
+                st.warning(f"⚠️ {summary.rows_rejected} rows rejected, {summary.logs_failed} days failed.")
+                for error in summary.errors:
+                    st.caption(error)
 
+# --- TEMP: DATABASE CHECK ---
 if st.sidebar.button("Test DB Connection"):
-    db = get_db_connection()
-    if db:
-        st.sidebar.success("✅ Connected to Database!")
\ No newline at end of file
+    from database.db_connection import check_db_connection
+    ok, message = check_db_connection()
+    if ok:
+        st.sidebar.success(f"✅ {message}")
+    else:
+        st.sidebar.error(f"❌ {message}")
+
+# --- DEBUG: QUERIES FOR THIS RERUN ---
+if os.getenv("HABIT_DEBUG") == "1" or st.sidebar.checkbox("Show query stats"):
+    with st.sidebar.expander("🔎 Queries (this rerun)", expanded=True):
+        st.write(f"**{query_scope['round_trips']}** round trips, "
+                 f"**{query_scope['seconds'] * 1000:.0f} ms** in Supabase, "
+                 f"**{query_scope['errors']}** errors")
+        for (table, operation), count in sorted(query_scope["calls"].items()):
+            st.caption(f"{table}.{operation} × {count}")
+        from database.resilience import supabase_breaker
+        st.caption(f"Supabase circuit: {supabase_breaker.state}")
@@ -0,0 +1,249 @@
+"""
+Nightly batch job: streaks, completion rates and weekday distributions for
+every habit of every user, written to habit_rollups (migration 004).
+
+    python nightly_rollups.py                          # all users, as of today
+    python nightly_rollups.py --workers 8 --page-users 500
+    python nightly_rollups.py --date 2026-01-31 --restart
+    SUPABASE_URL=fake:///data/fake_1m.pkl python nightly_rollups.py --dump data/fake_1m.pkl
+
+How it runs:
+1. Users are walked in pages (keyset on user_id), so memory is bounded by one page per fetcher.
+2. Fetcher threads download a page's habits and logs (I/O), a process pool runs
+   the NumPy streak engine on it (CPU, one page per core), and the fetcher
+   writes the rows back with bulk upserts.
+3. Pages are committed in order: after each one the checkpoint file records
+   the last user_id done, so an interrupted run resumes where it stopped.
+   Re-running a page is harmless (upsert on habit_id).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import numpy as np
+from postgrest.types import ReturnMethod
+
+from database.db_connection import get_db_connection
+from database.queries import iter_habit_logs, LOG_PAGE_SIZE
+from utils.streaks import compute_habit_rollups, to_day, DEFAULT_WINDOW_DAYS
+
+CHECKPOINT_PATH = os.getenv(
+    "HABIT_ROLLUP_CHECKPOINT",
+    os.path.join(os.path.expanduser("~"), ".smart_habit_tracker", "rollup_checkpoint.json"),
+)
+USER_PAGE = 200     # users per page (their ids go into one in.(...) filter)
+WRITE_CHUNK = 1000  # rollup rows per upsert request
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal() # datetime64[D] 0 -> date ordinal
+
+# --- CHECKPOINT ---
+
+def load_checkpoint(path, as_of):
+    """
+    The checkpoint of an unfinished (or finished) run for the same day, or None.
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get("as_of") == as_of.isoformat() else None
+
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename: a crash mid-write never leaves a half-written file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+# --- READING ---
+
+def iter_user_pages(page_users, after_user_id=None):
+    """
+    Yields lists of user_ids, in user_id order, starting after `after_user_id`.
+    """
+    supabase = get_db_connection()
+    last = after_user_id
+    while True:
+        query = supabase.table("users").select("user_id")
+        if last is not None:
+            query = query.gt("user_id", last)
+        rows = query.order("user_id").limit(page_users).execute().data
+        if not rows:
+            return
+        user_ids = [row["user_id"] for row in rows]
+        yield user_ids
+        last = user_ids[-1]
+        if len(rows) < page_users:
+            return
+
+def fetch_habits(user_ids):
+    """
+    Every habit of these users (keyset pages, so the server row cap doesn't cut it short).
+    """
+    supabase = get_db_connection()
+    habits, last = [], None
+    while True:
+        query = supabase.table("habits").select("habit_id, user_id, frequency, created_at").in_("user_id", user_ids)
+        if last is not None:
+            query = query.gt("habit_id", last)
+        rows = query.order("habit_id").limit(LOG_PAGE_SIZE).execute().data
+        habits.extend(rows)
+        if len(rows) < LOG_PAGE_SIZE:
+            return habits
+        last = rows[-1]["habit_id"]
+
+def fetch_logs(habit_ids):
+    """
+    (habit_ids, day ordinals) of every log of these habits, as NumPy arrays.
+    """
+    log_habit_ids, log_dates = [], []
+    for page in iter_habit_logs(habit_ids, columns="habit_id, date"):
+        log_habit_ids.extend(row["habit_id"] for row in page)
+        log_dates.extend(str(row["date"])[:10] for row in page)
+    days = np.array(log_dates, dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    return np.array(log_habit_ids, dtype=np.int64), days
+
+# --- ONE PAGE ---
+
+def to_rows(habits, metrics, as_of, window_days, computed_at):
+    rows = []
+    for i, habit in enumerate(habits):
+        last_done = int(metrics["last_done"][i])
+        rows.append({
+            "habit_id": habit["habit_id"],
+            "user_id": str(habit["user_id"]),
+            "as_of": as_of.isoformat(),
+            "current_streak": int(metrics["current_streak"][i]),
+            "longest_streak": int(metrics["longest_streak"][i]),
+            "periods_done": int(metrics["periods_done"][i]),
+            "periods_scheduled": int(metrics["periods_scheduled"][i]),
+            "completion_rate": round(float(metrics["completion_rate"][i]), 4),
+            "window_days": window_days,
+            "total_done": int(metrics["total_done"][i]),
+            "last_done": date.fromordinal(last_done).isoformat() if last_done else None,
+            "weekday_counts": [int(count) for count in metrics["weekday_counts"][i]],
+            "computed_at": computed_at,
+        })
+    return rows
+
+def run_page(user_ids, pool, as_of, window_days, computed_at):
+    """
+    Fetch (this thread) -> compute (process pool) -> write (this thread).
+    Returns (users, habits, logs, seconds).
+    """
+    started = time.perf_counter()
+    habits = fetch_habits(user_ids)
+    if not habits:
+        return len(user_ids), 0, 0, time.perf_counter() - started
+    log_habit_ids, log_days = fetch_logs([habit["habit_id"] for habit in habits])
+
+    metrics = pool.submit(
+        compute_habit_rollups,
+        np.array([habit["habit_id"] for habit in habits], dtype=np.int64),
+        [habit["frequency"] for habit in habits],
+        log_habit_ids,
+        log_days,
+        today=as_of.toordinal(),
+        window_days=window_days,
+        start_days=[to_day(habit["created_at"]) if habit.get("created_at") else as_of.toordinal() for habit in habits],
+    ).result()
+
+    rows = to_rows(habits, metrics, as_of, window_days, computed_at)
+    supabase = get_db_connection()
+    for i in range(0, len(rows), WRITE_CHUNK):
+        supabase.table("habit_rollups").upsert(
+            rows[i:i + WRITE_CHUNK], on_conflict="habit_id", returning=ReturnMethod.minimal,
+        ).execute()
+    return len(user_ids), len(habits), len(log_days), time.perf_counter() - started
+
+# --- THE JOB ---
+
+def run_rollups(as_of=None, workers=None, fetchers=None, page_users=USER_PAGE,
+                window_days=DEFAULT_WINDOW_DAYS, checkpoint_path=CHECKPOINT_PATH, restart=False):
+    """
+    Computes and stores the rollups of every user. Returns the final checkpoint dict.
+    """
+    as_of = as_of or date.today()
+    workers = workers or os.cpu_count() or 1
+    fetchers = fetchers or workers + 1 # One spare so a core never waits on the network
+    computed_at = datetime.now(timezone.utc).isoformat()
+
+    checkpoint = None if restart else load_checkpoint(checkpoint_path, as_of)
+    if checkpoint is not None and checkpoint["finished"]:
+        print(f"✅ Rollups for {as_of} are already done (use --restart to redo them).", file=sys.stderr)
+        return checkpoint
+    if checkpoint is None:
+        checkpoint = {"as_of": as_of.isoformat(), "last_user_id": None, "users": 0, "habits": 0, "logs": 0, "finished": False}
+    else:
+        print(f"↩️  Resuming after user {checkpoint['last_user_id']} ({checkpoint['users']} users done).", file=sys.stderr)
+
+    started = last_print = time.perf_counter()
+    # "spawn": workers start clean instead of forking a process that already runs threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool, \
+            ThreadPoolExecutor(max_workers=fetchers) as io:
+        in_flight = deque()
+        pages = iter_user_pages(page_users, checkpoint["last_user_id"])
+
+        def submit_next():
+            user_ids = next(pages, None)
+            if user_ids is not None:
+                in_flight.append((user_ids[-1], io.submit(run_page, user_ids, pool, as_of, window_days, computed_at)))
+
+        for _ in range(fetchers * 2):
+            submit_next()
+
+        # Commit pages in order, so the checkpoint never skips an unfinished one
+        while in_flight:
+            last_user_id, future = in_flight.popleft()
+            users, habits, logs, _ = future.result() # Re-raises: the checkpoint stays on the last good page
+            checkpoint.update(
+                last_user_id=last_user_id,
+                users=checkpoint["users"] + users,
+                habits=checkpoint["habits"] + habits,
+                logs=checkpoint["logs"] + logs,
+            )
+            save_checkpoint(checkpoint_path, checkpoint)
+            submit_next()
+
+            now = time.perf_counter()
+            if now - last_print >= 2:
+                last_print = now
+                print(f"  users {checkpoint['users']}  habits {checkpoint['habits']}  logs {checkpoint['logs']:,} "
+                      f"({checkpoint['logs'] / (now - started):,.0f} logs/s)", file=sys.stderr)
+
+    checkpoint["finished"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Rollups as of {as_of}: {checkpoint['users']} users, {checkpoint['habits']} habits, "
+          f"{checkpoint['logs']:,} logs in {elapsed:.1f}s with {workers} workers.", file=sys.stderr)
+    return checkpoint
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute habit rollups for all users.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="day to compute for (default: today)")
+    parser.add_argument("--workers", type=int, default=None, help="compute processes (default: all cores)")
+    parser.add_argument("--fetchers", type=int, default=None, help="I/O threads (default: workers + 1)")
+    parser.add_argument("--page-users", type=int, default=USER_PAGE)
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS, help="completion-rate window")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an earlier run")
+    parser.add_argument("--dump", help="(fake:// only) save the snapshot with the rollups afterwards")
+    args = parser.parse_args(argv)
+
+    run_rollups(args.date, args.workers, args.fetchers, args.page_users, args.window_days, args.checkpoint, args.restart)
+
+    if args.dump:
+        client = get_db_connection()
+        getattr(client, "_client", client).save(args.dump) # Unwrap the metrics wrapper
+        print(f"💾 Snapshot saved to {args.dump}", file=sys.stderr)
+
+# Run the function
+if __name__ == "__main__":
+    main()
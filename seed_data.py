@@ -1,58 +1,260 @@
-import random
+"""
+Synthetic load generator: many users, many habits, years of history.
+
+    python seed_data.py                                   # 10 users x 8 habits x 1 year into Supabase
+    python seed_data.py --users 200 --habits 10 --years 2 --workers 8
+    python seed_data.py --target fake --users 300 --years 3 --dump data/fake_1m.pkl
+    SUPABASE_URL=fake:///data/fake_1m.pkl streamlit run main.py   # then browse the fake data
+
+Deterministic: the same --seed always produces the same users, habits and logs
+(whatever the number of workers). Safe to re-run: users are matched by
+username, habits by name, and logs are upserted on (habit_id, date).
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, timedelta
-from database.db_connection import get_db_connection
-
-# 1. Connect to DB
-supabase = get_db_connection()
-
-def seed_history():
-    print("🌱 Starting Data Seeding...")
-    
-    # 2. Get your User ID (We'll just pick the first user found for simplicity)
-    users = supabase.table("users").select("user_id").execute()
-    if not users.data:
-        print("❌ No users found! Sign up first.")
-        return
-    
-    user_id = users.data[0]['user_id']
-    
-    # 3. Get that user's habits
-    habits = supabase.table("habits").select("habit_id", "name").eq("user_id", user_id).execute()
-    
-    if not habits.data:
-        print("❌ No habits found! Add some habits in the app first.")
-        return
-
-    print(f"Found {len(habits.data)} habits. Generating history...")
-
-    # 4. Loop back 30 days
-    today = date.today()
-    logs_to_insert = []
-    
-    for i in range(30):
-        # Calculate the date (Today - i days)
-        current_date = today - timedelta(days=i)
-        
-        for habit in habits.data:
-            # FLIP A COIN: 70% chance of completing the habit
-            if random.random() < 0.7: 
-                log = {
-                    "habit_id": habit['habit_id'],
-                    "date": str(current_date),
-                    "status": "completed"
-                }
-                logs_to_insert.append(log)
-
-    # 5. Bulk Insert (Much faster than one by one)
-    if logs_to_insert:
-        try:
-            supabase.table("tracker_logs").insert(logs_to_insert).execute()
-            print(f"✅ Successfully inserted {len(logs_to_insert)} log entries!")
-        except Exception as e:
-            print(f"❌ Error inserting data: {e}")
+
+import numpy as np
+from postgrest.types import ReturnMethod
+
+from database.db_connection import get_db_connection, install_client
+from utils.security import make_hash
+
+CATEGORIES = ["Health", "Career", "Learning", "Mindfulness", "Other"]
+FREQUENCIES = ["Daily", "Weekdays", "Weekly"]
+FREQUENCY_MIX = [0.6, 0.25, 0.15]
+HABIT_NAMES = [
+    "Drink 2L Water", "Morning Run", "Read 20 Pages", "Meditate", "Journal", "Stretch",
+    "No Sugar", "Practice Guitar", "Learn Spanish", "Code Kata", "Walk 10k Steps", "Sleep by 11",
+    "Call Family", "Plan the Day", "Cold Shower", "Floss", "Gym", "Write 500 Words",
+]
+USERNAME_CHUNK = 200
+# Daily habits slip at the weekend (Mon..Sun)
+WEEKDAY_FACTOR = np.array([1.0, 1.0, 0.98, 0.95, 0.9, 0.75, 0.7])
+
+# --- GENERATION (pure NumPy, no database) ---
+
+def user_rng(seed, user_index):
+    # One independent stream per user: results don't depend on worker scheduling
+    return np.random.default_rng([seed, user_index])
+
+def make_habits(rng, n_habits, start, end):
+    """
+    Habit definitions for one user: names, mixed frequencies, staggered start dates.
+    """
+    total_days = (end - start).days + 1
+    names = rng.choice(len(HABIT_NAMES), size=n_habits, replace=n_habits > len(HABIT_NAMES))
+    frequencies = rng.choice(len(FREQUENCIES), size=n_habits, p=FREQUENCY_MIX)
+    # Most habits exist from the start; the rest were added later
+    offsets = np.where(rng.random(n_habits) < 0.6, 0, rng.integers(0, max(total_days - 14, 1), n_habits))
+
+    habits = []
+    for i in range(n_habits):
+        suffix = f" #{i + 1}" if n_habits > len(HABIT_NAMES) else ""
+        habits.append({
+            "name": HABIT_NAMES[names[i]] + suffix,
+            "category": CATEGORIES[int(names[i]) % len(CATEGORIES)],
+            "frequency": FREQUENCIES[frequencies[i]],
+            "start": start + timedelta(days=int(offsets[i])),
+        })
+    return habits
+
+def completion_days(rng, frequency, start, end, completion):
+    """
+    Days (as ordinals) a habit was done between start and end.
+    - each habit has its own base adherence around `completion`
+    - motivation comes in phases (good weeks, lapses, holidays)
+    - novelty fades over the first weeks
+    - Daily habits slip at weekends, Weekdays habits skip them,
+      Weekly habits are done ~1-2 times a week
+    """
+    n_days = (end - start).days + 1
+    if n_days <= 0:
+        return np.empty(0, dtype=np.int64)
+    ordinals = np.arange(start.toordinal(), end.toordinal() + 1)
+    weekdays = (ordinals + 6) % 7 # date.fromordinal(1) is a Monday -> 0
+
+    base = np.clip(rng.beta(8 * completion, 8 * (1 - completion)), 0.05, 0.98)
+
+    # Phases of ~3 weeks with their own motivation level
+    phase_lengths = rng.geometric(1 / 21, size=n_days // 7 + 2)
+    phase_levels = rng.choice([0.15, 0.6, 1.0, 1.0, 1.1], size=phase_lengths.size)
+    motivation = np.repeat(phase_levels, phase_lengths)[:n_days]
+    if motivation.size < n_days:
+        motivation = np.pad(motivation, (0, n_days - motivation.size), constant_values=1.0)
+
+    novelty = 1.0 + 0.25 * np.exp(-np.arange(n_days) / 14)
+    p = base * motivation * novelty
+
+    if frequency == "Daily":
+        p = p * WEEKDAY_FACTOR[weekdays]
+    elif frequency == "Weekdays":
+        p = np.where(weekdays < 5, p, 0.0)
     else:
-        print("⚠️ No data generated.")
+        p = p * 1.5 / 7
+
+    done = rng.random(n_days) < np.clip(p, 0.0, 1.0)
+    return ordinals[done]
+
+# --- WRITING ---
+
+class Progress:
+    """
+    Thread-safe counters, printed to stderr at most every `every` seconds.
+    """
+
+    def __init__(self, total_users, every=2.0):
+        self.total_users = total_users
+        self.every = every
+        self.users = self.habits = self.logs = self.requests = 0
+        self.started = self.last_print = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def add(self, users=0, habits=0, logs=0, requests=0):
+        with self.lock:
+            self.users += users
+            self.habits += habits
+            self.logs += logs
+            self.requests += requests
+            now = time.perf_counter()
+            if now - self.last_print >= self.every:
+                self.last_print = now
+                self.print_line(now)
+
+    def print_line(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.logs / elapsed if elapsed else 0
+        remaining = (self.total_users - self.users) * elapsed / self.users if self.users else 0
+        print(f"  users {self.users}/{self.total_users}  habits {self.habits}  logs {self.logs:,} "
+              f"({rate:,.0f}/s)  requests {self.requests}  elapsed {elapsed:.0f}s  eta {remaining:.0f}s",
+              file=sys.stderr)
+
+def chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def ensure_users(supabase, usernames, chunk_rows, progress):
+    """
+    Creates the users that don't exist yet. Returns {username: user_id}.
+    """
+    password_hash = make_hash("loadgen")
+    user_ids = {}
+    # The lookup puts usernames in the URL, so keep these batches small
+    for chunk in chunks(usernames, min(chunk_rows, USERNAME_CHUNK)):
+        supabase.table("users").upsert(
+            [{"username": username, "password_hash": password_hash} for username in chunk],
+            on_conflict="username", ignore_duplicates=True, returning=ReturnMethod.minimal,
+        ).execute()
+        rows = supabase.table("users").select("user_id, username").in_("username", chunk).execute().data
+        user_ids.update({row["username"]: row["user_id"] for row in rows})
+        progress.add(requests=2)
+    return user_ids
+
+def seed_user(supabase, user_id, user_index, args, start, end, progress):
+    """
+    Creates one user's habits (reusing ones with the same name) and their history.
+    """
+    rng = user_rng(args.seed, user_index)
+    habits = make_habits(rng, args.habits, start, end)
+
+    # 1. Habits: one select + one insert for the missing ones
+    existing = supabase.table("habits").select("habit_id, name").eq("user_id", user_id).execute().data
+    habit_ids = {row["name"]: row["habit_id"] for row in existing}
+    missing = [
+        {
+            "user_id": user_id,
+            "name": habit["name"],
+            "category": habit["category"],
+            "frequency": habit["frequency"],
+            "created_at": habit["start"].isoformat() + "T08:00:00+00:00",
+        }
+        for habit in habits
+        if habit["name"] not in habit_ids
+    ]
+    requests = 1
+    if missing:
+        created = supabase.table("habits").insert(missing).execute().data
+        habit_ids.update({row["name"]: row["habit_id"] for row in created})
+        requests += 1
+    progress.add(habits=len(missing), requests=requests)
+
+    # 2. Logs: generated per habit, sent in size-bounded upserts
+    pending = []
+    for habit in habits:
+        days = completion_days(rng, habit["frequency"], habit["start"], end, args.completion)
+        habit_id = habit_ids[habit["name"]]
+        pending.extend({"habit_id": habit_id, "date": date.fromordinal(int(day)).isoformat()} for day in days)
+        while len(pending) >= args.chunk_rows:
+            send_logs(supabase, pending[:args.chunk_rows], progress)
+            pending = pending[args.chunk_rows:]
+    if pending:
+        send_logs(supabase, pending, progress)
+    progress.add(users=1)
+
+def send_logs(supabase, rows, progress):
+    supabase.table("tracker_logs").upsert(
+        rows, on_conflict="habit_id,date", ignore_duplicates=True, returning=ReturnMethod.minimal,
+    ).execute()
+    progress.add(logs=len(rows), requests=1)
+
+def connect(target):
+    """
+    --target fake: a fresh in-process FakeSupabase (installed as THE client).
+    --target supabase: the project from SUPABASE_URL / SUPABASE_KEY.
+    """
+    if target == "fake":
+        from database.fake_supabase import FakeSupabase
+
+        fake = FakeSupabase()
+        install_client(fake)
+        return get_db_connection(), fake
+    return get_db_connection(), None
+
+def seed_history(argv=None):
+    parser = argparse.ArgumentParser(description="Generate realistic habit-tracking data at scale.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--habits", type=int, default=8, help="habits per user")
+    parser.add_argument("--years", type=float, default=1.0, help="years of history (ending today)")
+    parser.add_argument("--completion", type=float, default=0.7, help="average adherence, 0-1")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="loadgen", help="usernames are <prefix>_<n>")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="max rows per insert request")
+    parser.add_argument("--workers", type=int, default=4, help="users seeded in parallel")
+    parser.add_argument("--target", choices=["supabase", "fake"], default="supabase")
+    parser.add_argument("--dump", help="(fake only) save a snapshot for SUPABASE_URL=fake:///path")
+    args = parser.parse_args(argv)
+
+    if args.dump and args.target != "fake":
+        parser.error("--dump only works with --target fake")
+
+    print("🌱 Starting Data Seeding...", file=sys.stderr)
+    supabase, fake = connect(args.target)
+    end = date.today()
+    start = end - timedelta(days=int(args.years * 365) - 1)
+    progress = Progress(args.users)
+
+    usernames = [f"{args.prefix}_{i}" for i in range(args.users)]
+    user_ids = ensure_users(supabase, usernames, args.chunk_rows, progress)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(seed_user, supabase, user_ids[username], index, args, start, end, progress)
+            for index, username in enumerate(usernames)
+        ]
+        for future in as_completed(futures):
+            future.result() # Re-raise the first failure
+
+    progress.print_line()
+    print(f"✅ Seeded {progress.users} users, {progress.habits} new habits, "
+          f"{progress.logs:,} log rows sent ({start} → {end}).", file=sys.stderr)
+
+    if args.dump:
+        fake.save(args.dump)
+        print(f"💾 Snapshot saved to {args.dump}", file=sys.stderr)
 
 # Run the function
 if __name__ == "__main__":
-    seed_history()
\ No newline at end of file
+    seed_history()
@@ -0,0 +1,38 @@
+import itertools
+import os
+import tempfile
+
+# Every test runs against the in-process FakeSupabase (see database/fake_supabase.py)
+# and a throwaway write-behind queue, never a real project.
+os.environ["SUPABASE_URL"] = "fake://"
+os.environ["SUPABASE_KEY"] = "test"
+os.environ["HABIT_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(), "write_behind.sqlite3")
+os.environ["HABIT_LIVE_MODE"] = "poll"
+
+import pytest
+from database.db_connection import get_db_connection
+
+_usernames = (f"user-{n}" for n in itertools.count(1))
+
+@pytest.fixture
+def fake_db():
+    """
+    The raw FakeSupabase behind the app's (instrumented) client.
+    """
+    return get_db_connection()._client
+
+@pytest.fixture
+def make_user(fake_db):
+    """
+    make_user(habits=[(name, frequency), ...]) -> (user_id, [habit rows]).
+    """
+    def make(habits=(), password_hash="x"):
+        user = fake_db.table("users").insert({"username": next(_usernames), "password_hash": password_hash}).execute().data[0]
+        rows = []
+        if habits:
+            rows = fake_db.table("habits").insert([
+                {"user_id": user["user_id"], "name": name, "category": "Health", "frequency": frequency, "is_active": True}
+                for name, frequency in habits
+            ]).execute().data
+        return user["user_id"], rows
+    return make
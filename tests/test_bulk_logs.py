@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from backend import http_cache
+from backend.main import app
+from database.queries import bulk_set_habit_logs, plan_log_changes
+
+TODAY = date.today()
+
+def logs_of(fake_db, habit_id):
+    rows = fake_db.table("tracker_logs").select("date").eq("habit_id", habit_id).execute().data
+    return sorted(str(row["date"])[:10] for row in rows)
+
+def test_plan_keeps_the_last_change_of_a_pair():
+    plan, items = plan_log_changes([(1, "2026-10-01", True), {"habit_id": 1, "date": date(2026, 10, 1), "done": False},
+                                    (2, "2026-10-01T08:00:00", True)])
+    assert plan == {(1, "2026-10-01"): False, (2, "2026-10-01"): True}
+    assert [item["status"] for item in items] == ["superseded", None, None]
+
+def test_replaying_a_batch_changes_nothing(make_user, fake_db):
+    _, habits = make_user([("Read", "Daily"), ("Run", "Daily")])
+    changes = [(habit["habit_id"], TODAY - timedelta(days=day), True) for habit in habits for day in range(3)]
+
+    first = bulk_set_habit_logs(changes)
+    assert [result["status"] for result in first] == ["inserted"] * 6
+    again = bulk_set_habit_logs(changes)
+    assert [result["status"] for result in again] == ["unchanged"] * 6
+    for habit in habits:
+        assert len(logs_of(fake_db, habit["habit_id"])) == 3 # No duplicate rows
+
+    undo = [(habit_id, day, False) for habit_id, day, _ in changes]
+    assert {result["status"] for result in bulk_set_habit_logs(undo)} == {"deleted"}
+    assert {result["status"] for result in bulk_set_habit_logs(undo)} == {"unchanged"}
+    assert logs_of(fake_db, habits[0]["habit_id"]) == []
+
+def test_duplicates_in_one_batch_keep_the_last_value(make_user, fake_db):
+    _, habits = make_user([("Read", "Daily")])
+    habit_id = habits[0]["habit_id"]
+    results = bulk_set_habit_logs([(habit_id, TODAY, True), (habit_id, TODAY, False), (habit_id, TODAY, True)])
+    assert [result["status"] for result in results] == ["superseded", "superseded", "inserted"]
+    assert logs_of(fake_db, habit_id) == [TODAY.isoformat()]
+
+    results = bulk_set_habit_logs([(habit_id, TODAY, True), (habit_id, TODAY, False)])
+    assert [result["status"] for result in results] == ["superseded", "deleted"]
+    assert logs_of(fake_db, habit_id) == []
+
+def test_api_rejects_other_users_habits(make_user, fake_db):
+    user_id, habits = make_user([("Read", "Daily")])
+    _, others = make_user([("Secret", "Daily")])
+    http_cache.clear()
+    with TestClient(app) as client:
+        response = client.post(f"/api/v1/habits/{user_id}/logs/bulk", json={"changes": [
+            {"habit_id": habits[0]["habit_id"], "date": TODAY.isoformat(), "done": True},
+            {"habit_id": others[0]["habit_id"], "date": TODAY.isoformat(), "done": True},
+        ]})
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()] == ["inserted", "error"]
+    assert response.json()[1]["error"]
+    assert logs_of(fake_db, others[0]["habit_id"]) == []
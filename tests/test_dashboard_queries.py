@@ -0,0 +1,54 @@
+import re
+from datetime import date, timedelta
+import pytest
+from streamlit.testing.v1 import AppTest
+
+# The Dashboard's Supabase round trips per render must not depend on the number
+# of habits. main.py counts them with utils.metrics.start_scope() and, with
+# HABIT_DEBUG=1, shows the count in the sidebar: that is what we read here.
+
+@pytest.fixture(autouse=True)
+def show_query_stats(monkeypatch):
+    monkeypatch.setenv("HABIT_DEBUG", "1")
+
+def dashboard(user_id):
+    at = AppTest.from_file("main.py", default_timeout=60)
+    at.session_state.user_id = user_id
+    at.session_state.username = "tester"
+    return at
+
+def round_trips(at):
+    assert not at.exception
+    for markdown in at.sidebar.markdown:
+        match = re.search(r"\*\*(\d+)\*\* round trips", markdown.value)
+        if match:
+            return int(match.group(1))
+    raise AssertionError("query stats panel not shown")
+
+def user_with_logs(make_user, fake_db, n_habits):
+    user_id, habits = make_user([(f"Habit {i}", ["Daily", "Weekly", "Weekdays"][i % 3]) for i in range(n_habits)])
+    fake_db.table("tracker_logs").insert([
+        {"habit_id": habit["habit_id"], "date": str(date.today() - timedelta(days=i % 5)), "is_done": True}
+        for i, habit in enumerate(habits)
+    ]).execute()
+    return user_id
+
+def done_boxes(at):
+    return [box for box in at.checkbox if box.key and box.key.startswith("done_")]
+
+def test_first_render_cost_does_not_grow_with_habits(make_user, fake_db):
+    costs = {}
+    for n_habits in (3, 60):
+        at = dashboard(user_with_logs(make_user, fake_db, n_habits)).run()
+        costs[n_habits] = round_trips(at)
+        assert len(done_boxes(at)) == n_habits
+    assert costs[3] == costs[60]
+    assert costs[3] <= 4 # Live view: habits, newest log_id, recent logs; then the week's logs
+
+def test_warm_rerun_and_toggle_cost_no_round_trips(make_user, fake_db):
+    at = dashboard(user_with_logs(make_user, fake_db, 10)).run()
+    assert round_trips(at.run()) == 0 # Store, live view and replica are all warm
+
+    box = done_boxes(at)[0]
+    box.set_value(not box.value).run() # Saved locally, the flusher sends it later
+    assert round_trips(at) == 0
@@ -0,0 +1,52 @@
+from datetime import date
+import pytest
+from fastapi.testclient import TestClient
+from backend import http_cache
+from backend.main import app
+
+@pytest.fixture
+def client():
+    http_cache.clear()
+    with TestClient(app) as client:
+        yield client
+
+def test_unchanged_habits_are_a_304(client, make_user):
+    user_id, _ = make_user([("Read", "Daily")])
+    first = client.get(f"/api/v1/habits/{user_id}")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    again = client.get(f"/api/v1/habits/{user_id}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert client.get(f"/api/v1/habits/{user_id}", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+
+def test_a_write_invalidates_the_dashboard(client, make_user):
+    user_id, habits = make_user([("Read", "Daily"), ("Run", "Weekly")])
+    today = date.today().isoformat()
+    first = client.get(f"/api/v1/dashboard/{user_id}?day={today}")
+    assert first.status_code == 200
+    assert not any(habit["done"] for habit in first.json()["habits"])
+
+    write = client.post(f"/api/v1/habits/{user_id}/logs/bulk",
+                        json={"changes": [{"habit_id": habits[0]["habit_id"], "date": today, "done": True}]})
+    assert write.status_code == 200
+
+    after = client.get(f"/api/v1/dashboard/{user_id}?day={today}", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != first.headers["etag"]
+    assert [habit["done"] for habit in after.json()["habits"]] == [True, False]
+
+def test_writes_only_invalidate_that_user(client, make_user):
+    writer, habits = make_user([("Read", "Daily")])
+    other, _ = make_user([("Walk", "Daily")])
+    etag = client.get(f"/api/v1/habits/{other}").headers["etag"]
+    client.post(f"/api/v1/habits/{writer}/logs/bulk",
+                json={"changes": [{"habit_id": habits[0]["habit_id"], "date": date.today().isoformat(), "done": True}]})
+    assert client.get(f"/api/v1/habits/{other}", headers={"If-None-Match": etag}).status_code == 304
+
+def test_generations_are_bounded():
+    assert http_cache._generations.maxsize == http_cache.API_CACHE_SIZE * 4
+    for user_id in range(http_cache._generations.maxsize + 10):
+        http_cache._user_changed(f"bulk-{user_id}")
+    assert len(http_cache._generations) <= http_cache._generations.maxsize
@@ -0,0 +1,60 @@
+import hashlib
+import pytest
+import utils.security as security
+from database.queries import verify_login
+from utils.security import needs_rehash
+
+@pytest.fixture
+def scrypt_calls(monkeypatch):
+    """
+    Counts the scrypt runs, the part of a login that takes time.
+    """
+    calls = []
+    real = security._scrypt
+
+    def counting(*args):
+        calls.append(args[1])
+        return real(*args)
+    monkeypatch.setattr(security, "_scrypt", counting)
+    return calls
+
+def username_of(fake_db, user_id):
+    return fake_db.table("users").select("username").eq("user_id", user_id).execute().data[0]["username"]
+
+def stored_hash(fake_db, user_id):
+    return fake_db.table("users").select("password_hash").eq("user_id", user_id).execute().data[0]["password_hash"]
+
+def test_legacy_hash_is_upgraded_on_login(fake_db, make_user):
+    user_id, _ = make_user(password_hash=hashlib.sha256(b"pw").hexdigest())
+    username = username_of(fake_db, user_id)
+
+    assert verify_login(username, "pw") == user_id
+    upgraded = stored_hash(fake_db, user_id)
+    assert upgraded.startswith("scrypt$")
+    assert not needs_rehash(upgraded)
+
+    # The new hash works, and the old password stays the only one accepted
+    assert verify_login(username, "pw") == user_id
+    assert verify_login(username, "wrong") is None
+    assert stored_hash(fake_db, user_id) == upgraded
+
+def test_wrong_password_on_legacy_hash_is_not_upgraded(fake_db, make_user):
+    legacy = hashlib.sha256(b"pw").hexdigest()
+    user_id, _ = make_user(password_hash=legacy)
+    assert verify_login(username_of(fake_db, user_id), "wrong") is None
+    assert stored_hash(fake_db, user_id) == legacy
+
+def test_every_failed_login_runs_one_scrypt(fake_db, make_user, scrypt_calls):
+    scrypt_user, _ = make_user(password_hash=security.make_hash("pw"))
+    legacy_user, _ = make_user(password_hash=hashlib.sha256(b"pw").hexdigest())
+    scrypt_calls.clear()
+
+    # Unknown user, wrong password on each kind of hash: same work every time
+    for username in ["nobody", username_of(fake_db, scrypt_user), username_of(fake_db, legacy_user)]:
+        assert verify_login(username, "wrong") is None
+        assert len(scrypt_calls) == 1, username
+        scrypt_calls.clear()
+
+def test_unknown_user_uses_the_dummy_salt(scrypt_calls):
+    assert verify_login("nobody", "pw") is None
+    assert scrypt_calls == [security._DUMMY_SALT]
@@ -0,0 +1,12 @@
+from utils.metrics import inc, render_prometheus
+
+def test_label_values_and_help_are_escaped():
+    inc("test_escape_total", help_text="Line one\nline two \\ done", path='C:\\tmp\\"quoted"\nnext')
+    text = render_prometheus()
+
+    assert '# HELP test_escape_total Line one\\nline two \\\\ done\n' in text
+    assert 'test_escape_total{path="C:\\\\tmp\\\\\\"quoted\\"\\nnext"} 1\n' in text
+    # One sample per line: the newline in the value didn't split it
+    assert [line for line in text.splitlines() if line.startswith("test_escape_total")] == [
+        'test_escape_total{path="C:\\\\tmp\\\\\\"quoted\\"\\nnext"} 1'
+    ]
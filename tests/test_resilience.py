@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+import pytest
+from database.resilience import AsyncSingleFlight, CircuitBreaker, CircuitOpenError, SingleFlight, CLOSED, HALF_OPEN, OPEN
+
+class Upstream(Exception):
+    code = "503"
+
+class BadQuery(Exception):
+    code = "PGRST100" # Supabase answered: our fault, not an outage
+
+def fail(error=Upstream):
+    raise error()
+
+def test_opens_after_failures_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(Upstream):
+            breaker.call(fail)
+    assert breaker.state == CLOSED
+    with pytest.raises(Upstream):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    called = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: called.append(1))
+    assert called == []
+
+def test_client_errors_and_successes_keep_it_closed():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    for _ in range(5):
+        with pytest.raises(BadQuery):
+            breaker.call(fail, BadQuery)
+    assert breaker.state == CLOSED
+    with pytest.raises(Upstream):
+        breaker.call(fail)
+    assert breaker.call(lambda: "ok") == "ok" # Resets the count
+    with pytest.raises(Upstream):
+        breaker.call(fail)
+    assert breaker.state == CLOSED
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60, slow_call_seconds=0.01)
+    assert breaker.call(lambda: time.sleep(0.02) or "late") == "late"
+    assert breaker.state == OPEN
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(Upstream):
+        breaker.call(fail)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    with pytest.raises(Upstream):
+        breaker.call(fail) # The probe fails: open again
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok" # The probe succeeds
+    assert breaker.state == CLOSED
+
+def test_only_one_probe_at_a_time():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(Upstream):
+        breaker.call(fail)
+    time.sleep(0.06)
+    inside, release = threading.Event(), threading.Event()
+    probe = threading.Thread(target=breaker.call, args=(lambda: inside.set() or release.wait(),))
+    probe.start()
+    inside.wait()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "second")
+    release.set()
+    probe.join()
+    assert breaker.state == CLOSED
+
+def test_cancelled_probe_is_released():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+
+    async def failing():
+        raise Upstream()
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def ok():
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(Upstream):
+            await breaker.acall(failing)
+        await asyncio.sleep(0.06)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker.acall(hanging), 0.01) # The probe is cancelled
+        assert breaker.state == HALF_OPEN
+        assert await breaker.acall(ok) == "ok" # A new probe is let through
+        assert breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+def test_singleflight_coalesces_concurrent_calls():
+    flight = SingleFlight("test")
+    calls, started, release = [], threading.Event(), threading.Event()
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return ["row"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do(("habits", 1), load)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do(("habits", 1), load))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [["row"]] * 6
+    assert flight.do(("habits", 1), lambda: "fresh") == "fresh" # Nothing is cached afterwards
+
+def test_singleflight_shares_errors():
+    flight = SingleFlight("test")
+    with pytest.raises(Upstream):
+        flight.do(("habits", 2), fail)
+
+def test_async_singleflight_coalesces():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do(("dashboard", 1), load) for _ in range(10)])
+
+    assert asyncio.run(scenario()) == [42] * 10
+    assert len(calls) == 1
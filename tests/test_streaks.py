@@ -0,0 +1,93 @@
+import random
+from datetime import date
+import numpy as np
+import pytest
+from utils.streaks import compute_habit_metrics, compute_habit_rollups, reference_habit_metrics, FREQUENCIES
+
+# The vectorized engine must agree with the slow loop-based reference on every habit.
+
+TODAY = date(2026, 10, 14).toordinal() # A Wednesday
+SATURDAY = date(2026, 10, 17).toordinal()
+SUNDAY = date(2026, 10, 18).toordinal()
+MONDAY = date(2026, 10, 12).toordinal()
+
+def random_habits(rng, today, n_habits=12, span=120, with_start_days=True):
+    habit_ids = rng.sample(range(1, 10_000), n_habits)
+    frequencies = [rng.choice(FREQUENCIES) for _ in habit_ids]
+    log_habit_ids, log_days = [], []
+    for habit_id in habit_ids:
+        density = rng.random()
+        for day in range(today - span, today + 3): # A few logs after "today" must be ignored
+            if rng.random() < density:
+                log_habit_ids.append(habit_id)
+                log_days.append(day)
+    start_days = [today - rng.randint(0, span + 30) for _ in habit_ids] if with_start_days else None
+    return habit_ids, frequencies, log_habit_ids, log_days, start_days
+
+def assert_matches_reference(habit_ids, frequencies, log_habit_ids, log_days, today, window_days=30, start_days=None):
+    fast = compute_habit_metrics(habit_ids, frequencies, log_habit_ids, log_days,
+                                 today=today, window_days=window_days, start_days=start_days)
+    slow = reference_habit_metrics(habit_ids, frequencies, log_habit_ids, log_days,
+                                   today=today, window_days=window_days, start_days=start_days)
+    for key in slow:
+        np.testing.assert_allclose(fast[key], slow[key], err_msg=key)
+
+@pytest.mark.parametrize("seed", range(100))
+def test_random_habits_match_reference(seed):
+    rng = random.Random(seed)
+    today = TODAY + rng.randint(0, 13) # Every weekday
+    habit_ids, frequencies, log_habit_ids, log_days, start_days = random_habits(rng, today, with_start_days=seed % 2 == 0)
+    assert_matches_reference(habit_ids, frequencies, log_habit_ids, log_days, today,
+                             window_days=rng.choice([7, 30, 90]), start_days=start_days)
+
+@pytest.mark.parametrize("today", [SATURDAY, SUNDAY])
+def test_weekdays_habit_at_the_weekend(today):
+    # Done Monday..Friday: the weekend neither breaks nor extends the streak
+    days = list(range(MONDAY, MONDAY + 5))
+    assert_matches_reference([1], ["Weekdays"], [1] * len(days), days, today, start_days=[MONDAY - 7])
+    metrics = compute_habit_metrics([1], ["Weekdays"], [1] * len(days), days, today=today, start_days=[MONDAY])
+    assert metrics["current_streak"][0] == 5
+
+@pytest.mark.parametrize("log_day", [MONDAY - 1, MONDAY, MONDAY + 6, MONDAY + 7])
+@pytest.mark.parametrize("today", [MONDAY, SUNDAY, SUNDAY + 1])
+def test_weekly_habit_week_boundaries(log_day, today):
+    assert_matches_reference([1], ["Weekly"], [1], [log_day], today, start_days=[MONDAY - 21])
+
+@pytest.mark.parametrize("frequency", FREQUENCIES)
+def test_habit_created_inside_the_window(frequency):
+    # Created 10 days ago with a 30-day window: earlier days are not scheduled
+    created = TODAY - 10
+    days = list(range(created, TODAY, 2))
+    assert_matches_reference([1], [frequency], [1] * len(days), days, TODAY, window_days=30, start_days=[created])
+    metrics = compute_habit_metrics([1], [frequency], [1] * len(days), days, today=TODAY, window_days=30, start_days=[created])
+    assert metrics["periods_scheduled"][0] <= 11
+
+def test_backfilled_logs_before_creation_count():
+    assert_matches_reference([1, 2], ["Daily", "Weekly"], [1, 1, 2], [TODAY - 40, TODAY - 1, TODAY - 50], TODAY,
+                             start_days=[TODAY, TODAY])
+
+def test_no_habits_and_no_logs():
+    assert_matches_reference([], [], [], [], TODAY)
+    assert_matches_reference([1, 2], ["Daily", "Weekly"], [], [], TODAY, start_days=[TODAY - 5, TODAY - 20])
+
+@pytest.mark.parametrize("seed", range(30))
+def test_rollups_match_reference(seed):
+    rng = random.Random(1000 + seed)
+    today = TODAY + rng.randint(0, 6)
+    habit_ids, frequencies, log_habit_ids, log_days, start_days = random_habits(rng, today, n_habits=8)
+    log_habit_ids.append(-1) # A log of a habit that isn't in the list is ignored
+    log_days.append(today)
+
+    rollups = compute_habit_rollups(habit_ids, frequencies, log_habit_ids, log_days, today=today, start_days=start_days)
+    slow = reference_habit_metrics(habit_ids, frequencies, log_habit_ids, log_days, today=today, start_days=start_days)
+    for key in slow:
+        np.testing.assert_allclose(rollups[key], slow[key], err_msg=key)
+
+    for i, habit_id in enumerate(habit_ids):
+        days = [day for log_id, day in zip(log_habit_ids, log_days) if log_id == habit_id and day <= today]
+        weekday_counts = [0] * 7
+        for day in days:
+            weekday_counts[date.fromordinal(day).weekday()] += 1
+        assert rollups["weekday_counts"][i].tolist() == weekday_counts
+        assert rollups["total_done"][i] == len(days)
+        assert rollups["last_done"][i] == (max(days) if days else 0)
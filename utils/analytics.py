@@ -1,71 +1,283 @@
+import os
+import threading
 import pandas as pd
+from cachetools import TTLCache
 from database.db_connection import get_db_connection
+from database.queries import iter_habit_logs, get_user_habits
+from utils.cache import on_user_changed, remember_habits
+from utils.streaks import compute_habit_metrics, DEFAULT_WINDOW_DAYS
+from utils.history import HabitHistory
+from utils.rollups import get_counters
 
-def get_habit_stats(user_id):
+EPOCH_ORDINAL = pd.Timestamp("1970-01-01").toordinal() # datetime64[D] 0 -> date ordinal
+DAYS_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# --- PER-USER FRAME CACHE ---
+# One entry per user: {"habits": DataFrame, "logs": DataFrame}.
+# Entries expire after FRAME_CACHE_TTL seconds, the oldest are evicted past
+# FRAME_CACHE_SIZE users, and any write to the user's data drops the entry.
+FRAME_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+FRAME_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "600"))
+
+_frame_cache = TTLCache(maxsize=FRAME_CACHE_SIZE, ttl=FRAME_CACHE_TTL)
+_frame_lock = threading.Lock()
+
+_rpc_cache = TTLCache(maxsize=FRAME_CACHE_SIZE * 4, ttl=FRAME_CACHE_TTL) # (user_id, function, start, end) -> rows
+
+@on_user_changed
+def invalidate_user_frame(user_id):
     """
-    Fetches raw data and transforms it into a clean DataFrame for plotting.
+    Drops the cached analytics frame and SQL aggregates of a user (called on every write).
+    """
+    with _frame_lock:
+        _frame_cache.pop(user_id, None)
+        for key in [key for key in _rpc_cache if key[0] == user_id]:
+            _rpc_cache.pop(key, None)
+
+def load_user_logs(habit_ids, start_date=None, end_date=None):
+    """
+    Builds a DataFrame of (log_id, habit_id, date) for the given habits.
+    Pages are streamed from the database and appended column by column,
+    so we never hold the full history as a list of dicts.
+    """
+    log_ids, log_habit_ids, log_dates = [], [], []
+
+    for page in iter_habit_logs(habit_ids, start_date=start_date, end_date=end_date):
+        log_ids.extend(row["log_id"] for row in page)
+        log_habit_ids.extend(row["habit_id"] for row in page)
+        log_dates.extend(row["date"] for row in page)
+
+    return pd.DataFrame({
+        "log_id": log_ids,
+        "habit_id": log_habit_ids,
+        "date": log_dates,
+    })
+
+def _build_user_data(user_id):
+    """
+    Fetches a user's habits and logs ONCE and turns them into typed frames.
     """
     supabase = get_db_connection()
-    
+
     # 1. Fetch all habits
-    habits = supabase.table("habits").select("*").eq("user_id", user_id).execute().data
-    
-    # 2. Fetch all logs (history)
-    # We need to join this with habits to get the names
-    logs = supabase.table("tracker_logs").select("*").execute().data
-    
-    # --- PANDAS MAGIC STARTS HERE ---
-    
-    if not habits or not logs:
+    habits = supabase.table("habits").select(
+        "habit_id, name, category, frequency, is_active, created_at"
+    ).eq("user_id", user_id).execute().data
+    remember_habits(user_id, [habit["habit_id"] for habit in habits])
+
+    df_habits = pd.DataFrame(habits, columns=["habit_id", "name", "category", "frequency", "is_active", "created_at"])
+
+    # 2. Fetch this user's logs (history), page by page
+    df_logs = load_user_logs(df_habits["habit_id"].tolist()) if habits else load_user_logs([])
+
+    # 3. Merge tables (SQL Join equivalent) to get Habit Names
+    df_merged = pd.merge(df_logs, df_habits[["habit_id", "name", "category"]], on="habit_id")
+
+    # 4. Use compact, real types
+    # Categories list EVERY habit, so habits with 0 logs still show up in group-bys
+    habit_names = pd.unique(df_habits["name"])
+    df_merged["name"] = pd.Categorical(df_merged["name"], categories=habit_names)
+    df_merged["category"] = df_merged["category"].astype("category")
+    df_merged["date"] = pd.to_datetime(df_merged["date"])
+    df_merged["weekday"] = df_merged["date"].dt.weekday.astype("int8") # 0 = Monday
+
+    return {"habits": df_habits, "logs": df_merged}
+
+def get_user_data(user_id):
+    """
+    Returns the cached {"habits", "logs"} frames for a user, building them on a miss.
+    Repeated Analytics views cost no network and no re-merge.
+    """
+    with _frame_lock:
+        data = _frame_cache.get(user_id)
+    if data is not None:
+        return data
+
+    data = _build_user_data(user_id)
+    with _frame_lock:
+        _frame_cache[user_id] = data
+    return data
+
+def get_user_frame(user_id):
+    """
+    The merged per-user log frame every chart is derived from.
+    Columns: log_id, habit_id, name (category), category (category),
+    date (datetime64), weekday (0 = Monday).
+    """
+    return get_user_data(user_id)["logs"]
+
+def get_user_history(user_id):
+    """
+    The user's completion history as one roaring bitmap per habit
+    (see utils/history.py). Built once from the cached frame.
+    """
+    data = get_user_data(user_id)
+    if "history" not in data:
+        df_habits, df_logs = data["habits"], data["logs"]
+        data["history"] = HabitHistory.from_arrays(
+            df_logs["habit_id"].to_numpy(),
+            to_day_ordinals(df_logs["date"]),
+            habit_ids=df_habits["habit_id"].tolist(),
+        )
+    return data["history"]
+
+# --- SQL AGGREGATION (see database/migrations/001_analytics_functions.sql) ---
+# When the functions exist, Postgres does the join + group-by and we only
+# download the small result. Otherwise we fall back to local aggregation.
+USE_SQL_AGGREGATES = os.getenv("ANALYTICS_USE_RPC", "1") != "0"
+_missing_functions = set()
+
+def _call_aggregate(function_name, user_id, start_date=None, end_date=None):
+    """
+    Runs an analytics SQL function. Returns its rows, or None if we should
+    fall back to computing the same thing locally.
+    """
+    if not USE_SQL_AGGREGATES or function_name in _missing_functions:
+        return None
+
+    # Cached like the frames (same TTL, same write hooks): a rerun costs no round trip
+    key = (user_id, function_name, start_date, end_date)
+    with _frame_lock:
+        rows = _rpc_cache.get(key)
+    if rows is not None:
+        return rows
+
+    try:
+        rows = get_db_connection().rpc(function_name, {
+            "p_user_id": str(user_id),
+            "p_start": str(start_date) if start_date is not None else None,
+            "p_end": str(end_date) if end_date is not None else None,
+        }).execute().data
+    except Exception as e:
+        # PGRST202 = function not found (migration not applied): stop asking
+        if getattr(e, "code", None) == "PGRST202":
+            _missing_functions.add(function_name)
+        print(f"Analytics RPC {function_name} failed, using local fallback: {e}")
+        return None
+    with _frame_lock:
+        _rpc_cache[key] = rows
+    return rows
+
+def _local_counts(user_id, start_date=None, end_date=None):
+    """
+    Pandas fallback: rows of (habit_id, name, category, count).
+    Without a date range the maintained counters answer in O(habits).
+    """
+    if start_date is None and end_date is None:
+        habits = get_user_habits(user_id, active_only=False)
+        counters = get_counters([habit["habit_id"] for habit in habits])
+        return [
+            {"habit_id": habit["habit_id"], "name": habit["name"], "category": habit["category"],
+             "count": counters[habit["habit_id"]]["total"]}
+            for habit in habits
+        ]
+
+    data = get_user_data(user_id)
+    df_habits, df_logs = data["habits"], _filter_dates(data["logs"], start_date, end_date)
+    counts = df_logs.groupby("habit_id").size()
+    df_counts = df_habits[["habit_id", "name", "category"]].copy()
+    df_counts["count"] = df_counts["habit_id"].map(counts).fillna(0).astype("int64")
+    return df_counts.to_dict("records")
+
+def _local_weekday_counts(user_id, start_date=None, end_date=None):
+    """
+    Pandas fallback: rows of (habit_id, name, weekday, count).
+    """
+    if start_date is None and end_date is None:
+        habits = get_user_habits(user_id, active_only=False)
+        counters = get_counters([habit["habit_id"] for habit in habits])
+        return [
+            {"habit_id": habit["habit_id"], "name": habit["name"], "weekday": weekday, "count": count}
+            for habit in habits
+            for weekday, count in enumerate(counters[habit["habit_id"]]["weekday"])
+            if count > 0
+        ]
+
+    df_logs = _filter_dates(get_user_frame(user_id), start_date, end_date)
+    grouped = df_logs.groupby(["habit_id", "name", "weekday"], observed=True).size().reset_index(name="count")
+    grouped["name"] = grouped["name"].astype(str)
+    return grouped.to_dict("records")
+
+def _filter_dates(df_logs, start_date=None, end_date=None):
+    if start_date is not None:
+        df_logs = df_logs[df_logs["date"] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        df_logs = df_logs[df_logs["date"] <= pd.Timestamp(end_date)]
+    return df_logs
+
+def get_habit_stats(user_id, start_date=None, end_date=None):
+    """
+    Completions per habit as a clean DataFrame for plotting.
+    Uses the SQL function when available, the local counters otherwise.
+    """
+    rows = _call_aggregate("habit_completion_counts", user_id, start_date, end_date)
+    if rows is None:
+        rows = _local_counts(user_id, start_date, end_date)
+
+    if not rows or not any(row["count"] for row in rows):
         return pd.DataFrame() # Return empty if no data
-    
-    # Convert to DataFrames
-    df_habits = pd.DataFrame(habits)
-    df_logs = pd.DataFrame(logs)
-    
-    # 3. Merge tables (SQL Join equivalent)
-    # We want to keep all habits, even if they have 0 logs
-    df_merged = pd.merge(df_habits, df_logs, on="habit_id", how="left")
-    
-    # 4. Calculate Completion Counts
-    # Group by Habit Name and count the number of 'log_id's (completions)
-    summary = df_merged.groupby("name").agg(
-        count=("log_id", "count"),
+
+    # Habits with 0 completions stay in the chart
+    # Habits that share a name are shown as one bar
+    summary = pd.DataFrame(rows).groupby("name", sort=True).agg(
+        count=("count", "sum"),
         category=("category", "first") # Keep the category info
     ).reset_index()
-    
+
     return summary
 
-def get_day_of_week_stats(user_id):
+def get_day_of_week_stats(user_id, start_date=None, end_date=None):
     """
     Calculates which days of the week are most productive.
     """
-    supabase = get_db_connection()
-    
-    # 1. Fetch raw logs
-    logs = supabase.table("tracker_logs").select("*").execute().data
-    habits = supabase.table("habits").select("*").eq("user_id", user_id).execute().data
-    
-    if not logs or not habits:
+    rows = _call_aggregate("habit_weekday_counts", user_id, start_date, end_date)
+    if rows is None:
+        rows = _local_weekday_counts(user_id, start_date, end_date)
+
+    if not rows:
         return pd.DataFrame()
 
-    # 2. Convert to DataFrame
-    df_logs = pd.DataFrame(logs)
-    df_habits = pd.DataFrame(habits)
-    
-    # 3. Merge to get Habit Names
-    df_merged = pd.merge(df_logs, df_habits, on="habit_id")
-    
-    # 4. Extract Day Name (Mon, Tue, Wed...)
-    # This requires converting the 'date' string to a datetime object first
-    df_merged["date"] = pd.to_datetime(df_merged["date"])
-    df_merged["day_name"] = df_merged["date"].dt.day_name()
-    
-    # 5. Order the days correctly (otherwise they appear alphabetically)
-    days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    df_merged["day_name"] = pd.Categorical(df_merged["day_name"], categories=days_order, ordered=True)
-    
-    # 6. Group by Habit and Day
-    heatmap_data = df_merged.groupby(["name", "day_name"]).size().reset_index(name="count")
-    
-    return heatmap_data
\ No newline at end of file
+    # 1. One row per (habit name, weekday)
+    heatmap_data = pd.DataFrame(rows)
+    heatmap_data = heatmap_data.groupby(["name", "weekday"], as_index=False)["count"].sum()
+
+    # 2. Order the days correctly (otherwise they appear alphabetically)
+    heatmap_data["day_name"] = pd.Categorical.from_codes(heatmap_data["weekday"], categories=DAYS_ORDER, ordered=True)
+
+    return heatmap_data[["name", "day_name", "count"]]
+
+def to_day_ordinals(dates):
+    """
+    datetime64 Series/array -> NumPy array of day ordinals (date.toordinal()).
+    """
+    return dates.to_numpy().astype("datetime64[D]").astype("int64") + EPOCH_ORDINAL
+
+def get_streak_stats(user_id, today=None, window_days=DEFAULT_WINDOW_DAYS):
+    """
+    Current streak, longest streak and completion rate for every habit,
+    respecting each habit's frequency (see utils/streaks.py).
+    """
+    data = get_user_data(user_id)
+    df_habits, df_logs = data["habits"], data["logs"]
+
+    if df_habits.empty:
+        return pd.DataFrame()
+
+    # Habits created "today" may already have back-filled logs, the engine handles that
+    created = pd.to_datetime(df_habits["created_at"], utc=True, errors="coerce").dt.tz_localize(None)
+    start_days = to_day_ordinals(created.fillna(pd.Timestamp.max.normalize()))
+
+    metrics = compute_habit_metrics(
+        df_habits["habit_id"].to_numpy(),
+        df_habits["frequency"].to_numpy(),
+        df_logs["habit_id"].to_numpy(),
+        to_day_ordinals(df_logs["date"]),
+        today=today,
+        window_days=window_days,
+        start_days=start_days,
+    )
+
+    stats = df_habits[["habit_id", "name", "category", "frequency"]].copy()
+    for key, values in metrics.items():
+        stats[key] = values
+    return stats
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+# This module is the "something changed" switchboard.
+# Caches (analytics frames, counters, ...) register a callback here,
+# and the write functions in database/queries.py call invalidate_*().
+# It has no heavy imports on purpose, so queries.py can use it for free.
+
+_lock = threading.Lock()
+_habit_owner = {}   # habit_id -> user_id (learned whenever we read a user's habits)
+_listeners = []     # callbacks: fn(user_id)
+_habit_listeners = []  # callbacks: fn(user_id), only when habit definitions changed
+
+def remember_habits(user_id, habit_ids):
+    """
+    Records which user owns which habits, so a write that only knows the
+    habit_id (toggle, update, delete...) can still find the right cache entry.
+    """
+    with _lock:
+        for habit_id in habit_ids:
+            _habit_owner[habit_id] = user_id
+
+def owner_of(habit_id):
+    """
+    Returns the user_id that owns a habit, or None if we never saw it.
+    """
+    return _habit_owner.get(habit_id)
+
+def on_user_changed(callback):
+    """
+    Registers callback(user_id), called every time that user's data changes.
+    """
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+    return callback
+
+def on_habits_changed(callback):
+    """
+    Registers callback(user_id), called only when a habit was added, edited or
+    deleted (not for log toggles). Used by caches of the habit list itself.
+    """
+    with _lock:
+        if callback not in _habit_listeners:
+            _habit_listeners.append(callback)
+    return callback
+
+def invalidate_user(user_id, habits_changed=False):
+    """
+    Tells every registered cache that this user's data is out of date.
+    habits_changed=True also notifies the on_habits_changed() listeners.
+    """
+    with _lock:
+        listeners = list(_listeners) + (list(_habit_listeners) if habits_changed else [])
+    for callback in listeners:
+        callback(user_id)
+
+def invalidate_habit(habit_id, habits_changed=False):
+    """
+    Same as invalidate_user(), for writes that only know the habit_id.
+    If we never saw the habit, nothing can be cached for it, so there is nothing to do.
+    """
+    user_id = owner_of(habit_id)
+    if user_id is not None:
+        invalidate_user(user_id, habits_changed)
+
+# --- OWN-WRITE JOURNAL ---
+# Realtime and polling also report the writes THIS process made. Those were
+# already applied locally, so live_sync.py asks here before applying a log change twice.
+ECHO_WINDOW = float(os.getenv("HABIT_ECHO_WINDOW", "120")) # seconds to remember a write
+
+_own_log_writes = {} # (habit_id, "YYYY-MM-DD") -> (delta, expires_at)
+
+def note_log_write(habit_id, day, delta):
+    """
+    Records that this process inserted (+1) or deleted (-1) a log.
+    """
+    now = time.time()
+    with _lock:
+        _own_log_writes[(habit_id, str(day)[:10])] = (delta, now + ECHO_WINDOW)
+        if len(_own_log_writes) > 10_000: # Drop expired entries now and then
+            for key in [key for key, (_, expires) in _own_log_writes.items() if expires < now]:
+                del _own_log_writes[key]
+
+def is_own_log_write(habit_id, day, delta):
+    """
+    True (once) if this exact change was made by this process recently.
+    """
+    with _lock:
+        entry = _own_log_writes.pop((habit_id, str(day)[:10]), None)
+    return entry is not None and entry[0] == delta and entry[1] >= time.time()
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from utils.streaks import to_day
+
+# Which habits are done together, and which drop off together.
+# 1. One days x habits boolean matrix X (X[d, h] = habit h done on day d) and a
+#    matching "alive" matrix A (the habit existed that day), built straight
+#    from the roaring bitmaps: 1 byte per cell, no merged DataFrames.
+# 2. Every pairwise count is a matrix product, run in float32 chunks of days
+#    (BLAS, exact for counts below 2^24), so memory stays bounded:
+#       both done       C = X'X
+#       both existed    N = A'A
+#       i done, j alive D = X'A
+# 3. From those: P(j done | i done) and the phi coefficient (Pearson on 0/1),
+#    over the days both habits existed. Skipping days together counts too.
+
+CHUNK_DAYS = 2048 # Rows of X converted to float32 at once
+
+def completion_matrix(history, habit_ids, start, end, start_days=None):
+    """
+    (X, A) boolean matrices of shape (days, habits) for start..end (inclusive).
+    history    -> HabitHistory (utils/history.py)
+    start_days -> optional day ordinal each habit was created; it counts as
+                  alive from then, or from its first log if that is earlier.
+    """
+    start, end = to_day(start), to_day(end)
+    n_days = max(end - start + 1, 0)
+    done = np.zeros((n_days, len(habit_ids)), dtype=bool)
+    alive = np.zeros((n_days, len(habit_ids)), dtype=bool)
+
+    for column, habit_id in enumerate(habit_ids):
+        days = np.frombuffer(history.get(habit_id).to_array(), dtype=np.uint32).astype(np.int64)
+        first = days[0] if len(days) else None
+        days = days[(days >= start) & (days <= end)] - start
+        done[days, column] = True
+
+        born = start_days[column] if start_days is not None else start
+        if first is not None:
+            born = min(born, first)
+        alive[max(born - start, 0):, column] = True
+    return done, alive
+
+def _gram(left, right, chunk_days=CHUNK_DAYS):
+    """
+    left' @ right for boolean (days, habits) matrices, chunk by chunk of days.
+    """
+    result = np.zeros((left.shape[1], right.shape[1]), dtype=np.float32)
+    for first in range(0, left.shape[0], chunk_days):
+        result += left[first:first + chunk_days].T.astype(np.float32) @ right[first:first + chunk_days].astype(np.float32)
+    return result
+
+def pair_stats(done, alive=None, chunk_days=CHUNK_DAYS):
+    """
+    All pairwise statistics in one pass. Returns (habits, habits) arrays:
+    together    -> days both were done
+    days        -> days both existed
+    conditional -> P(column done | row done), NaN if the row was never done
+    phi         -> correlation of the two done/not-done series, NaN if one never varies
+    """
+    if alive is None:
+        alive = np.ones_like(done)
+    done = done & alive
+
+    together = _gram(done, done, chunk_days)
+    days = _gram(alive, alive, chunk_days)
+    done_row = _gram(done, alive, chunk_days) # [i, j] = days i done while j existed
+    done_col = done_row.T
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        conditional = together / done_row
+        spread = done_row * (days - done_row) * done_col * (days - done_col)
+        phi = (days * together - done_row * done_col) / np.sqrt(spread)
+    phi[spread <= 0] = np.nan
+    conditional[done_row <= 0] = np.nan
+
+    return {
+        "together": together.astype(np.int64),
+        "days": days.astype(np.int64),
+        "conditional": conditional,
+        "phi": np.clip(phi, -1, 1),
+    }
+
+def rolling_pair_stats(done, alive=None, window=90, step=30, chunk_days=CHUNK_DAYS):
+    """
+    pair_stats() over sliding windows of `window` days, every `step` days,
+    ending on the last day. Yields (index of the window's last day, stats).
+    """
+    n_days = done.shape[0]
+    if alive is None:
+        alive = np.ones_like(done)
+    for last in range(n_days - 1, window - 2, -step):
+        first = last - window + 1
+        yield last, pair_stats(done[first:last + 1], alive[first:last + 1], chunk_days)
+
+def rolling_phi(x, y, alive=None, window=30):
+    """
+    phi of two habits (columns of the done matrix) over a trailing window,
+    for every day, from cumulative sums: O(days), not one product per day.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    alive = np.ones(len(x), dtype=np.int64) if alive is None else np.asarray(alive, dtype=np.int64)
+    x, y = x * alive, y * alive
+
+    def trailing(values):
+        total = np.concatenate([[0], np.cumsum(values)])
+        return total[window:] - total[:-window] if len(values) >= window else np.zeros(0, dtype=np.int64)
+
+    days, sum_x, sum_y, sum_xy = trailing(alive), trailing(x), trailing(y), trailing(x * y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = (sum_x * (days - sum_x) * sum_y * (days - sum_y)).astype(np.float64)
+        phi = (days * sum_xy - sum_x * sum_y) / np.sqrt(spread)
+    phi[spread <= 0] = np.nan
+    return np.clip(phi, -1, 1)
+
+# --- ANALYTICS PAGE ---
+
+def get_habit_correlations(user_id, days=None, today=None):
+    """
+    Pairwise stats for a user's habits over the last `days` days (None = all history).
+    Returns {"names", "habit_ids", "start", "counts", + pair_stats()} or None without logs.
+    Cached with the user's analytics frame (dropped on every write).
+    """
+    from utils.analytics import get_user_data, get_user_history, to_day_ordinals
+
+    data = get_user_data(user_id)
+    today = to_day(today if today is not None else date.today())
+    key = ("correlation", days, today)
+    if key in data:
+        return data[key]
+
+    df_habits = data["habits"]
+    history = get_user_history(user_id)
+    habit_ids = df_habits["habit_id"].tolist()
+    firsts = [history.get(habit_id).min() for habit_id in habit_ids if len(history.get(habit_id))]
+    if not firsts:
+        return None
+
+    start = max(min(firsts), today - days + 1) if days is not None else min(firsts)
+    created = pd.to_datetime(df_habits["created_at"], utc=True, errors="coerce").dt.tz_localize(None)
+    start_days = to_day_ordinals(created.fillna(pd.Timestamp.max.normalize()))
+
+    done, alive = completion_matrix(history, habit_ids, start, today, start_days)
+    result = pair_stats(done, alive)
+    result.update({
+        "names": df_habits["name"].tolist(),
+        "habit_ids": habit_ids,
+        "start": date.fromordinal(start),
+        "counts": done.sum(axis=0),
+        "done": done,
+        "alive": alive,
+    })
+    data[key] = result
+    return result
@@ -0,0 +1,120 @@
+import numpy as np
+from datetime import date, timedelta
+from database.queries import get_user_habits
+from utils.rollups import get_counters, CALENDAR_WEEKS
+
+# GitHub-style calendar heatmaps, read straight from the maintained
+# year x week x weekday counters in utils/rollups.py (no log re-bucketing).
+# Long histories are downsampled so the Plotly payload stays small:
+#   <= DAILY_MAX_DAYS      -> one cell per day   (weeks x 7)
+#   <= WEEKLY_MAX_YEARS    -> one cell per week  (years x 54)
+#   longer                 -> one cell per month (years x 12)
+
+DAILY_MAX_DAYS = 371 # 53 weeks
+WEEKLY_MAX_YEARS = 6
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def calendar_counts(counters):
+    """
+    Sums the calendars of several habits.
+    Returns (years, counts) where counts has shape (len(years), CALENDAR_WEEKS, 7).
+    """
+    years = sorted({year for counter in counters for year in counter["calendar"]})
+    counts = np.zeros((len(years), CALENDAR_WEEKS, 7), dtype=np.int32)
+    row_of = {year: i for i, year in enumerate(years)}
+    for counter in counters:
+        for year, grid in counter["calendar"].items():
+            counts[row_of[year]] += np.asarray(grid, dtype=np.int32).reshape(CALENDAR_WEEKS, 7)
+    return years, counts
+
+def daily_counts(years, counts, start, end):
+    """
+    Counts for every day from start to end (inclusive), as a 1-D array.
+    """
+    ordinals = np.arange(start.toordinal(), end.toordinal() + 1)
+    values = np.zeros(ordinals.size, dtype=np.int32)
+    row_of = {year: i for i, year in enumerate(years)}
+
+    for year in range(start.year, end.year + 1):
+        if year not in row_of:
+            continue
+        first = date(year, 1, 1).toordinal()
+        mask = (ordinals >= first) & (ordinals < date(year + 1, 1, 1).toordinal())
+        day_of_year = ordinals[mask] - first
+        weekdays = (ordinals[mask] + 6) % 7 # date.fromordinal(1) is a Monday
+        weeks = (day_of_year + date(year, 1, 1).weekday()) // 7
+        values[mask] = counts[row_of[year], weeks, weekdays]
+    return values
+
+def _daily_grid(years, counts, start, end):
+    # Columns are Monday-start weeks; cells outside [start, end] stay empty
+    first_monday = start - timedelta(days=start.weekday())
+    n_weeks = (end - first_monday).days // 7 + 1
+    z = np.full(n_weeks * 7, np.nan)
+    offset = (start - first_monday).days
+    z[offset:offset + (end - start).days + 1] = daily_counts(years, counts, start, end)
+    z = z.reshape(n_weeks, 7).T
+
+    week_starts = [first_monday + timedelta(weeks=i) for i in range(n_weeks)]
+    dates = [[(week_start + timedelta(days=d)).isoformat() for week_start in week_starts] for d in range(7)]
+    return {
+        "resolution": "day",
+        "z": z,
+        "x": [week_start.isoformat() for week_start in week_starts],
+        "y": DAY_NAMES,
+        "labels": dates,
+    }
+
+def _weekly_grid(years, counts):
+    return {
+        "resolution": "week",
+        "z": counts.sum(axis=2),
+        "x": [f"W{week + 1}" for week in range(CALENDAR_WEEKS)],
+        "y": [str(year) for year in years],
+        "labels": None,
+    }
+
+def _monthly_grid(years, counts):
+    z = np.zeros((len(years), 12), dtype=np.int32)
+    for i, year in enumerate(years):
+        values = daily_counts(years, counts, date(year, 1, 1), date(year, 12, 31))
+        month_starts = [date(year, month, 1).timetuple().tm_yday - 1 for month in range(1, 13)]
+        z[i] = np.add.reduceat(values, month_starts)
+    return {"resolution": "month", "z": z, "x": MONTH_NAMES, "y": [str(year) for year in years], "labels": None}
+
+def get_calendar_heatmap(user_id, habit_id=None, days=365, today=None, resolution="auto"):
+    """
+    Heatmap data for a user (all habits) or one habit.
+    days = how far back to show (None = the whole history).
+    resolution = "auto" | "day" | "week" | "month".
+    Returns {"resolution", "z" (2-D array), "x", "y", "labels" (per-cell dates or None)},
+    or None when there is nothing to show.
+    """
+    today = today or date.today()
+    habits = get_user_habits(user_id, active_only=False)
+    habit_ids = [habit["habit_id"] for habit in habits if habit_id is None or habit["habit_id"] == habit_id]
+    counters = list(get_counters(habit_ids).values())
+    years, counts = calendar_counts(counters)
+    if not years:
+        return None
+
+    start = date(years[0], 1, 1) if days is None else today - timedelta(days=days - 1)
+    span_days = (today - start).days + 1
+    if resolution == "auto":
+        if span_days <= DAILY_MAX_DAYS:
+            resolution = "day"
+        elif span_days <= WEEKLY_MAX_YEARS * 366:
+            resolution = "week"
+        else:
+            resolution = "month"
+
+    if resolution == "day":
+        return _daily_grid(years, counts, start, today)
+
+    # Whole years from here on: keep the ones in range
+    keep = [i for i, year in enumerate(years) if start.year <= year <= today.year]
+    years, counts = [years[i] for i in keep], counts[keep]
+    if resolution == "week":
+        return _weekly_grid(years, counts)
+    return _monthly_grid(years, counts)
@@ -0,0 +1,184 @@
+import array
+import struct
+import numpy as np
+from datetime import date
+from pyroaring import BitMap
+from utils.streaks import to_day
+
+# Compact completion history: ONE roaring bitmap per habit.
+# Every bit is a day ordinal (date.toordinal()) on which the habit was done.
+# A year of daily logs is a few hundred bytes instead of a DataFrame of rows.
+
+_HEADER = struct.Struct("<I")     # number of habits
+_ENTRY = struct.Struct("<qI")     # habit_id, size of its serialized bitmap
+
+def _bitmap_from_days(days):
+    """
+    Fast path: NumPy array of day ordinals -> BitMap (no per-item Python).
+    """
+    days = np.asarray(days, dtype=np.uint32)
+    return BitMap(array.array("I", days.tobytes()))
+
+def weekday_mask(start, end, weekdays):
+    """
+    Bitmap of every day between start and end (inclusive) that falls on one
+    of `weekdays` (0 = Monday ... 6 = Sunday).
+    """
+    start, end = to_day(start), to_day(end)
+    mask = BitMap()
+    for weekday in weekdays:
+        first = start + (weekday - date.fromordinal(start).weekday()) % 7
+        mask.update(range(first, end + 1, 7))
+    return mask
+
+class HabitHistory:
+    """
+    {habit_id: BitMap of done days} with the queries the app needs.
+    """
+
+    def __init__(self, bitmaps=None):
+        self.bitmaps = bitmaps if bitmaps is not None else {}
+
+    # --- BUILDING ---
+
+    @classmethod
+    def from_rows(cls, rows, habit_ids=()):
+        """
+        Builds a history from tracker_logs rows ({"habit_id", "date"} dicts).
+        Habits listed in habit_ids get an (empty) bitmap even without logs.
+        """
+        history = cls({habit_id: BitMap() for habit_id in habit_ids})
+        history.add_rows(rows)
+        return history
+
+    @classmethod
+    def from_arrays(cls, log_habit_ids, log_days, habit_ids=()):
+        """
+        Builds a history from two parallel NumPy arrays (habit_id, day ordinal).
+        Sorts once and slices, so it stays fast for millions of logs.
+        """
+        history = cls({habit_id: BitMap() for habit_id in habit_ids})
+        log_habit_ids = np.asarray(log_habit_ids)
+        log_days = np.asarray(log_days)
+        if len(log_habit_ids) == 0:
+            return history
+
+        order = np.argsort(log_habit_ids, kind="stable")
+        sorted_ids = log_habit_ids[order]
+        sorted_days = log_days[order]
+        unique_ids, starts = np.unique(sorted_ids, return_index=True)
+        ends = np.append(starts[1:], len(sorted_ids))
+
+        for habit_id, start, end in zip(unique_ids.tolist(), starts, ends):
+            history.bitmaps[habit_id] = _bitmap_from_days(sorted_days[start:end])
+        return history
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add(row["habit_id"], row["date"])
+
+    def add(self, habit_id, day):
+        self.bitmaps.setdefault(habit_id, BitMap()).add(to_day(day))
+
+    def discard(self, habit_id, day):
+        if habit_id in self.bitmaps:
+            self.bitmaps[habit_id].discard(to_day(day))
+
+    # --- QUERIES ---
+
+    def habit_ids(self):
+        return list(self.bitmaps)
+
+    def get(self, habit_id):
+        return self.bitmaps.get(habit_id, BitMap())
+
+    def is_done(self, habit_id, day):
+        """
+        Was this habit done on this day?
+        """
+        return to_day(day) in self.get(habit_id)
+
+    def done_on(self, day):
+        """
+        Set of habit_ids done on this day.
+        """
+        day = to_day(day)
+        return {habit_id for habit_id, bitmap in self.bitmaps.items() if day in bitmap}
+
+    def count(self, habit_id, start=None, end=None):
+        """
+        Number of days done, optionally only between start and end (inclusive).
+        """
+        bitmap = self.get(habit_id)
+        if start is None and end is None:
+            return len(bitmap)
+        start = to_day(start) if start is not None else 0
+        end = to_day(end) if end is not None else 2**32 - 2
+        return bitmap.range_cardinality(start, end + 1)
+
+    def weekday_counts(self, habit_id):
+        """
+        Completions per weekday as a list of 7 counts (Monday first).
+        """
+        bitmap = self.get(habit_id)
+        if not bitmap:
+            return [0] * 7
+        counts = []
+        for weekday in range(7):
+            mask = weekday_mask(bitmap.min(), bitmap.max(), [weekday])
+            counts.append(bitmap.intersection_cardinality(mask))
+        return counts
+
+    def all_done(self, habit_ids):
+        """
+        Days on which EVERY one of these habits was done
+        (e.g. "days I did all my Health habits").
+        """
+        bitmaps = [self.get(habit_id) for habit_id in habit_ids]
+        if not bitmaps:
+            return BitMap()
+        return BitMap.intersection(*bitmaps)
+
+    def any_done(self, habit_ids):
+        """
+        Days on which AT LEAST ONE of these habits was done.
+        """
+        bitmaps = [self.get(habit_id) for habit_id in habit_ids]
+        if not bitmaps:
+            return BitMap()
+        return BitMap.union(*bitmaps)
+
+    def nbytes(self):
+        """
+        Serialized size in bytes (handy to compare with the DataFrames).
+        """
+        return sum(len(bitmap.serialize()) for bitmap in self.bitmaps.values())
+
+    # --- SERIALIZATION ---
+
+    def serialize(self):
+        """
+        Packs every bitmap into one bytes blob (portable roaring format).
+        """
+        parts = [_HEADER.pack(len(self.bitmaps))]
+        for habit_id, bitmap in self.bitmaps.items():
+            bitmap.run_optimize()
+            blob = bitmap.serialize()
+            parts.append(_ENTRY.pack(int(habit_id), len(blob)))
+            parts.append(blob)
+        return b"".join(parts)
+
+    @classmethod
+    def deserialize(cls, data):
+        """
+        Rebuilds a history from serialize() output.
+        """
+        (count,) = _HEADER.unpack_from(data, 0)
+        offset = _HEADER.size
+        bitmaps = {}
+        for _ in range(count):
+            habit_id, size = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            bitmaps[habit_id] = BitMap.deserialize(data[offset:offset + size])
+            offset += size
+        return cls(bitmaps)
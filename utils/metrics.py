@@ -0,0 +1,235 @@
+import contextvars
+import inspect
+import os
+import threading
+import time
+from pydantic_core import to_json
+
+# Query instrumentation.
+# Every Supabase call made through an InstrumentedClient records:
+#   - a latency histogram, tagged by table and operation
+#   - rows returned and errors (counters); response payload bytes too when
+#     MEASURE_BYTES is on (it costs one extra JSON encode per response)
+#   - +1 round trip for the current "scope" (one Streamlit rerun / one request)
+# render_prometheus() exposes it all in the Prometheus text format.
+
+METRICS_ENABLED = os.getenv("HABIT_METRICS", "1") != "0"
+# postgrest keeps only the decoded rows, so sizing a response means re-encoding it: debug only
+MEASURE_BYTES = os.getenv("HABIT_METRICS_BYTES", os.getenv("HABIT_DEBUG", "0")) == "1"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OPERATIONS = {"select", "insert", "upsert", "update", "delete"}
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+_help = {}
+_scope = contextvars.ContextVar("query_scope", default=None)
+
+# --- PRIMITIVES ---
+
+def _labels(**labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc(name, value=1, help_text="", **labels):
+    """
+    Adds `value` to a counter.
+    """
+    key = (name, _labels(**labels))
+    with _lock:
+        _help.setdefault(name, (help_text, "counter"))
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name, value, help_text="", **labels):
+    """
+    Sets a gauge to `value`.
+    """
+    key = (name, _labels(**labels))
+    with _lock:
+        _help.setdefault(name, (help_text, "gauge"))
+        _counters[key] = value
+
+def observe(name, value, help_text="", **labels):
+    """
+    Records one observation in a histogram.
+    """
+    key = (name, _labels(**labels))
+    with _lock:
+        _help.setdefault(name, (help_text, "histogram"))
+        state = _histograms.get(key)
+        if state is None:
+            state = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                state[i] += 1
+        state[-2] += 1          # +Inf bucket (= total count)
+        state[-1] += value      # sum
+
+def snapshot():
+    """
+    Copy of all counters and histograms (for tests / debug panels).
+    """
+    with _lock:
+        return dict(_counters), {key: list(state) for key, state in _histograms.items()}
+
+# --- PER-RERUN / PER-REQUEST SCOPE ---
+
+def start_scope():
+    """
+    Starts counting round trips for the current rerun (or request).
+    Returns the scope dict: {"round_trips", "seconds", "calls": {(table, op): n}}.
+    """
+    scope = {"round_trips": 0, "seconds": 0.0, "errors": 0, "calls": {}, "started": time.perf_counter()}
+    _scope.set(scope)
+    return scope
+
+def current_scope():
+    return _scope.get()
+
+# --- RECORDING ---
+
+def record_call(table, operation, seconds, rows=0, nbytes=None, error=False):
+    """
+    Records one Supabase round trip.
+    """
+    observe("supabase_request_duration_seconds", seconds,
+            help_text="Supabase round-trip latency", table=table, operation=operation)
+    inc("supabase_requests_total", help_text="Supabase round trips", table=table, operation=operation)
+    if error:
+        inc("supabase_errors_total", help_text="Failed Supabase calls", table=table, operation=operation)
+    else:
+        inc("supabase_rows_total", rows, help_text="Rows returned by Supabase", table=table, operation=operation)
+        if nbytes is not None:
+            inc("supabase_response_bytes_total", nbytes, help_text="Response payload bytes", table=table, operation=operation)
+
+    scope = _scope.get()
+    if scope is not None:
+        scope["round_trips"] += 1
+        scope["seconds"] += seconds
+        scope["errors"] += int(error)
+        key = (table, operation)
+        scope["calls"][key] = scope["calls"].get(key, 0) + 1
+
+def _response_stats(response):
+    data = getattr(response, "data", None)
+    if data is None:
+        return 0, None
+    rows = len(data) if isinstance(data, list) else 1
+    return rows, len(to_json(data, fallback=str)) if MEASURE_BYTES else None
+
+# --- CLIENT WRAPPER ---
+
+class InstrumentedQuery:
+    """
+    Wraps a postgrest request builder; every chained call stays wrapped,
+    and execute() is timed and recorded.
+    """
+
+    def __init__(self, builder, table, operation="select"):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            if hasattr(result, "execute"):
+                operation = name if name in OPERATIONS else self._operation
+                return InstrumentedQuery(result, self._table, operation)
+            return result
+        return call
+
+    def execute(self):
+        start = time.perf_counter()
+        try:
+            result = self._builder.execute()
+        except Exception:
+            record_call(self._table, self._operation, time.perf_counter() - start, error=True)
+            raise
+        if inspect.isawaitable(result):
+            return self._finish_async(result, start)
+        record_call(self._table, self._operation, time.perf_counter() - start, *_response_stats(result))
+        return result
+
+    async def _finish_async(self, pending, start):
+        try:
+            result = await pending
+        except Exception:
+            record_call(self._table, self._operation, time.perf_counter() - start, error=True)
+            raise
+        record_call(self._table, self._operation, time.perf_counter() - start, *_response_stats(result))
+        return result
+
+class InstrumentedClient:
+    """
+    Drop-in wrapper for a (sync or async) Supabase client.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return InstrumentedQuery(self._client.table(name), name)
+
+    from_ = table
+
+    def rpc(self, name, *args, **kwargs):
+        return InstrumentedQuery(self._client.rpc(name, *args, **kwargs), name, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+def instrument(client):
+    """
+    Wraps a client unless metrics are turned off (HABIT_METRICS=0).
+    """
+    if not METRICS_ENABLED or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client)
+
+# --- EXPORT ---
+
+def _escape(text, quote=True):
+    """
+    Backslash, newline (and in label values, double quote) escaped as the
+    text format requires: a stray one would break the whole scrape.
+    """
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def render_prometheus():
+    """
+    Everything recorded so far in the Prometheus text exposition format.
+    """
+    counters, histograms = snapshot()
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+
+    for name in names:
+        help_text, kind = _help.get(name, ("", "untyped"))
+        lines.append(f"# HELP {name} {_escape(help_text, quote=False)}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (metric, labels), state in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, state):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {state[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {state[-2]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {state[-1]}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,143 @@
+import array
+import os
+import threading
+import time
+from datetime import date
+
+# Incrementally maintained completion counters, one entry per habit:
+#   {"total": 12, "weekday": [Mon..Sun counts], "month": {"2024-05": 9, ...},
+#    "calendar": {2024: 54 weeks x 7 days of counts (flat array)}, "built_at": ts}
+# toggle_habit() feeds +1 / -1 deltas in, so the Analytics page can read
+# counts in O(habits) instead of re-grouping every log row.
+# Writes made by OTHER processes are not seen here, so entries are rebuilt
+# from the database once they are older than ROLLUP_MAX_AGE seconds.
+
+ROLLUP_MAX_AGE = float(os.getenv("ROLLUP_MAX_AGE", "3600"))
+CALENDAR_WEEKS = 54 # Week columns of a year, GitHub style (week 0 holds Jan 1)
+
+_counters = {}
+_lock = threading.Lock()
+
+def _empty_counter():
+    return {"total": 0, "weekday": [0] * 7, "month": {}, "calendar": {}, "built_at": time.time()}
+
+def calendar_cell(day):
+    """
+    (year, index) of a day in the year's flat CALENDAR_WEEKS x 7 grid:
+    index = week * 7 + weekday, where weeks start on Monday and week 0 holds Jan 1.
+    """
+    first_weekday = date(day.year, 1, 1).weekday()
+    week = (day.timetuple().tm_yday - 1 + first_weekday) // 7
+    return day.year, week * 7 + day.weekday()
+
+def _as_date(day):
+    if isinstance(day, str):
+        return date.fromisoformat(day[:10])
+    if hasattr(day, "date") and callable(day.date):
+        return day.date()
+    return day
+
+def _add(counter, day, delta):
+    day = _as_date(day)
+    month = day.strftime("%Y-%m")
+    counter["total"] += delta
+    counter["weekday"][day.weekday()] += delta
+    counter["month"][month] = counter["month"].get(month, 0) + delta
+    if counter["month"][month] <= 0:
+        del counter["month"][month] # Keep the dict small (and comparable)
+
+    year, cell = calendar_cell(day)
+    grid = counter["calendar"].get(year)
+    if grid is None:
+        grid = counter["calendar"][year] = array.array("i", [0]) * (CALENDAR_WEEKS * 7)
+    grid[cell] += delta
+    if delta < 0 and not any(grid):
+        del counter["calendar"][year]
+
+def count_logs(habit_ids):
+    """
+    Builds fresh counters for these habits straight from tracker_logs.
+    Does not touch the shared counters (used by rebuild and the checker).
+    """
+    from database.queries import iter_habit_logs # Imported here to avoid a circular import
+
+    fresh = {habit_id: _empty_counter() for habit_id in habit_ids}
+    for page in iter_habit_logs(list(habit_ids), columns="habit_id, date"):
+        for row in page:
+            counter = fresh.get(row["habit_id"])
+            if counter is not None:
+                _add(counter, row["date"], 1)
+    return fresh
+
+def apply_log_delta(habit_id, day, delta):
+    """
+    A log for (habit_id, day) was inserted (delta=+1) or deleted (delta=-1).
+    Habits we have no counters for yet are skipped: their first read rebuilds them.
+    """
+    if not delta:
+        return
+    with _lock:
+        counter = _counters.get(habit_id)
+        if counter is not None:
+            _add(counter, day, delta)
+
+def forget_habits(habit_ids):
+    """
+    Drops the counters of these habits (e.g. after a delete).
+    """
+    with _lock:
+        for habit_id in habit_ids:
+            _counters.pop(habit_id, None)
+
+def rebuild_counters(habit_ids):
+    """
+    Repair path: recomputes these habits' counters from scratch.
+    """
+    fresh = count_logs(habit_ids)
+    with _lock:
+        _counters.update(fresh)
+    return fresh
+
+def get_counters(habit_ids):
+    """
+    Returns {habit_id: counter} for these habits.
+    Missing or too-old entries are rebuilt in ONE paged pass over their logs.
+    """
+    habit_ids = list(habit_ids)
+    now = time.time()
+    with _lock:
+        stale = [
+            habit_id for habit_id in habit_ids
+            if habit_id not in _counters or now - _counters[habit_id]["built_at"] > ROLLUP_MAX_AGE
+        ]
+    if stale:
+        rebuild_counters(stale)
+
+    with _lock:
+        return {habit_id: _counters[habit_id] for habit_id in habit_ids if habit_id in _counters}
+
+def check_counters(habit_ids, repair=False):
+    """
+    Consistency checker: compares the maintained counters with a fresh count.
+    Returns {habit_id: {"cached": ..., "actual": ...}} for every mismatch.
+    With repair=True, mismatched counters are replaced by the fresh ones.
+    """
+    fresh = count_logs(habit_ids)
+    mismatches = {}
+
+    with _lock:
+        for habit_id, actual in fresh.items():
+            cached = _counters.get(habit_id)
+            if cached is None:
+                continue # Nothing maintained yet, nothing to be wrong
+            same = (
+                cached["total"] == actual["total"]
+                and cached["weekday"] == actual["weekday"]
+                and cached["month"] == actual["month"]
+                and cached["calendar"] == actual["calendar"]
+            )
+            if not same:
+                mismatches[habit_id] = {"cached": dict(cached), "actual": actual}
+                if repair:
+                    _counters[habit_id] = actual
+    return mismatches
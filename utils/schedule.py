@@ -0,0 +1,141 @@
+import numpy as np
+from datetime import date, timedelta
+from database.db_connection import get_db_connection
+from database.queries import iter_habit_logs, LOG_PAGE_SIZE
+from utils.streaks import to_day
+
+# "What is due today?" for many habits at once, from their frequency and
+# this week's logs (the longest period a frequency has is one week):
+#   done       -> done on the day itself
+#   due        -> expected on the day and not done yet
+#   satisfied  -> Weekly habit already done earlier this week (nothing to do)
+#   rest       -> Weekdays habit on a Saturday/Sunday
+# Inputs are the same parallel arrays as utils/streaks.py, so one range query
+# (Monday .. day) feeds every habit of a user, or of a whole page of users.
+
+DONE, DUE, SATISFIED, REST = "done", "due", "satisfied", "rest"
+STATES = np.array([DONE, DUE, SATISFIED, REST], dtype=object)
+
+def week_start(day):
+    """
+    The Monday of the week that contains `day` (the first day worth fetching).
+    """
+    day = date.fromordinal(to_day(day))
+    return day - timedelta(days=day.weekday())
+
+def compute_due_states(habit_ids, frequencies, log_habit_ids, log_days, day=None):
+    """
+    Due state of every habit on `day` (default: today).
+
+    habit_ids / frequencies      -> one entry per habit
+    log_habit_ids / log_days     -> completion logs (day ordinals); only those
+                                    from week_start(day) to day are used
+
+    Returns a dict of NumPy arrays aligned with habit_ids:
+    state (done/due/satisfied/rest), done_today, done_this_week,
+    days_left (days still open in the period, including `day`).
+    """
+    habit_ids = np.asarray(habit_ids)
+    frequencies = np.asarray(frequencies, dtype=object)
+    n = len(habit_ids)
+    day = to_day(day if day is not None else date.today())
+    weekday = date.fromordinal(day).weekday()
+    first = day - weekday
+
+    done_today = np.zeros(n, dtype=bool)
+    done_this_week = np.zeros(n, dtype=bool)
+    if n and len(log_habit_ids):
+        # Map logs onto habit rows (same trick as compute_habit_metrics)
+        log_habit_ids = np.asarray(log_habit_ids)
+        log_days = np.asarray(log_days, dtype=np.int64)
+        order = np.argsort(habit_ids, kind="stable")
+        sorted_ids = habit_ids[order]
+        pos = np.clip(np.searchsorted(sorted_ids, log_habit_ids), 0, n - 1)
+        known = (sorted_ids[pos] == log_habit_ids) & (log_days >= first) & (log_days <= day)
+        rows = order[pos[known]]
+        done_this_week[rows] = True
+        done_today[rows[log_days[known] == day]] = True
+
+    weekly = frequencies == "Weekly"
+    weekdays = frequencies == "Weekdays" # Anything else is treated as Daily
+
+    state = np.full(n, 1) # due
+    state[weekdays & (weekday >= 5)] = 3 # rest
+    state[weekly & done_this_week] = 2 # satisfied
+    state[done_today] = 0 # done
+
+    days_left = np.where(weekly, 7 - weekday, 1)
+    days_left[weekdays & (weekday >= 5)] = 0
+
+    return {
+        "state": STATES[state],
+        "done_today": done_today,
+        "done_this_week": done_this_week,
+        "days_left": days_left,
+    }
+
+def due_states_from_history(habits, history, day=None):
+    """
+    {habit_id: state} for habit rows, from a HabitHistory covering week_start(day)..day
+    (e.g. the Dashboard's local replica).
+    """
+    if not habits:
+        return {}
+    habit_ids = [habit["habit_id"] for habit in habits]
+    bitmaps = [history.get(habit_id).to_array() for habit_id in habit_ids]
+    log_habit_ids = np.repeat(habit_ids, [len(days) for days in bitmaps])
+    log_days = np.concatenate([np.frombuffer(days, dtype=np.uint32) for days in bitmaps]).astype(np.int64)
+    states = compute_due_states(habit_ids, [habit["frequency"] for habit in habits], log_habit_ids, log_days, day)
+    return dict(zip(habit_ids, states["state"]))
+
+def annotate(habits, log_rows, day=None):
+    """
+    Returns copies of the habit rows with "state", "done" and "days_left" added,
+    from tracker_logs rows ({"habit_id", "date"}) of the current week.
+    """
+    log_habit_ids = np.array([row["habit_id"] for row in log_rows], dtype=np.int64)
+    log_days = np.array([to_day(row["date"]) for row in log_rows], dtype=np.int64)
+    states = compute_due_states(
+        [habit["habit_id"] for habit in habits], [habit["frequency"] for habit in habits],
+        log_habit_ids, log_days, day,
+    )
+    return [
+        dict(habit, state=states["state"][i], done=bool(states["done_today"][i]), days_left=int(states["days_left"][i]))
+        for i, habit in enumerate(habits)
+    ]
+
+# --- BULK (reminder / notification jobs) ---
+
+def _active_habits(user_ids):
+    """
+    Active habits of many users (keyset pages on habit_id).
+    """
+    supabase = get_db_connection()
+    habits, last = [], None
+    while True:
+        query = supabase.table("habits").select("habit_id, user_id, name, frequency").in_("user_id", user_ids).eq("is_active", True)
+        if last is not None:
+            query = query.gt("habit_id", last)
+        rows = query.order("habit_id").limit(LOG_PAGE_SIZE).execute().data
+        habits.extend(rows)
+        if len(rows) < LOG_PAGE_SIZE:
+            return habits
+        last = rows[-1]["habit_id"]
+
+def due_for_users(user_ids, day=None):
+    """
+    {user_id: [habit rows with "state", "done", "days_left"]} for a page of users
+    (e.g. 200 at a time): one habits query, one week-range log query per 200
+    habits, one vectorized pass.
+    """
+    day = date.fromordinal(to_day(day if day is not None else date.today()))
+    habits = _active_habits(list(user_ids))
+    rows = []
+    for page in iter_habit_logs([habit["habit_id"] for habit in habits], columns="habit_id, date",
+                                start_date=week_start(day), end_date=day):
+        rows.extend(page)
+
+    result = {user_id: [] for user_id in user_ids}
+    for habit in annotate(habits, rows, day):
+        result.setdefault(habit["user_id"], []).append(habit)
+    return result
@@ -1,16 +1,115 @@
+import asyncio
+import base64
 import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def make_hash(password):
+# Password hashing with scrypt (salted, memory-hard), stored as a
+# self-describing string, so the cost can be raised later without breaking
+# old hashes:
+#     scrypt$n=16384,r=8,p=1$<salt>$<hash>        (base64, no padding)
+# Old accounts still have a bare SHA-256 hex digest: they are checked the old
+# way and upgraded on their next successful login (see needs_rehash()).
+#
+# The KDF runs in a small, bounded thread pool (hashlib.scrypt releases the
+# GIL), so a burst of logins uses at most HASH_WORKERS cores and
+# HASH_WORKERS x ~128*n*r bytes of memory, and async code can await it
+# without blocking the event loop.
+
+SCRYPT_N = int(os.getenv("HABIT_SCRYPT_N", str(2 ** 14)))  # CPU/memory cost (power of 2)
+SCRYPT_R = int(os.getenv("HABIT_SCRYPT_R", "8"))           # block size
+SCRYPT_P = int(os.getenv("HABIT_SCRYPT_P", "1"))           # parallelism
+SALT_BYTES = 16
+KEY_BYTES = 32
+HASH_WORKERS = int(os.getenv("HABIT_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+_DUMMY_SALT = os.urandom(SALT_BYTES) # For checks with no real scrypt hash (see _check_hash)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+        return _pool
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r * p, # 2x what it needs (OpenSSL's default cap is 32 MB)
+        dklen=KEY_BYTES,
+    )
+
+def _parse(hashed_text):
     """
-    Takes a plain password and returns a secure hash.
-    Using SHA256 (Standard security).
+    "scrypt$n=..,r=..,p=..$salt$hash" -> (n, r, p, salt, key), or None if it isn't one.
     """
+    parts = hashed_text.split("$")
+    if len(parts) != 4 or parts[0] != "scrypt":
+        return None
+    try:
+        params = dict(item.split("=") for item in parts[1].split(","))
+        return int(params["n"]), int(params["r"]), int(params["p"]), _unb64(parts[2]), _unb64(parts[3])
+    except (KeyError, ValueError):
+        return None
+
+def _legacy_hash(password):
     return hashlib.sha256(str.encode(password)).hexdigest()
 
+def _make_hash(password):
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt$n={SCRYPT_N},r={SCRYPT_R},p={SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+def _check_hash(password, hashed_text):
+    parsed = _parse(hashed_text or "")
+    if parsed is None:
+        # Unknown user (no hash) or legacy SHA-256: still pay for one scrypt run,
+        # so the response time doesn't tell which usernames exist
+        _scrypt(password, _DUMMY_SALT, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        if not hashed_text:
+            return False
+        return hmac.compare_digest(_legacy_hash(password), hashed_text)
+    n, r, p, salt, key = parsed
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p), key)
+
+# --- PUBLIC API ---
+
+def make_hash(password):
+    """
+    Takes a plain password and returns a salted scrypt hash (a self-describing string).
+    Runs on the hashing pool: blocks the caller, but bounds the work done at once.
+    """
+    return _get_pool().submit(_make_hash, password).result()
+
 def check_hash(password, hashed_text):
     """
-    Checks if a user's password matches the saved hash.
+    Checks if a user's password matches the saved hash (scrypt or legacy SHA-256).
+    hashed_text=None (unknown user) costs the same and returns False.
+    """
+    return _get_pool().submit(_check_hash, password, hashed_text).result()
+
+async def make_hash_async(password):
+    """
+    make_hash() for async code: awaits the pool instead of blocking the event loop.
+    """
+    return await asyncio.wrap_future(_get_pool().submit(_make_hash, password))
+
+async def check_hash_async(password, hashed_text):
+    return await asyncio.wrap_future(_get_pool().submit(_check_hash, password, hashed_text))
+
+def needs_rehash(hashed_text):
+    """
+    True for legacy SHA-256 hashes and scrypt hashes made with other cost settings.
     """
-    if make_hash(password) == hashed_text:
-        return True
-    return False
\ No newline at end of file
+    parsed = _parse(hashed_text or "")
+    return parsed is None or parsed[:3] != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
@@ -0,0 +1,155 @@
+import streamlit as st
+from database.live_sync import get_live_habits, live_status, patch_habit, replica_max_age
+
+# Per-session copy of the data the Dashboard and Manage Habits pages draw.
+# 1. Seeded once from the live view, re-seeded only when that view changes
+#    (another device) or after a write this store didn't make (Add Habit, Import).
+# 2. Every row is its own st.fragment: a click reruns that row only.
+# 3. Writes are optimistic: the store changes first, the write follows,
+#    and a failed write puts the old values back and shows the error on the row.
+# Toggling one habit = one write (queued by write_behind), no refetch.
+
+STORE_KEY = "habit_store"
+
+def sync_store(user_id):
+    """
+    Called once per full-page run. Returns the store, re-seeded if needed.
+    """
+    live = live_status(user_id)
+    version = live["version"] if live is not None else None
+    store = st.session_state.get(STORE_KEY)
+
+    # Without a live view nothing tells us about outside changes: re-read on full runs
+    if store is None or store["user_id"] != user_id or version is None or store["version"] != version:
+        store = {
+            "user_id": user_id,
+            "version": version,
+            "habits": {habit["habit_id"]: habit for habit in get_live_habits(user_id, active_only=False)},
+            "day": None,  # Day the "done" flags belong to
+            "done": {},   # habit_id -> done on that day
+            "state": {},  # habit_id -> due state on that day (utils/schedule.py)
+            "errors": {}, # habit_id -> message of a rolled-back write
+        }
+        st.session_state[STORE_KEY] = store
+        for key in [key for key in st.session_state if str(key).startswith(("done_", "edit_"))]:
+            del st.session_state[key] # Let the widgets pick up the new values
+    return store
+
+def get_store():
+    """
+    The store, from inside a fragment (no re-seeding).
+    """
+    return st.session_state[STORE_KEY]
+
+def drop_store():
+    """
+    Forget the store (after a write made elsewhere, or on logout).
+    """
+    st.session_state.pop(STORE_KEY, None)
+
+def load_done(store, habit_ids, day):
+    """
+    Fills store["done"] and store["state"] for `day` from the local replica
+    (this week so far, since Weekly habits depend on it: one query at most, when stale).
+    """
+    from database.write_behind import get_local_history
+    from utils.schedule import due_states_from_history, week_start
+
+    collect_rejected(store) # Before reading: it marks those habits for a re-pull
+    history = get_local_history(habit_ids, week_start(day), day, max_age=replica_max_age(store["user_id"]))
+    store["day"] = day
+    store["done"] = {habit_id: history.is_done(habit_id, day) for habit_id in habit_ids}
+    store["state"] = due_states_from_history([store["habits"][habit_id] for habit_id in habit_ids], history, day)
+
+def collect_rejected(store):
+    """
+    Moves toggles Supabase rejected (see write_behind.take_rejected) into the
+    rows' errors. Returns how many there were (the page should redraw).
+    """
+    from database.write_behind import take_rejected
+
+    messages = take_rejected(store["habits"])
+    for habit_id, message in messages.items():
+        store["errors"][habit_id] = message
+        st.session_state.pop(f"done_{habit_id}", None) # The checkbox shows the server's value again
+    return len(messages)
+
+def _adopt(store, version):
+    # Our own write bumped the live version: don't treat it as an outside change
+    if version is not None and store["version"] is not None and version == store["version"] + 1:
+        store["version"] = version
+        st.session_state.live_version = version
+
+# --- OPTIMISTIC WRITES (widget callbacks, run before the fragment redraws) ---
+
+def set_done(habit_id):
+    """
+    Checkbox callback: mark the habit done/undone for the store's day.
+    """
+    from database.write_behind import record_toggle
+
+    store = get_store()
+    checked = st.session_state[f"done_{habit_id}"]
+    before = store["done"].get(habit_id, False)
+    store["done"][habit_id] = checked
+    try:
+        record_toggle(habit_id, store["day"], checked)
+    except Exception as e:
+        store["done"][habit_id] = before
+        st.session_state[f"done_{habit_id}"] = before
+        store["errors"][habit_id] = f"Could not save: {e}"
+
+def _write_habit(habit_id, fields, write):
+    """
+    Applies `fields` to the habit (None = remove it), then runs write().
+    Puts the old habit back if write() returns "Error: ...".
+    """
+    store = get_store()
+    before = store["habits"].get(habit_id)
+    if before is None:
+        return
+    if fields is None:
+        del store["habits"][habit_id]
+    else:
+        store["habits"][habit_id] = {**before, **fields}
+
+    result = write()
+    if result != "Success":
+        store["habits"][habit_id] = before
+        store["habits"] = dict(sorted(store["habits"].items())) # Back in its place
+        store["errors"][habit_id] = result
+        return
+    _adopt(store, patch_habit(store["user_id"], habit_id, fields))
+
+def save_habit(habit_id):
+    """
+    "Save Changes" callback: name, category and frequency from the row's form.
+    """
+    from database.queries import update_habit
+
+    fields = {
+        "name": st.session_state[f"edit_{habit_id}_name"],
+        "category": st.session_state[f"edit_{habit_id}_category"],
+        "frequency": st.session_state[f"edit_{habit_id}_frequency"],
+    }
+    if not fields["name"]:
+        get_store()["errors"][habit_id] = "Error: the name can't be empty."
+        return
+    _write_habit(habit_id, fields, lambda: update_habit(habit_id, **fields))
+
+def flip_active(habit_id):
+    """
+    Archive / Reactivate callback.
+    """
+    from database.queries import toggle_habit_status
+
+    is_active = get_store()["habits"][habit_id]["is_active"]
+    _write_habit(habit_id, {"is_active": not is_active}, lambda: toggle_habit_status(habit_id, is_active))
+
+def remove_habit(habit_id):
+    """
+    Delete callback: the row disappears at once.
+    """
+    from database.queries import delete_habit
+
+    _write_habit(habit_id, None, lambda: delete_habit(habit_id))
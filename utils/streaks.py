@@ -0,0 +1,289 @@
+import numpy as np
+from datetime import date, timedelta
+
+# Streak + completion-rate engine.
+# Works on ALL of a user's habits at once using NumPy arrays indexed by day,
+# and respects each habit's frequency:
+#   "Daily"    -> every day is one period
+#   "Weekdays" -> Monday..Friday are periods, weekends are skipped
+#   "Weekly"   -> every Monday..Sunday week is one period (done if ANY log that week)
+# Streaks are counted in periods (days, weekdays or weeks).
+# The period that contains `today` is still "open": if it is not done yet it
+# does not break the current streak and does not count against the rate.
+
+FREQUENCIES = ["Daily", "Weekly", "Weekdays"]
+DEFAULT_WINDOW_DAYS = 30
+
+def to_day(value):
+    """
+    date / datetime / "YYYY-MM-DD" -> day ordinal (int).
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if hasattr(value, "date") and callable(value.date):
+        value = value.date()
+    return value.toordinal()
+
+def _empty_metrics(n):
+    return {
+        "current_streak": np.zeros(n, dtype=np.int64),
+        "longest_streak": np.zeros(n, dtype=np.int64),
+        "periods_done": np.zeros(n, dtype=np.int64),
+        "periods_scheduled": np.zeros(n, dtype=np.int64),
+        "completion_rate": np.zeros(n, dtype=np.float64),
+    }
+
+def _run_lengths(done):
+    """
+    For a (habits, periods) bool matrix, returns the length of the run of
+    True values ending at every cell (0 where the cell is False).
+    """
+    n_periods = done.shape[1]
+    position = np.arange(1, n_periods + 1)
+    last_miss = np.where(done, 0, position)
+    last_miss = np.maximum.accumulate(last_miss, axis=1)
+    return position - last_miss
+
+def _period_metrics(done, scheduled, in_window, last_is_open):
+    """
+    Streaks and rates for one frequency group, given period matrices.
+    """
+    n, n_periods = done.shape
+    metrics = _empty_metrics(n)
+    if n_periods == 0:
+        return metrics
+
+    done = done & scheduled
+    runs = _run_lengths(done)
+    metrics["longest_streak"] = runs.max(axis=1)
+
+    if last_is_open and n_periods > 1:
+        # Today's (or this week's) period is not over yet: if it isn't done,
+        # the streak is whatever ended in the previous period
+        metrics["current_streak"] = np.where(done[:, -1], runs[:, -1], runs[:, -2])
+    else:
+        metrics["current_streak"] = runs[:, -1]
+
+    counted = scheduled & in_window
+    if last_is_open:
+        counted[:, -1] &= done[:, -1] # An open period only counts once it is done
+
+    metrics["periods_done"] = (done & counted).sum(axis=1)
+    metrics["periods_scheduled"] = counted.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = metrics["periods_done"] / metrics["periods_scheduled"]
+    metrics["completion_rate"] = np.nan_to_num(rate, nan=0.0)
+    return metrics
+
+def compute_habit_metrics(habit_ids, frequencies, log_habit_ids, log_days, today=None,
+                          window_days=DEFAULT_WINDOW_DAYS, start_days=None):
+    """
+    Computes current streak, longest streak and completion rate for many habits at once.
+
+    habit_ids      -> sequence of habit ids
+    frequencies    -> matching sequence of "Daily" / "Weekly" / "Weekdays"
+    log_habit_ids  -> habit_id of every completion log
+    log_days       -> day ordinal (date.toordinal()) of every completion log
+    today          -> the day to evaluate at (date or ordinal, default: today)
+    window_days    -> length of the completion-rate window, ending today
+    start_days     -> optional per-habit first day (e.g. created_at); periods
+                      before it are not counted as missed
+
+    Returns a dict of NumPy arrays aligned with habit_ids:
+    current_streak, longest_streak, periods_done, periods_scheduled, completion_rate.
+    """
+    habit_ids = np.asarray(habit_ids)
+    frequencies = np.asarray(frequencies, dtype=object)
+    n = len(habit_ids)
+    if n == 0:
+        return _empty_metrics(0)
+
+    end_day = to_day(today if today is not None else date.today())
+    window_start = end_day - window_days + 1
+
+    # 1. Map every log onto a habit row (vectorized, no per-row Python)
+    log_habit_ids = np.asarray(log_habit_ids)
+    log_days = np.asarray(log_days, dtype=np.int64)
+    order = np.argsort(habit_ids, kind="stable")
+    sorted_ids = habit_ids[order]
+    pos = np.searchsorted(sorted_ids, log_habit_ids)
+    pos = np.clip(pos, 0, n - 1)
+    known = (sorted_ids[pos] == log_habit_ids) & (log_days <= end_day)
+    rows = order[pos[known]]
+    days = log_days[known]
+
+    # 2. Each habit "starts" at its first log or start day, whichever is earlier
+    first_day = np.full(n, window_start, dtype=np.int64)
+    if start_days is not None:
+        first_day = np.minimum(np.asarray(start_days, dtype=np.int64), end_day)
+    if len(days):
+        first_log = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_log, rows, days)
+        first_day = np.minimum(first_day, first_log)
+
+    # 3. Build the (habits x days) matrix, aligned to whole Monday..Sunday weeks
+    axis_start = int(min(first_day.min(), window_start))
+    axis_start -= date.fromordinal(axis_start).weekday() # back to Monday
+    axis_end = end_day + (6 - date.fromordinal(end_day).weekday()) # on to Sunday
+    n_days = axis_end - axis_start + 1
+
+    done = np.zeros((n, n_days), dtype=bool)
+    done[rows, days - axis_start] = True
+
+    end_idx = end_day - axis_start
+    start_idx = (first_day - axis_start)[:, None]
+    window_idx = window_start - axis_start
+    col = np.arange(n_days)
+
+    metrics = _empty_metrics(n)
+
+    # 4. One vectorized pass per frequency group
+    for frequency in FREQUENCIES:
+        if frequency == "Daily":
+            # Unknown frequencies are treated as Daily
+            group = ~np.isin(frequencies, ["Weekly", "Weekdays"])
+        else:
+            group = frequencies == frequency
+        if not group.any():
+            continue
+
+        group_done = done[group]
+        group_start = start_idx[group]
+
+        if frequency == "Weekly":
+            weeks = n_days // 7
+            period_done = group_done.reshape(len(group_done), weeks, 7).any(axis=2)
+            week_last_day = np.arange(weeks) * 7 + 6
+            scheduled = week_last_day[None, :] >= group_start
+            in_window = week_last_day >= window_idx
+            last_is_open = True # The last week always contains today
+        else:
+            if frequency == "Weekdays":
+                cols = col[(col <= end_idx) & (col % 7 < 5)]
+                last_is_open = end_idx % 7 < 5 # Weekends are never "open"
+            else:
+                cols = col[col <= end_idx]
+                last_is_open = True
+            period_done = group_done[:, cols]
+            scheduled = cols[None, :] >= group_start
+            in_window = cols >= window_idx
+
+        group_metrics = _period_metrics(period_done, scheduled, in_window, last_is_open)
+        for key, values in group_metrics.items():
+            metrics[key][group] = values
+
+    return metrics
+
+def reference_habit_metrics(habit_ids, frequencies, log_habit_ids, log_days, today=None,
+                            window_days=DEFAULT_WINDOW_DAYS, start_days=None):
+    """
+    Slow, loop-based version of compute_habit_metrics with the same rules.
+    It exists to check the vectorized engine against; do not use it in pages.
+    """
+    end_day = to_day(today if today is not None else date.today())
+    window_start = end_day - window_days + 1
+
+    logs = {}
+    for habit_id, day in zip(log_habit_ids, log_days):
+        if day <= end_day:
+            logs.setdefault(habit_id, set()).add(int(day))
+
+    results = {key: [] for key in _empty_metrics(0)}
+
+    for i, habit_id in enumerate(habit_ids):
+        frequency = frequencies[i]
+        done_days = logs.get(habit_id, set())
+
+        first = window_start if start_days is None else min(int(start_days[i]), end_day)
+        if done_days:
+            first = min(first, min(done_days))
+
+        # 1. List the periods from the habit's first day to today
+        # Each period is (list of days, is_open)
+        periods = []
+        if frequency == "Weekly":
+            monday = first - date.fromordinal(first).weekday()
+            while monday <= end_day:
+                week = list(range(monday, monday + 7))
+                periods.append((week, monday <= end_day <= monday + 6))
+                monday += 7
+        else:
+            for day in range(first, end_day + 1):
+                if frequency == "Weekdays" and date.fromordinal(day).weekday() >= 5:
+                    continue
+                periods.append(([day], day == end_day))
+
+        # 2. Walk them in order
+        longest = run = 0
+        period_done = []
+        for week_days, is_open in periods:
+            is_done = any(day in done_days for day in week_days)
+            period_done.append(is_done)
+            run = run + 1 if is_done else 0
+            longest = max(longest, run)
+
+        current = 0
+        for j in range(len(periods) - 1, -1, -1):
+            if period_done[j]:
+                current += 1
+            elif periods[j][1]:
+                continue # Open period not done yet: skip it
+            else:
+                break
+
+        counted = done = 0
+        for (week_days, is_open), is_done in zip(periods, period_done):
+            if week_days[-1] < window_start:
+                continue
+            if is_open and not is_done:
+                continue
+            counted += 1
+            done += is_done
+
+        results["current_streak"].append(current)
+        results["longest_streak"].append(longest)
+        results["periods_done"].append(done)
+        results["periods_scheduled"].append(counted)
+        results["completion_rate"].append(done / counted if counted else 0.0)
+
+    return {key: np.asarray(values) for key, values in results.items()}
+
+def compute_habit_rollups(habit_ids, frequencies, log_habit_ids, log_days, today=None,
+                          window_days=DEFAULT_WINDOW_DAYS, start_days=None):
+    """
+    compute_habit_metrics() plus the all-time figures a rollup row stores.
+    Same arguments. Module-level and NumPy-only, so a process pool can run it.
+
+    Adds to the returned dict (aligned with habit_ids):
+    total_done      -> logs up to today
+    last_done       -> ordinal of the latest log (0 = never)
+    weekday_counts  -> (habits x 7) logs per weekday, Monday first
+    """
+    metrics = compute_habit_metrics(habit_ids, frequencies, log_habit_ids, log_days,
+                                    today=today, window_days=window_days, start_days=start_days)
+    habit_ids = np.asarray(habit_ids)
+    n = len(habit_ids)
+    metrics["weekday_counts"] = np.zeros((n, 7), dtype=np.int64)
+    metrics["total_done"] = np.zeros(n, dtype=np.int64)
+    metrics["last_done"] = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return metrics
+    end_day = to_day(today if today is not None else date.today())
+
+    # Same log -> habit row mapping as compute_habit_metrics
+    log_habit_ids = np.asarray(log_habit_ids)
+    log_days = np.asarray(log_days, dtype=np.int64)
+    order = np.argsort(habit_ids, kind="stable")
+    sorted_ids = habit_ids[order]
+    pos = np.clip(np.searchsorted(sorted_ids, log_habit_ids), 0, n - 1)
+    known = (sorted_ids[pos] == log_habit_ids) & (log_days <= end_day)
+    rows = order[pos[known]]
+    days = log_days[known]
+
+    weekdays = (days + 6) % 7 # date.fromordinal(1) is a Monday -> 0
+    metrics["weekday_counts"] = np.bincount(rows * 7 + weekdays, minlength=n * 7).reshape(n, 7)
+    metrics["total_done"] = metrics["weekday_counts"].sum(axis=1)
+    np.maximum.at(metrics["last_done"], rows, days)
+    return metrics
@@ -0,0 +1,282 @@
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+from backend.schemas import ImportRow, ImportSummary
+from database.db_connection import get_db_connection
+from database.queries import iter_habit_logs, get_user_habits, bulk_set_habit_logs
+from utils.cache import invalidate_user
+
+# Columnar export / import of a user's habit history.
+# One flat table (denormalized, so a spreadsheet or pandas can read it as is):
+#   - one row per habit with an empty date (the habit definition)
+#   - one row per completed (habit, date), with the habit columns repeated
+# Logs are streamed page by page, so memory stays bounded by ROW_GROUP_ROWS
+# (export) or IMPORT_CHUNK_ROWS (import), not by the size of the history.
+
+EXPORT_SCHEMA = pa.schema([
+    ("habit_id", pa.int64()),
+    ("name", pa.dictionary(pa.int32(), pa.string())),
+    ("category", pa.dictionary(pa.int32(), pa.string())),
+    ("frequency", pa.dictionary(pa.int32(), pa.string())),
+    ("is_active", pa.bool_()),
+    ("created_at", pa.string()),
+    ("log_id", pa.int64()),
+    ("date", pa.date32()),
+])
+HABIT_COLUMNS = ["name", "category", "frequency", "is_active", "created_at"]
+ROW_GROUP_ROWS = 64_000       # Rows buffered before writing a Parquet row group / Arrow batch
+IMPORT_CHUNK_ROWS = 50_000    # Rows validated and sent per import chunk
+MAX_REPORTED_ERRORS = 20
+
+FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# --- EXPORT ---
+
+def _to_batch(habits_by_id, rows):
+    """
+    Builds one RecordBatch from habit rows (no "date") or log rows.
+    """
+    columns = {"habit_id": [row["habit_id"] for row in rows]}
+    for column in HABIT_COLUMNS:
+        columns[column] = [habits_by_id[row["habit_id"]].get(column) for row in rows]
+    columns["log_id"] = [row.get("log_id") for row in rows]
+    columns["date"] = [row.get("date") for row in rows]
+
+    arrays = []
+    for field in EXPORT_SCHEMA:
+        if field.name == "date":
+            # Dates arrive as "YYYY-MM-DD" strings: let Arrow parse them in one go
+            arrays.append(pa.array(columns["date"], pa.string()).cast(pa.date32()))
+        elif pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(columns[field.name], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=EXPORT_SCHEMA)
+
+def _regroup(pages, habits_by_id):
+    """
+    Turns pages of ~1000 rows into batches of ~ROW_GROUP_ROWS rows.
+    """
+    buffered = []
+    for page in pages:
+        buffered.extend(page)
+        if len(buffered) >= ROW_GROUP_ROWS:
+            yield _to_batch(habits_by_id, buffered)
+            buffered = []
+    if buffered:
+        yield _to_batch(habits_by_id, buffered)
+
+def iter_export_batches(user_id):
+    """
+    Yields the user's export as Arrow RecordBatches: habit definitions first,
+    then the logs, page by page.
+    """
+    habits = get_user_habits(user_id, active_only=False)
+    habits_by_id = {habit["habit_id"]: habit for habit in habits}
+    if not habits:
+        return
+
+    yield _to_batch(habits_by_id, habits)
+    yield from _regroup(iter_habit_logs(list(habits_by_id)), habits_by_id)
+
+async def aiter_export_batches(user_id):
+    """
+    Async version for the API (same batches, using the async client).
+    """
+    from database.async_db import fetch_user_habits, iter_user_logs
+
+    habits = await fetch_user_habits(user_id)
+    habits_by_id = {habit["habit_id"]: habit for habit in habits}
+    if not habits:
+        return
+
+    yield _to_batch(habits_by_id, habits)
+    buffered = []
+    async for page in iter_user_logs(user_id):
+        buffered.extend(page)
+        if len(buffered) >= ROW_GROUP_ROWS:
+            yield _to_batch(habits_by_id, buffered)
+            buffered = []
+    if buffered:
+        yield _to_batch(habits_by_id, buffered)
+
+class _ChunkSink:
+    """
+    Write-only file object that hands over whatever was written since the last take().
+    Lets a Parquet/Arrow writer feed a streaming HTTP response.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _open_writer(sink, fmt):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, EXPORT_SCHEMA, compression="zstd")
+    if fmt == "arrow":
+        return pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+    raise ValueError(f"Unknown export format: {fmt} (use one of {', '.join(FORMATS)})")
+
+def _write(writer, batch, fmt):
+    if fmt == "parquet":
+        writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+    else:
+        writer.write_batch(batch)
+
+def export_user_data(user_id, destination, fmt="parquet"):
+    """
+    Writes the user's habits and logs to `destination` (a path or a
+    binary file object). Returns the number of rows written.
+    """
+    rows = 0
+    writer = _open_writer(destination, fmt)
+    try:
+        for batch in iter_export_batches(user_id):
+            _write(writer, batch, fmt)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    return rows
+
+async def stream_user_data(user_id, fmt="arrow"):
+    """
+    Async generator of encoded bytes (Arrow IPC stream or Parquet) for a
+    StreamingResponse. Only one batch is encoded in memory at a time.
+    """
+    sink = _ChunkSink()
+    writer = _open_writer(sink, fmt)
+    try:
+        async for batch in aiter_export_batches(user_id):
+            _write(writer, batch, fmt)
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+# --- IMPORT ---
+
+def iter_import_chunks(source, fmt, chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    Reads a Parquet or CSV file (path or binary file object) in chunks.
+    Yields lists of row dicts, at most ~chunk_rows long.
+    """
+    if fmt == "parquet":
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_rows)
+    elif fmt == "csv":
+        # CSV blocks are sized in bytes: ~64 bytes per row is plenty for this table
+        batches = pv.open_csv(
+            source,
+            read_options=pv.ReadOptions(block_size=max(1 << 20, chunk_rows * 64)),
+            convert_options=pv.ConvertOptions(
+                column_types={"date": pa.date32(), "name": pa.string(), "category": pa.string()},
+                strings_can_be_null=True,
+            ),
+        )
+    else:
+        raise ValueError(f"Unknown import format: {fmt} (use parquet or csv)")
+
+    for batch in batches:
+        yield batch.to_pylist()
+
+def _note_error(summary, message):
+    if len(summary.errors) < MAX_REPORTED_ERRORS:
+        summary.errors.append(message)
+
+def _create_missing_habits(user_id, rows, habit_ids, summary):
+    """
+    Inserts (in one request) every habit in `rows` the user doesn't have
+    yet, matched by name, and adds them to habit_ids {name: habit_id}.
+    """
+    new_habits = {}
+    for row in rows:
+        if row.name not in habit_ids and row.name not in new_habits:
+            new_habits[row.name] = {
+                "user_id": user_id,
+                "name": row.name,
+                "category": row.category,
+                "frequency": row.frequency,
+                "is_active": row.is_active,
+            }
+    if not new_habits:
+        return
+
+    supabase = get_db_connection()
+    try:
+        created = supabase.table("habits").insert(list(new_habits.values())).execute().data
+    except Exception as e:
+        _note_error(summary, f"Could not create habits: {e}")
+        return
+    for habit in created:
+        habit_ids[habit["name"]] = habit["habit_id"]
+    summary.habits_created += len(created)
+    invalidate_user(user_id, habits_changed=True)
+
+def import_user_data(user_id, source, fmt="parquet", chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    Imports a file made by export_user_data (or any CSV/Parquet with at least
+    a "name" column, plus optional category, frequency, is_active, date).
+    Habits are matched to the user's habits by name (missing ones are created);
+    logs are written with the idempotent bulk upsert, so re-importing the same
+    file changes nothing. Returns an ImportSummary.
+    """
+    summary = ImportSummary()
+    habit_ids = {habit["name"]: habit["habit_id"] for habit in get_user_habits(user_id, active_only=False)}
+    row_number = 0
+
+    for chunk in iter_import_chunks(source, fmt, chunk_rows):
+        # 1. Validate every row (bad rows are skipped, not fatal)
+        valid = []
+        for raw in chunk:
+            row_number += 1
+            try:
+                valid.append(ImportRow.model_validate({key: value for key, value in raw.items() if value is not None}))
+            except ValidationError as e:
+                summary.rows_rejected += 1
+                _note_error(summary, f"Row {row_number}: {e.errors()[0]['loc'][0]} - {e.errors()[0]['msg']}")
+        summary.rows_read += len(chunk)
+
+        # 2. One insert for the habits this chunk introduces
+        _create_missing_habits(user_id, valid, habit_ids, summary)
+        # Rows whose habit couldn't be created can't be imported: count them
+        orphans = sum(row.name not in habit_ids for row in valid)
+        if orphans:
+            summary.rows_rejected += orphans
+            _note_error(summary, f"{orphans} row(s) skipped: their habit could not be created")
+
+        # 3. One bulk upsert (in BULK_CHUNK batches) for the chunk's logs
+        changes = [
+            (habit_ids[row.name], row.date, True)
+            for row in valid
+            if row.date is not None and row.name in habit_ids
+        ]
+        for result in bulk_set_habit_logs(changes):
+            if result["status"] == "inserted":
+                summary.logs_inserted += 1
+            elif result["status"] == "error":
+                summary.logs_failed += 1
+                _note_error(summary, f"Log {result['habit_id']} on {result['date']}: {result['error']}")
+            else:
+                summary.logs_unchanged += 1
+
+    return summary